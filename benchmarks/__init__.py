@@ -0,0 +1 @@
+"""Micro-benchmarks for pipeline hot paths (run as scripts, not collected by pytest)."""
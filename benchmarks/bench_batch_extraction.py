@@ -0,0 +1,55 @@
+"""Benchmark the columnar batch extraction engine against the per-company loop.
+
+Usage: python -m benchmarks.bench_batch_extraction [n_companies ...]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts import config
+from scripts.data_preprocessing import process_company_data, process_companies_batch
+
+
+def make_universe(n_companies, n_years=20, n_templates=50, seed=0):
+    """Synthetic {ticker: facts}; companies share a pool of fact templates to save memory."""
+    rng = random.Random(seed)
+    tags = [info["tag"] for info in config.XBRL_TAGS.values() if info.get("tag")]
+    templates = []
+    for _ in range(n_templates):
+        us_gaap = {}
+        for tag in tags:
+            obs = []
+            for year in range(2024 - n_years, 2024):
+                obs.append({"val": rng.randint(1, 10 ** 9), "fy": year, "fp": "FY", "form": "10-K"})
+                obs.append({"val": rng.randint(1, 10 ** 9), "fy": year, "fp": "Q2", "form": "10-Q"})
+            us_gaap[tag] = {"units": {"USD": obs}}
+        templates.append({"facts": {"us-gaap": us_gaap}})
+    return {f"T{i:05d}": templates[i % n_templates] for i in range(n_companies)}
+
+
+def main(sizes=(1000, 10000)):
+    for n in sizes:
+        raw_data = make_universe(n)
+
+        start = time.perf_counter()
+        serial = []
+        for ticker, facts in raw_data.items():
+            serial.extend(process_company_data(ticker, facts))
+        serial_t = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = process_companies_batch(raw_data)
+        batch_t = time.perf_counter() - start
+
+        assert len(serial) == len(batch)
+        print(f"{n:>6} companies, {len(batch):>9} rows | "
+              f"per-company {len(serial) / serial_t:>11,.0f} rows/s | "
+              f"batch {len(batch) / batch_t:>11,.0f} rows/s | {serial_t / batch_t:.1f}x")
+
+
+if __name__ == "__main__":
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (1000, 10000))
@@ -0,0 +1,43 @@
+"""Benchmark the derived-metric compiler on a company x year panel.
+
+Usage: python -m benchmarks.bench_derived_metrics [n_companies] [n_ratios]
+"""
+import sys
+import time
+from pathlib import Path
+import numpy as np
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts import config
+from scripts.derived_metrics import MetricCompiler
+
+
+def main(n_companies=10000, n_ratios=50, n_years=20):
+    rng = np.random.default_rng(0)
+    raw = [label for label, info in config.XBRL_TAGS.items() if info.get("tag")]
+    tags = {label: config.XBRL_TAGS[label] for label in raw}
+    for i in range(n_ratios):
+        num, den = raw[i % len(raw)], raw[(i * 7 + 3) % len(raw)]
+        tags[f"ratio_{i}"] = {"formula": f"({{{num}}} - {{{den}}}) / {{{den}}} * 100"}
+
+    rows = n_companies * n_years
+    panel = {label: rng.normal(1e6, 5e5, rows) for label in raw}
+    for values in panel.values():
+        values[rng.random(rows) < 0.05] = np.nan
+
+    compiler = MetricCompiler(tags)
+    start = time.perf_counter()
+    compiler.compile(panel.keys())
+    compile_t = time.perf_counter() - start
+
+    start = time.perf_counter()
+    out = compiler.evaluate(panel)
+    eval_t = time.perf_counter() - start
+    print(f"{len(out)} metrics x {rows:,} company-years: compile {compile_t * 1000:.1f} ms, "
+          f"evaluate {eval_t:.3f} s ({len(out) * rows / eval_t:,.0f} values/s)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,75 @@
+"""Benchmark deterministic duplicate resolution against pivot_table(aggfunc="last").
+
+Each company has 20+ years of history where every period is reported by its
+own 10-K, as a comparative in the next two 10-Ks and sometimes in a 10-K/A.
+
+Usage: python -m benchmarks.bench_duplicate_resolution [n_companies ...]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts import config
+from scripts.data_preprocessing import extract_observations_batch, resolve_duplicates, unstack_metrics
+
+
+def make_universe(n_companies, n_years=25, seed=0):
+    rng = random.Random(seed)
+    tags = [info["tag"] for info in config.XBRL_TAGS.values() if info.get("tag")]
+    universe = {}
+    for i in range(n_companies):
+        us_gaap = {}
+        for tag in tags:
+            obs = []
+            for fy in range(2024 - n_years, 2024):
+                for lag in range(3):
+                    period = fy - lag
+                    obs.append({
+                        "val": rng.randint(1, 10 ** 9), "fy": fy, "fp": "FY", "form": "10-K",
+                        "start": f"{period}-01-01", "end": f"{period}-12-31",
+                        "filed": f"{fy + 1}-02-15", "accn": f"{i:010d}-{fy % 100:02d}-000001",
+                    })
+                if rng.random() < 0.1:
+                    obs.append({
+                        "val": rng.randint(1, 10 ** 9), "fy": fy, "fp": "FY", "form": "10-K/A",
+                        "start": f"{fy}-01-01", "end": f"{fy}-12-31",
+                        "filed": f"{fy + 1}-06-30", "accn": f"{i:010d}-{fy % 100:02d}-000009",
+                    })
+            rng.shuffle(obs)
+            us_gaap[tag] = {"units": {"USD": obs}}
+        universe[f"T{i:05d}"] = {"facts": {"us-gaap": us_gaap}}
+    return universe
+
+
+def main(sizes=(200, 1000)):
+    for n in sizes:
+        obs = extract_observations_batch(make_universe(n))
+        per_company = [group for _, group in obs.groupby("ticker", observed=True)]
+
+        start = time.perf_counter()
+        for group in per_company:
+            group.pivot_table(index="year", columns="metric", values="value", aggfunc="last", observed=True)
+        pivot_t = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for group in per_company:
+            unstack_metrics(resolve_duplicates(group))
+        resolve_t = time.perf_counter() - start
+
+        start = time.perf_counter()
+        resolve_duplicates(obs)
+        batch_t = time.perf_counter() - start
+
+        print(f"{n:>5} companies, {len(obs):>9} observations | pivot_table {pivot_t:6.2f}s | "
+              f"resolve+unstack {resolve_t:6.2f}s ({pivot_t / resolve_t:.1f}x) | "
+              f"whole-universe resolve {batch_t:6.3f}s ({pivot_t / batch_t:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (200, 1000))
@@ -0,0 +1,47 @@
+"""Benchmark the in-process query cache against reading the delta dataset per request.
+
+Usage: python -m benchmarks.bench_metrics_query [n_rows] [n_queries] [n_baseline]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.bench_data_quality import make_panel
+from scripts import data_loading
+from scripts.metrics_query import MetricsQueryCache
+
+
+def main(n_rows=50_000, n_queries=20_000, n_baseline=10):
+    frame = make_panel(n_rows)
+    tickers = frame["ticker"].cat.categories.to_numpy()
+    metric = frame["metric"].cat.categories[0]
+    # Zipf-like traffic: a few hundred hot tickers take most requests.
+    rng = np.random.default_rng(0)
+    picks = tickers[np.minimum(rng.zipf(1.3, n_queries) - 1, len(tickers) - 1)]
+    with tempfile.TemporaryDirectory() as root:
+        data_loading.load_delta(frame, root=root)
+
+        start = time.perf_counter()
+        for _ in range(n_baseline):
+            data_loading.read_latest(root)
+        cold = (time.perf_counter() - start) / n_baseline
+        print(f"read whole snapshot per request: {cold * 1e3:8.2f} ms/query")
+
+        for budget in (256 * 1024, 256 * 1024 ** 2):
+            cache = MetricsQueryCache(root, max_bytes=budget, refresh_seconds=0)
+            start = time.perf_counter()
+            for ticker in picks:
+                cache.time_series(ticker, metric)
+            per_query = (time.perf_counter() - start) / n_queries
+            print(f"cache ({budget / 1024 ** 2:>6g} MiB budget): {per_query * 1e3:8.3f} ms/query, "
+                  f"hit rate {cache.hit_rate():.1%}, {cache.stats['evictions']} evictions, "
+                  f"{cache.nbytes / 1024 ** 2:.1f} MiB held")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:4]))
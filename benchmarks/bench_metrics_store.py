@@ -0,0 +1,48 @@
+"""Benchmark bulk loading and point queries of the SQLite metrics store.
+
+Usage: python -m benchmarks.bench_metrics_store [n_rows] [db_path]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.bench_data_quality import make_panel
+from scripts.metrics_store import MetricsStore
+
+
+def main(n_rows=10_000_000, db_path=None):
+    frame = make_panel(n_rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MetricsStore(db_path or os.path.join(tmp, "metrics.sqlite"))
+        start = time.perf_counter()
+        store.load(frame)
+        load_t = time.perf_counter() - start
+        print(f"bulk load {n_rows:,} rows: {load_t:.2f}s ({n_rows / load_t:,.0f} rows/s)")
+
+        rng = np.random.default_rng(1)
+        picks = rng.integers(0, n_rows, 10_000)
+        tickers = frame["ticker"].astype(str).to_numpy()[picks]
+        metrics = frame["metric"].astype(str).to_numpy()[picks]
+        years = frame["year"].to_numpy()[picks].tolist()
+
+        for name, fn in (
+            ("value", lambda t, m, y: store.value(t, m, y)),
+            ("time_series", lambda t, m, y: store.time_series(t, m)),
+            ("cross_section top 10", lambda t, m, y: store.cross_section(m, y, limit=10)),
+        ):
+            n = 10_000 if name != "cross_section top 10" else 200
+            start = time.perf_counter()
+            for t, m, y in zip(tickers[:n], metrics[:n], years[:n]):
+                fn(t, m, y)
+            print(f"{name:>22}: {(time.perf_counter() - start) / n * 1e6:8.1f} us/query")
+        store.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) if i == 0 else arg for i, arg in enumerate(sys.argv[1:3])))
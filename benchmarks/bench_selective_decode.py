@@ -0,0 +1,62 @@
+"""Benchmark selective companyfacts decoding against a full json decode.
+
+Usage: python -m benchmarks.bench_selective_decode [n_tags] [n_obs]
+"""
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts import config
+from scripts.data_ingestion import decode_company_facts
+
+
+def make_document(n_tags=3000, n_obs=120):
+    """Build a synthetic large-filer companyfacts document."""
+    tags = [info["tag"] for info in config.XBRL_TAGS.values() if info.get("tag")]
+    tags += [f"SyntheticConcept{i}" for i in range(n_tags - len(tags))]
+    forms = [("10-K", "FY"), ("10-Q", "Q1"), ("10-Q", "Q2"), ("10-Q", "Q3")]
+    us_gaap = {}
+    for tag in tags:
+        obs = []
+        for i in range(n_obs):
+            form, fp = forms[i % len(forms)]
+            obs.append({
+                "end": f"{2000 + i // 4}-12-31", "val": 1000 + i, "accn": f"0000000000-{i:02d}-000001",
+                "fy": 2000 + i // 4, "fp": fp, "form": form, "filed": f"{2001 + i // 4}-02-01",
+            })
+        us_gaap[tag] = {"label": tag, "description": f"Synthetic description for {tag}.", "units": {"USD": obs}}
+    doc = {"cik": 1, "entityName": "Synthetic Corp", "facts": {"dei": {}, "us-gaap": us_gaap}}
+    return json.dumps(doc, separators=(",", ":")).encode("utf-8")
+
+
+def _measure(fn, raw, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(raw)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    result = fn(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best, peak
+
+
+def main(n_tags=3000, n_obs=120):
+    raw = make_document(n_tags, n_obs)
+    print(f"Document: {len(raw) / 1e6:.1f} MB, {n_tags} tags x {n_obs} observations")
+    full_t, full_mem = _measure(json.loads, raw)
+    sel_t, sel_mem = _measure(decode_company_facts, raw)
+    print(f"full json.loads      : {full_t * 1000:8.1f} ms  peak {full_mem / 1e6:8.1f} MB")
+    print(f"decode_company_facts : {sel_t * 1000:8.1f} ms  peak {sel_mem / 1e6:8.1f} MB")
+    print(f"speedup {full_t / sel_t:.1f}x, memory {full_mem / max(sel_mem, 1):.1f}x lower")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -1,3 +1,4 @@
+import re
 import sys
 from pathlib import Path
 
@@ -10,44 +11,98 @@ sys.path.append(str(project_root))
 from datetime import datetime, timedelta
 from airflow import DAG
 from airflow.operators.python import PythonOperator
+from scripts import config
 from scripts import data_ingestion
 from scripts import data_loading
 from scripts import data_preprocessing
+from scripts import data_quality
+from scripts import sentence_generation
+from utils import artifacts
 from utils import notifier
 from utils.helpers import setup_logger
 
 logger = setup_logger()
 
-def ingest_data_task(**context):
-    """Wrapper for data ingestion task."""
-    return data_ingestion.ingest_data(n=2)
-
-def preprocess_data_task(**context):
-    """Wrapper for data preprocessing task."""
+def _artifact_store():
+    return artifacts.get_artifact_store(config.ARTIFACT_STORE_URI, profile_name=config.AWS_PROFILE)
+
+def _artifact_name(context, stage, shard_id):
+    run_id = re.sub(r"[^A-Za-z0-9_.-]", "_", context["run_id"])
+    return f"{context['ds_nodash']}/{run_id}/{stage}/shard-{shard_id:04d}.json.gz"
+
+def plan_shards_task(**context):
+    """Resolve the CIK universe and split it into shards for dynamic task mapping."""
+    companies = data_ingestion.extract_companies(n=config.PIPELINE_UNIVERSE_SIZE)
+    shards = data_ingestion.shard_companies(companies, config.INGEST_NUM_SHARDS)
+    logger.info(f"Planned {len(shards)} shards for {len(companies)} companies")
+    return [{"shard_id": i, "companies": shard} for i, shard in enumerate(shards)]
+
+def ingest_data_task(shard_id, companies, **context):
+    """Wrapper for data ingestion of one shard."""
+    # Concurrent shards split the SEC request budget (see max_active_tis_per_dag below).
+    data_ingestion.set_request_rate(config.INGEST_SHARD_REQUESTS_PER_SECOND)
+    cache = data_ingestion.enable_http_cache()
+    # Watermarks and stored facts live in config.INCREMENTAL_STATE_DIR, shared by
+    # all workers; the HTTP cache stays worker-local.
+    raw_data = data_ingestion.ingest_companies_incremental(companies)
+    logger.info(f"Shard {shard_id}: ingested {len(raw_data)}/{len(companies)} companies")
+    logger.info(f"HTTP cache stats: {cache.stats} (hit rate {cache.hit_rate():.1%})")
+    logger.info(f"SEC client stats: {data_ingestion.get_client().stats}")
+    # Only the {uri, size, sha256} reference goes through XCom.
+    return _artifact_store().put(_artifact_name(context, "raw", shard_id), raw_data)
+
+def preprocess_data_task(shard_id, companies, **context):
+    """Wrapper for data preprocessing of one shard."""
     ti = context['ti']
-    raw_data = ti.xcom_pull(task_ids='qualitative_extraction')
+    raw_ref = ti.xcom_pull(task_ids='qualitative_extraction', map_indexes=ti.map_index)
+    store = _artifact_store()
+    raw_data = store.get(raw_ref) if raw_ref else None
     
     if not raw_data:
-        logger.warning("No raw data received from ingestion task")
+        logger.warning(f"Shard {shard_id}: no raw data received from ingestion task")
         return None
     
-    processed_data = []
-    for ticker, facts in raw_data.items():
-        processed = data_preprocessing.process_company_data(ticker, facts)
-        processed_data.extend(processed)
-    
-    return processed_data
+    processed = data_preprocessing.process_companies_cached(raw_data)
+    # Dictionary-encoded: tickers and metric metadata are stored once per shard.
+    return store.put(_artifact_name(context, "processed", shard_id), data_preprocessing.to_columnar(processed))
+
+def data_quality_task(**context):
+    """Quality gate between preprocessing and loading; fails the run on blocking violations."""
+    ti = context['ti']
+    shard_refs = [ref for ref in ti.xcom_pull(task_ids='preprocess_data') or [] if ref]
+    store = _artifact_store()
+    frames = (data_preprocessing.from_columnar(store.get(ref)) for ref in shard_refs)
+    # Raises DataQualityError (failing the task) when a blocking check fails.
+    return data_quality.run_quality_gate(frames)
 
 def load_data_task(**context):
-    """Wrapper for data loading task."""
+    """Wrapper for data loading task; uploads only the partitions that changed since the last run."""
     ti = context['ti']
-    processed_data = ti.xcom_pull(task_ids='preprocess_data')
+    shard_refs = [ref for ref in ti.xcom_pull(task_ids='preprocess_data') or [] if ref]
+    store = _artifact_store()
     
-    if not processed_data:
+    if not shard_refs:
         logger.warning("No processed data to save")
         return None
     
-    return data_loading.save_to_s3(processed_data)
+    # One shard is resident at a time.
+    frames = (data_preprocessing.from_columnar(store.get(ref)) for ref in shard_refs)
+    # Shards hold whole tickers, so every ticker-year partition arrives in one frame.
+    return data_loading.load_delta(frames)
+
+def generate_sentences_task(**context):
+    """Render RAG sentences for every shard and stream them to S3 in compressed JSON Lines parts."""
+    ti = context['ti']
+    shard_refs = [ref for ref in ti.xcom_pull(task_ids='preprocess_data') or [] if ref]
+    store = _artifact_store()
+
+    if not shard_refs:
+        logger.warning("No processed data to render")
+        return None
+
+    frames = (data_preprocessing.from_columnar(store.get(ref)) for ref in shard_refs)
+    root = f"{config.SENTENCES_ROOT}/{context['ds_nodash']}"
+    return sentence_generation.write_sentences(frames, root=root)["sentences"]
 
 default_args = {
     "owner": "Finsights",
@@ -69,14 +124,28 @@ with DAG(
     is_paused_upon_creation=True,
 ) as dag:
 
-    data_ingest = PythonOperator(
+    plan_shards = PythonOperator(
+        task_id="plan_shards",
+        python_callable=plan_shards_task,
+    )
+
+    # One mapped task instance per shard; each retries independently. At most
+    # INGEST_MAX_ACTIVE_SHARDS run at once so their rate limits add up to
+    # SEC's fair-access budget.
+    data_ingest = PythonOperator.partial(
         task_id="qualitative_extraction",
         python_callable=ingest_data_task,
-    )
+        max_active_tis_per_dag=config.INGEST_MAX_ACTIVE_SHARDS,
+    ).expand(op_kwargs=plan_shards.output)
 
-    data_preprocess = PythonOperator(
+    data_preprocess = PythonOperator.partial(
         task_id="preprocess_data",
         python_callable=preprocess_data_task,
+    ).expand(op_kwargs=plan_shards.output)
+
+    data_quality_gate = PythonOperator(
+        task_id="data_quality",
+        python_callable=data_quality_task,
     )
 
     data_load = PythonOperator(
@@ -84,6 +153,11 @@ with DAG(
         python_callable=load_data_task,
     )
 
+    rag_sentences = PythonOperator(
+        task_id="generate_sentences",
+        python_callable=generate_sentences_task,
+    )
+
     notify_failure_task = PythonOperator(
         task_id="notify_failure",
         python_callable=lambda: notifier.send_notification(
@@ -103,7 +177,8 @@ with DAG(
     )
 
     # Define task dependencies
-    data_ingest >> data_preprocess >> data_load
+    plan_shards >> data_ingest >> data_preprocess >> data_quality_gate >> [data_load, rag_sentences]
     
-    # Both notification tasks depend on data_load, but trigger based on different rules
-    data_load >> [notify_failure_task, notify_success_task]
+    # Both notification tasks depend on data_load and the sentences, but trigger based on different rules
+    [data_load, rag_sentences] >> notify_failure_task
+    [data_load, rag_sentences] >> notify_success_task
@@ -96,57 +96,76 @@ XBRL_TAGS = {
     },
 
     # -------------------- DERIVED METRICS --------------------
+    # "formula" references other metrics as {label}; supports + - * / and
+    # parentheses. Division by zero yields NaN. Evaluated by scripts/derived_metrics.py.
     "Return on Assets (ROA) %": {
+        "formula": "{income_stmt_Net Income} / {balance_sheet_Total Assets} * 100",
         "description": "ROA = Net Income ÷ Total Assets × 100. Measures efficiency of using assets to generate profit. Higher ROA indicates better asset utilization. Unit: %",
         "theme": "Profitability",
         "unit": "%"
     },
     "Return on Equity (ROE) %": {
+        "formula": "{income_stmt_Net Income} / {balance_sheet_Stockholders Equity} * 100",
         "description": "ROE = Net Income ÷ Stockholders Equity × 100. Measures how effectively equity is used to generate profit. Unit: %",
         "theme": "Profitability",
         "unit": "%"
     },
     "Gross Profit Margin %": {
+        "formula": "{income_stmt_Gross Profit} / {income_stmt_Revenue} * 100",
         "description": "Gross Profit ÷ Revenue × 100. Shows profitability after cost of goods sold. Higher margin = more efficient operations. Unit: %",
         "theme": "Profitability",
         "unit": "%"
     },
+    "Operating Income": {
+        "formula": "{income_stmt_Gross Profit} - {income_stmt_Operating Expenses}",
+        "description": "Operating Income = Gross Profit − Operating Expenses. Profit from core operations before interest and taxes. Used in Operating Margin. Unit: USD",
+        "theme": "Profitability",
+        "unit": "USD"
+    },
     "Operating Margin %": {
+        "formula": "{Operating Income} / {income_stmt_Revenue} * 100",
         "description": "Operating Income ÷ Revenue × 100. Shows efficiency of core business operations excluding taxes and interest. Unit: %",
         "theme": "Profitability",
         "unit": "%"
     },
     "Net Profit Margin %": {
+        "formula": "{income_stmt_Net Income} / {income_stmt_Revenue} * 100",
         "description": "Net Income ÷ Revenue × 100. Shows overall profitability relative to revenue. Unit: %",
         "theme": "Profitability",
         "unit": "%"
     },
     "Current Ratio": {
+        "formula": "{balance_sheet_Current Assets} / {balance_sheet_Current Liabilities}",
         "description": "Current Assets ÷ Current Liabilities. Measures liquidity; ability to cover short-term obligations. Ideal range: 1.2–2.0. Unit: ratio",
         "theme": "Liquidity",
         "unit": "ratio"
     },
     "Debt to Assets Ratio %": {
+        "formula": "{balance_sheet_Total Liabilities} / {balance_sheet_Total Assets} * 100",
         "description": "Total Liabilities ÷ Total Assets × 100. Measures leverage; higher means more debt relative to assets. Unit: %",
         "theme": "Leverage",
         "unit": "%"
     },
     "Debt to Equity Ratio %": {
+        "formula": "{balance_sheet_Total Liabilities} / {balance_sheet_Stockholders Equity} * 100",
         "description": "Total Liabilities ÷ Stockholders Equity × 100. Measures financial leverage relative to equity. Unit: %",
         "theme": "Leverage",
         "unit": "%"
     },
     "Operating CF to Current Liabilities": {
+        "formula": "{cash_flow_Operating Cash Flow} / {balance_sheet_Current Liabilities}",
         "description": "Operating Cash Flow ÷ Current Liabilities. Shows ability to cover short-term obligations with cash from operations. Unit: ratio",
         "theme": "Liquidity",
         "unit": "ratio"
     },
     "Operating CF to Net Income": {
+        "formula": "{cash_flow_Operating Cash Flow} / {income_stmt_Net Income}",
         "description": "Operating Cash Flow ÷ Net Income. Indicates quality of earnings; >1 means cash exceeds accounting profit. Unit: ratio",
         "theme": "Cash Flow",
         "unit": "ratio"
     },
     "Free Cash Flow": {
+        "formula": "{cash_flow_Operating Cash Flow} - {cash_flow_Investing Cash Flow}",
         "description": "Free Cash Flow = Operating Cash Flow − Investing Cash Flow. Represents cash available for dividends, debt repayment, or growth. Unit: USD",
         "theme": "Cash Flow",
         "unit": "USD"
@@ -154,11 +173,112 @@ XBRL_TAGS = {
 }
 
 
+# Annual observations: forms kept, and the shortest period counted as a fiscal year
+ANNUAL_FORMS = ("10-K", "10-K/A")
+MIN_ANNUAL_DURATION_DAYS = 300
+
+# Parallel preprocessing: None = os.cpu_count(); chunks per worker for load balancing
+PREPROCESS_MAX_WORKERS = None
+PREPROCESS_CHUNKS_PER_WORKER = 4
+
+# Persistent per-company preprocessing results, keyed by a hash of the facts slice.
+# Worker-local on purpose: a shard landing on another worker only recomputes.
+PREPROCESS_CACHE_DIR = "cache/preprocess"
+PREPROCESS_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+# Streaming mode: companies preprocessed per group, rows per emitted/loaded batch
+STREAM_GROUP_COMPANIES = 32
+STREAM_BATCH_ROWS = 50_000
+
+# Data-quality gate: valid fiscal years, drift thresholds vs the previous run
+# (the drift baseline lives in DQ_STATE_DIR, below with the other shared state)
+DQ_YEAR_RANGE = (1990, 2100)
+DQ_MAX_COUNT_CHANGE = 0.5       # relative change in rows per metric
+DQ_MAX_MEAN_SHIFT = 1.0         # relative change in a metric's mean
+DQ_MAX_NULL_FRAC_CHANGE = 0.2   # absolute change in a metric's null fraction
+DQ_DRIFT_BLOCKING = False       # drift is reported as a warning unless set
+
+# Embedded SQLite metrics store (":memory:" for a throwaway store)
+METRICS_DB_PATH = "data/metrics.sqlite"
+
+# Time-series stage: CAGR horizons (years) and rolling window (years)
+TIME_SERIES_CAGR_YEARS = (3, 5)
+TIME_SERIES_WINDOW = 3
+
+# SEC EDGAR endpoints
+SEC_TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+SEC_DATA_URL = "https://data.sec.gov"
+
+# Ticker/CIK/name lookup index, rebuilt from company_tickers.json at most daily
+TICKER_INDEX_DIR = "data/ticker_index"
+TICKER_INDEX_MAX_AGE_SECONDS = 24 * 3600
+
+# Explicit ticker universe for the pipeline; None means "first n" from SEC
+PIPELINE_TICKERS = None
+
+# Universe size ("first n" tickers) and shard count for the Airflow DAG
+PIPELINE_UNIVERSE_SIZE = 2
+INGEST_NUM_SHARDS = 8
+
+# Concurrent ingestion (SEC fair-access policy allows ~10 requests/second).
+# INGEST_REQUESTS_PER_SECOND is the budget for the whole DAG run: the mapped
+# ingestion task runs at most INGEST_MAX_ACTIVE_SHARDS shards at once, and
+# each shard's client is limited to an equal share of the budget.
+INGEST_MAX_WORKERS = 8
+INGEST_REQUESTS_PER_SECOND = 10
+INGEST_MAX_ACTIVE_SHARDS = 4
+INGEST_SHARD_REQUESTS_PER_SECOND = INGEST_REQUESTS_PER_SECOND / INGEST_MAX_ACTIVE_SHARDS
+
+# On-disk HTTP response cache for SEC endpoints.
+# Worker-local on purpose: a cold cache only costs (conditional) refetches.
+HTTP_CACHE_DIR = "cache/http"
+HTTP_CACHE_TTL_SECONDS = 12 * 3600
+HTTP_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Incremental ingestion: per-CIK watermark = latest accession of these forms
+# (watermarks and stored facts live in INCREMENTAL_STATE_DIR, below)
+WATERMARK_FORMS = ("10-K", "10-K/A")
+
+# Nightly bulk archive (https://www.sec.gov/Archives/edgar/daily-index/xbrl/companyfacts.zip)
+BULK_FACTS_ARCHIVE = "data/companyfacts.zip"
+
 # AWS
 AWS_PROFILE = "Finsights"
 S3_BUCKET = "sentence-data-ingestion"
 S3_FOLDER = "QuantitativeData"
 
+# Parquet output: hive partitions (fiscal year, then "metric" or "ticker") and page compression
+PARQUET_PARTITION_BY = ("year", "metric")
+PARQUET_COMPRESSION = "zstd"
+
+# Streaming JSON uploads: S3 multipart part size (>= 5 MiB), parallel parts, "gzip" or "zstd"
+UPLOAD_PART_SIZE = 8 * 1024 ** 2
+UPLOAD_MAX_WORKERS = 4
+UPLOAD_COMPRESSION = "gzip"
+
+# Delta loading: content-hash manifest per partition, only changed partitions are uploaded
+DELTA_ROOT = f"s3://{S3_BUCKET}/{S3_FOLDER}/metrics_delta"
+DELTA_PARTITION_BY = ("ticker", "year")
+
+# Read-side query cache over the delta dataset: per-ticker LRU under a memory budget
+QUERY_CACHE_MAX_BYTES = 256 * 1024 ** 2
+QUERY_CACHE_REFRESH_SECONDS = 60
+
+# RAG sentences: compressed JSON Lines chunks ("zstd" or "gzip") of templated metric sentences
+SENTENCES_ROOT = f"s3://{S3_BUCKET}/{S3_FOLDER}/sentences"
+SENTENCES_CHUNK_ROWS = 500_000
+SENTENCES_COMPRESSION = "zstd"
+
+# Artifact store for inter-task payloads (file://<dir> or s3://<bucket>/<prefix>)
+ARTIFACT_STORE_URI = f"s3://{S3_BUCKET}/{S3_FOLDER}/artifacts"
+
+# State carried between runs (local dir, file://<dir> or s3://<bucket>/<prefix>).
+# Mapped shard tasks land on different Airflow workers each day, so both must
+# point at storage every worker shares: incremental watermarks and stored
+# facts, and the data-quality drift baseline.
+INCREMENTAL_STATE_DIR = f"s3://{S3_BUCKET}/{S3_FOLDER}/state/incremental"
+DQ_STATE_DIR = f"s3://{S3_BUCKET}/{S3_FOLDER}/state/quality"
+
 # Notifications
 SNS_TOPIC_ARN = "arn:aws:sns:us-east-1:123456789012:finsights-alerts"
 SLACK_WEBHOOK_URL = "https://hooks.slack.com/services/XXXX/YYYY/ZZZZ"
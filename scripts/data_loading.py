@@ -1,18 +1,53 @@
 import boto3
+import gzip
+import hashlib
 import json
 import datetime
+import os
+import threading
+import time
+from urllib.parse import quote, unquote
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
 from scripts import config
+from scripts.data_preprocessing import COLUMNAR_FORMAT, from_columnar, to_columnar
 from utils.helpers import setup_logger
 logger = setup_logger()
 
-def save_to_s3(json_data):
-    """Upload JSON metrics to S3."""
+try:
+    import zstandard
+except ImportError:  # optional: only needed for compression="zstd"
+    zstandard = None
+
+def save_to_s3(json_data, stream=False, compression=None):
+    """Upload JSON metrics to S3.
+
+    Accepts a list of records or a dictionary-encoded columnar payload from
+    data_preprocessing.to_columnar, which is written compactly as-is. With
+    stream=True, `json_data` may also be an iterable of record batches; it
+    is serialised incrementally into a compressed multipart upload (see
+    upload_json_stream) and the key gets a .gz / .zst suffix.
+    """
     session = boto3.session.Session(profile_name=config.AWS_PROFILE)
     s3_client = session.client("s3")
 
     timestamp = datetime.datetime.now().strftime("%Y%m%d")
     file_name = f"{config.S3_FOLDER}/metrics_{timestamp}.json"
-    json_bytes = json.dumps(json_data, indent=4).encode("utf-8")
+    if stream:
+        compression = compression or config.UPLOAD_COMPRESSION
+        file_name += COMPRESSION_SUFFIX[compression]
+        upload_json_stream(json_data, config.S3_BUCKET, file_name, s3_client, compression=compression)
+        print(f"✅ Uploaded to s3://{config.S3_BUCKET}/{file_name}")
+        return file_name
+    if isinstance(json_data, dict) and json_data.get("format") == COLUMNAR_FORMAT:
+        json_bytes = json.dumps(json_data, separators=(",", ":")).encode("utf-8")
+    else:
+        json_bytes = json.dumps(json_data, indent=4).encode("utf-8")
 
     s3_client.put_object(
         Bucket=config.S3_BUCKET,
@@ -22,3 +57,470 @@ def save_to_s3(json_data):
     )
     print(f"✅ Uploaded to s3://{config.S3_BUCKET}/{file_name}")
     return file_name
+
+
+COMPRESSION_SUFFIX = {"gzip": ".gz", "zstd": ".zst"}
+_CONTENT_ENCODING = {"gzip": "gzip", "zstd": "zstd"}
+
+
+def _iter_json_array(data):
+    """Serialise records, record batches or frames as one JSON array, piece by piece."""
+    if isinstance(data, dict) and data.get("format") == COLUMNAR_FORMAT:
+        data = [from_columnar(data)]
+    elif isinstance(data, (pd.DataFrame, dict)) or (isinstance(data, list) and (not data or isinstance(data[0], dict))):
+        data = [data]
+    yield b"["
+    first = True
+    for batch in data:
+        if isinstance(batch, pd.DataFrame):
+            if batch.empty:
+                continue
+            body = batch.to_json(orient="records")[1:-1]
+        elif isinstance(batch, dict):
+            body = json.dumps(batch)
+        else:
+            if not batch:
+                continue
+            body = ",".join(json.dumps(record) for record in batch)
+        yield (b"" if first else b",") + body.encode("utf-8")
+        first = False
+    yield b"]"
+
+
+class _MultipartWriter:
+    """File-like sink that cuts compressed bytes into parts and uploads them in parallel."""
+
+    def __init__(self, s3_client, bucket, key, upload_id, part_size, max_workers):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.upload_id = upload_id
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.parts = []
+        self.bytes_written = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        # At most 2 * max_workers parts are buffered in memory at once.
+        self._slots = threading.BoundedSemaphore(2 * max_workers)
+        self._futures = []
+
+    def write(self, data):
+        self.buffer += data
+        self.bytes_written += len(data)
+        while len(self.buffer) >= self.part_size:
+            self._submit(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _upload(self, number, body):
+        try:
+            res = self.s3_client.upload_part(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=body
+            )
+            return {"PartNumber": number, "ETag": res["ETag"]}
+        finally:
+            self._slots.release()
+
+    def _submit(self, body):
+        for future in self._futures:
+            if future.done() and future.exception():
+                raise future.exception()
+        self._slots.acquire()
+        self._futures.append(self._pool.submit(self._upload, len(self._futures) + 1, body))
+
+    def finish(self):
+        """Upload the remaining bytes and return the completed part list."""
+        if self.buffer or not self._futures:
+            self._submit(bytes(self.buffer))
+            self.buffer.clear()
+        try:
+            return [future.result() for future in self._futures]
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def upload_json_stream(data, bucket, key, s3_client, compression=None, part_size=None, max_workers=None):
+    """Stream records into a compressed S3 multipart upload without building the document in memory.
+
+    `data` is a list of records, a frame, a columnar payload or an iterable
+    of record batches (frames or record lists); it is written as one JSON
+    array through gzip or zstd. Parts of `part_size` bytes (S3 requires at
+    least 5 MiB for all but the last part) are uploaded by `max_workers`
+    threads. Any failure aborts the multipart upload before re-raising.
+    Returns {"key", "parts", "raw_bytes", "compressed_bytes"}.
+    """
+    compression = compression or config.UPLOAD_COMPRESSION
+    part_size = part_size or config.UPLOAD_PART_SIZE
+    max_workers = max_workers or config.UPLOAD_MAX_WORKERS
+    if compression not in COMPRESSION_SUFFIX:
+        raise ValueError(f"Unsupported compression {compression!r}; use 'gzip' or 'zstd'")
+    if compression == "zstd" and zstandard is None:
+        raise ImportError("compression='zstd' requires the zstandard package")
+
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=bucket, Key=key, ContentType="application/json",
+        ContentEncoding=_CONTENT_ENCODING[compression],
+    )["UploadId"]
+    sink = _MultipartWriter(s3_client, bucket, key, upload_id, part_size, max_workers)
+    raw_bytes = 0
+    try:
+        if compression == "gzip":
+            compressor = gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=6)
+        else:
+            compressor = zstandard.ZstdCompressor(level=3).stream_writer(sink, closefd=False)
+        with compressor:
+            for piece in _iter_json_array(data):
+                compressor.write(piece)
+                raw_bytes += len(piece)
+        parts = sink.finish()
+        s3_client.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+    except BaseException:
+        sink.close()
+        s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        logger.error(f"Aborted multipart upload of s3://{bucket}/{key}")
+        raise
+    logger.info(f"Uploaded s3://{bucket}/{key}: {raw_bytes} bytes as {sink.bytes_written} "
+                f"{compression} bytes in {len(parts)} parts")
+    return {"key": key, "parts": len(parts), "raw_bytes": raw_bytes, "compressed_bytes": sink.bytes_written}
+
+
+def _delete_prefix(s3_client, bucket, prefix):
+    """Delete every object under `prefix`; returns the number deleted."""
+    deleted, token = 0, None
+    while True:
+        kwargs = {"Bucket": bucket, "Prefix": prefix}
+        if token:
+            kwargs["ContinuationToken"] = token
+        listing = s3_client.list_objects_v2(**kwargs)
+        keys = [{"Key": obj["Key"]} for obj in listing.get("Contents", [])]
+        if keys:
+            s3_client.delete_objects(Bucket=bucket, Delete={"Objects": keys, "Quiet": True})
+            deleted += len(keys)
+        if not listing.get("IsTruncated"):
+            return deleted
+        token = listing["NextContinuationToken"]
+
+
+def save_batches_to_s3(batches):
+    """Upload a stream of record batches as numbered parts, one batch in memory at a time.
+
+    Each batch (a long frame or list of records) is dictionary-encoded and
+    written to metrics_<date>/part-NNNNN.json. Parts left by an earlier run
+    on the same day are deleted first. Returns the uploaded keys.
+    """
+    session = boto3.session.Session(profile_name=config.AWS_PROFILE)
+    s3_client = session.client("s3")
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d")
+    prefix = f"{config.S3_FOLDER}/metrics_{timestamp}/"
+    removed = _delete_prefix(s3_client, config.S3_BUCKET, prefix)
+    if removed:
+        logger.info(f"Removed {removed} parts of an earlier run from s3://{config.S3_BUCKET}/{prefix}")
+    keys, rows = [], 0
+    for batch in batches:
+        key = f"{prefix}part-{len(keys):05d}.json"
+        s3_client.put_object(
+            Bucket=config.S3_BUCKET,
+            Key=key,
+            Body=json.dumps(to_columnar(batch), separators=(",", ":")).encode("utf-8"),
+            ContentType="application/json"
+        )
+        keys.append(key)
+        rows += len(batch)
+    logger.info(f"Uploaded {rows} rows in {len(keys)} parts to s3://{config.S3_BUCKET}/{config.S3_FOLDER}/metrics_{timestamp}/")
+    return keys
+
+
+def _s3_filesystem():
+    """pyarrow S3 filesystem using the pipeline's boto3 profile credentials."""
+    session = boto3.session.Session(profile_name=config.AWS_PROFILE)
+    credentials = session.get_credentials().get_frozen_credentials()
+    return pafs.S3FileSystem(
+        access_key=credentials.access_key,
+        secret_key=credentials.secret_key,
+        session_token=credentials.token,
+        region=session.region_name,
+    )
+
+
+def resolve_target(root, filesystem=None):
+    """(filesystem, path) for an s3:// or file:// URI or a local directory.
+
+    With an explicit pyarrow `filesystem`, `root` is already a path on it
+    and is returned unchanged.
+    """
+    if filesystem is not None:
+        return filesystem, root
+    if root.startswith("s3://"):
+        return _s3_filesystem(), root[len("s3://"):]
+    if root.startswith("file://"):
+        root = root[len("file://"):]
+    return pafs.LocalFileSystem(), os.path.abspath(root)
+
+
+def _to_arrow(batch):
+    """Long metrics (frame, records or columnar payload) as an Arrow table with dictionary-encoded labels."""
+    if isinstance(batch, dict) and batch.get("format") == COLUMNAR_FORMAT:
+        batch = from_columnar(batch)
+    elif not isinstance(batch, pd.DataFrame):
+        batch = pd.DataFrame(batch, columns=["year", "metric", "value", "ticker"])
+    return pa.table({
+        "ticker": pa.array(batch["ticker"].astype(str).to_numpy(dtype=object), pa.string()).dictionary_encode(),
+        "year": pa.array(batch["year"].to_numpy(), pa.int32()),
+        "metric": pa.array(batch["metric"].astype(str).to_numpy(dtype=object), pa.string()).dictionary_encode(),
+        "value": pa.array(batch["value"].to_numpy(dtype=float), pa.float64()),
+    })
+
+
+def write_parquet_partitions(batches, root, partition_by=None, compression=None, filesystem=None):
+    """Write a stream of metric batches as a hive-partitioned Parquet dataset.
+
+    Partitions default to config.PARQUET_PARTITION_BY (fiscal year, then
+    metric or ticker); ticker and metric are dictionary-encoded and pages are
+    compressed with config.PARQUET_COMPRESSION. Each batch is written as its
+    own part files, so batches are never concatenated in memory. Anything
+    already under `root` (e.g. an earlier run the same day) is deleted
+    first, so the dataset holds exactly this run's rows. Returns {"root",
+    "files", "rows"}.
+    """
+    partition_by = list(partition_by or config.PARQUET_PARTITION_BY)
+    compression = compression or config.PARQUET_COMPRESSION
+    filesystem, path = resolve_target(root, filesystem)
+    filesystem.delete_dir_contents(path, missing_dir_ok=True)
+    fmt = ds.ParquetFileFormat()
+    options = fmt.make_write_options(compression=compression, use_dictionary=True)
+    files, rows = [], 0
+
+    if isinstance(batches, (pd.DataFrame, dict)):
+        batches = [batches]
+    for i, batch in enumerate(batches):
+        table = _to_arrow(batch)
+        if not table.num_rows:
+            continue
+        ds.write_dataset(
+            table, path, format=fmt, file_options=options, filesystem=filesystem,
+            partitioning=partition_by, partitioning_flavor="hive",
+            basename_template=f"part-{i:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_visitor=lambda written: files.append(written.path),
+        )
+        rows += table.num_rows
+    logger.info(f"Wrote {rows} rows to {len(files)} Parquet files under {root}")
+    return {"root": root, "files": files, "rows": rows}
+
+
+def save_to_s3_parquet(batches):
+    """Upload metrics as a partitioned Parquet dataset under s3://<bucket>/<folder>/metrics_<date>.parquet/."""
+    timestamp = datetime.datetime.now().strftime("%Y%m%d")
+    root = f"s3://{config.S3_BUCKET}/{config.S3_FOLDER}/metrics_{timestamp}.parquet"
+    return write_parquet_partitions(batches, root)
+
+
+def read_parquet_partitions(root, columns=None, filters=None, filesystem=None):
+    """Read a dataset written by write_parquet_partitions, pruning columns and partitions.
+
+    `filters` is a pyarrow.dataset expression, e.g.
+    ds.field("year") >= 2020; partition filters skip whole directories.
+    """
+    filesystem, path = resolve_target(root, filesystem)
+    dataset = ds.dataset(path, format="parquet", partitioning="hive", filesystem=filesystem)
+    return dataset.to_table(columns=columns, filter=filters).to_pandas()
+
+
+_LATEST_MANIFEST = "manifests/latest.json"
+
+
+def read_bytes(filesystem, path):
+    """Raw contents of `path`, or None when it does not exist.
+
+    Any other error (network, credentials, throttling) propagates, so a
+    transient failure is never mistaken for missing state.
+    """
+    try:
+        with filesystem.open_input_stream(path, compression=None) as fh:
+            return fh.read()
+    except FileNotFoundError:
+        return None
+
+
+def _read_json(filesystem, path):
+    """Decoded JSON at `path`, or None when it does not exist.
+
+    Only a missing file counts: treating a read error as "no manifest" would
+    restart the history at version 1.
+    """
+    body = read_bytes(filesystem, path)
+    return None if body is None else json.loads(body)
+
+
+def write_bytes(filesystem, path, body, atomic=False):
+    """Write one object; with atomic=True readers never see a partial file.
+
+    A single S3 PUT is already atomic; on a local filesystem the body is
+    written to a temporary file and renamed into place.
+    """
+    if isinstance(filesystem, pafs.LocalFileSystem):
+        filesystem.create_dir(path.rsplit("/", 1)[0], recursive=True)
+        if atomic:
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with filesystem.open_output_stream(tmp, compression=None) as out:
+                out.write(body)
+            filesystem.move(tmp, path)
+            return
+    with filesystem.open_output_stream(path, compression=None) as out:
+        out.write(body)
+
+
+def partition_hashes(frame, partition_by=None):
+    """Content hash of every partition of a long metrics frame.
+
+    Rows are sorted on the partition columns and metric, hashed row-wise
+    with pandas' vectorised hasher, and each partition's sha256 covers its
+    row hashes in that order. Returns (sorted frame, {key: (sha256, start,
+    stop, values)}) where key is e.g. "AAPL/2023", start:stop slices the
+    sorted frame and values are the partition column values.
+    """
+    partition_by = list(partition_by or config.DELTA_PARTITION_BY)
+    frame = frame[["ticker", "year", "metric", "value"]].astype({"ticker": str, "metric": str, "value": float})
+    frame = frame.sort_values(partition_by + ["metric"], kind="stable").reset_index(drop=True)
+    row_hashes = pd.util.hash_pandas_object(frame[["metric", "value"]], index=False).to_numpy()
+    codes = np.column_stack([pd.factorize(frame[col])[0] for col in partition_by])
+    starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]).any(axis=1)])
+    stops = np.r_[starts[1:], len(frame)]
+    key_values = frame.loc[starts, partition_by].astype(str).to_numpy()
+    partitions = {}
+    for values, start, stop in zip(key_values, starts, stops):
+        key = "/".join(values)
+        digest = hashlib.sha256(key.encode("utf-8") + row_hashes[start:stop].tobytes()).hexdigest()
+        partitions[key] = (digest, int(start), int(stop), tuple(values))
+    return frame, partitions
+
+
+def load_manifest(root=None, version=None, filesystem=None):
+    """The latest (or a given) published manifest, or None before the first load."""
+    filesystem, path = resolve_target(root or config.DELTA_ROOT, filesystem)
+    return _load_manifest_at(filesystem, path, version)
+
+
+def _load_manifest_at(filesystem, path, version=None):
+    if version is None:
+        latest = _read_json(filesystem, f"{path}/{_LATEST_MANIFEST}")
+        if latest is None:
+            return None
+        version = latest["version"]
+    return _read_json(filesystem, f"{path}/manifests/v{version:06d}.json")
+
+
+def partition_ticker(relative_path):
+    """Ticker of a manifest partition path (partitions/ticker=X/year=Y/<hash>.parquet), or None."""
+    for part in relative_path.split("/"):
+        if part.startswith("ticker="):
+            return unquote(part[len("ticker="):])
+    return None
+
+
+def load_delta(frames, root=None, partition_by=None, filesystem=None, remove_tickers=()):
+    """Upload only partitions whose content changed, then publish a new manifest version.
+
+    `frames` is a frame or an iterable of frames (e.g. one per shard); every
+    partition's rows must arrive in the same frame. Partition files are
+    content-addressed (partitions/ticker=X/year=Y/<hash>.parquet) and never
+    overwritten, so a reader holding an older manifest keeps a consistent
+    view. Each manifest version is an immutable manifests/vNNNNNN.json;
+    manifests/latest.json is switched to it last, in one atomic write.
+
+    When partitioned by ticker, a run only replaces the tickers it contains:
+    their partitions missing from the run are removed, while tickers absent
+    from the run (e.g. a failed fetch) are carried forward unchanged. Whole
+    tickers are deleted only when listed in `remove_tickers`. Without a
+    ticker partition column every run replaces the whole view.
+    Returns {"version", "partitions", "uploaded", "unchanged", "removed"}.
+    """
+    root = root or config.DELTA_ROOT
+    partition_by = list(partition_by or config.DELTA_PARTITION_BY)
+    filesystem, path = resolve_target(root, filesystem)
+    previous = _load_manifest_at(filesystem, path)
+    previous_parts = previous["partitions"] if previous and previous.get("partition_by") == partition_by else {}
+
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    partitions, uploaded, seen_tickers = {}, 0, set()
+    for frame in frames:
+        if frame is None or frame.empty:
+            continue
+        frame, hashes = partition_hashes(frame, partition_by)
+        table = None
+        for key, (digest, start, stop, values) in hashes.items():
+            if "ticker" in partition_by:
+                seen_tickers.add(values[partition_by.index("ticker")])
+            old = previous_parts.get(key)
+            if old and old["sha256"] == digest:
+                partitions[key] = old
+                continue
+            part_dir = "/".join(f"{col}={quote(value, safe='')}" for col, value in zip(partition_by, values))
+            relative = f"partitions/{part_dir}/{digest[:16]}.parquet"
+            # Converted once per frame; partitions are zero-copy slices. Plain
+            # strings, so each file gets its own (small) Parquet dictionary
+            # instead of the frame-wide Arrow one.
+            if table is None:
+                table = _to_arrow(frame)
+                table = table.cast(pa.schema([
+                    (field.name, field.type.value_type if pa.types.is_dictionary(field.type) else field.type)
+                    for field in table.schema
+                ]))
+            sink = pa.BufferOutputStream()
+            pq.write_table(table.slice(start, stop - start), sink, compression=config.PARQUET_COMPRESSION)
+            write_bytes(filesystem, f"{path}/{relative}", sink.getvalue().to_pybytes())
+            partitions[key] = {"path": relative, "sha256": digest, "rows": stop - start}
+            uploaded += 1
+
+    if "ticker" in partition_by:
+        dropped = seen_tickers | set(remove_tickers)
+        for key, old in previous_parts.items():
+            if key not in partitions and partition_ticker(old["path"]) not in dropped:
+                partitions[key] = old
+
+    stats = {
+        "version": previous["version"] if previous else 0,
+        "partitions": len(partitions),
+        "uploaded": uploaded,
+        "unchanged": len(partitions) - uploaded,
+        "removed": len(set(previous_parts) - set(partitions)),
+    }
+    if previous and not uploaded and not stats["removed"]:
+        logger.info(f"Delta load: no partition changed; manifest stays at v{stats['version']}")
+        return stats
+
+    stats["version"] += 1
+    manifest = {
+        "version": stats["version"],
+        "parent": previous["version"] if previous else None,
+        "created_at": time.time(),
+        "partition_by": partition_by,
+        "partitions": partitions,
+    }
+    write_bytes(filesystem, f"{path}/manifests/v{stats['version']:06d}.json", json.dumps(manifest).encode("utf-8"))
+    write_bytes(filesystem, f"{path}/{_LATEST_MANIFEST}",
+                 json.dumps({"version": stats["version"]}).encode("utf-8"), atomic=True)
+    logger.info(f"Delta load: published v{stats['version']} with {stats['uploaded']} changed, "
+                f"{stats['unchanged']} unchanged and {stats['removed']} removed partitions")
+    return stats
+
+
+def read_latest(root=None, columns=None, version=None, filesystem=None):
+    """Read the metrics referenced by the latest (or a given) manifest version."""
+    filesystem, path = resolve_target(root or config.DELTA_ROOT, filesystem)
+    manifest = _load_manifest_at(filesystem, path, version)
+    files = [f"{path}/{part['path']}" for part in (manifest or {}).get("partitions", {}).values()]
+    if not files:
+        return pd.DataFrame(columns=columns or ["ticker", "year", "metric", "value"])
+    dataset = ds.dataset(files, format="parquet", filesystem=filesystem)
+    return dataset.to_table(columns=columns).to_pandas()
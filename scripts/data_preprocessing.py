@@ -1,8 +1,13 @@
+import hashlib
+import json
+import os
 import pandas as pd
 import numpy as np
-from utils.helpers import safe_div
+from concurrent.futures import ProcessPoolExecutor
 from scripts import config
+from scripts import derived_metrics
 from utils.helpers import setup_logger
+from utils.result_cache import ResultCache
 logger = setup_logger()
 
 def process_company_data(ticker, facts):
@@ -14,7 +19,7 @@ def process_company_data(ticker, facts):
             continue
         val_list = facts.get("facts", {}).get("us-gaap", {}).get(tag, {}).get("units", {}).get("USD", [])
         for v in val_list:
-            if v.get("form") == "10-K" and v.get("fp") == "FY":
+            if v.get("form") in config.ANNUAL_FORMS and v.get("fp") == "FY":
                 entry = {
                     "company": ticker,
                     "ticker": ticker,
@@ -22,18 +27,513 @@ def process_company_data(ticker, facts):
                     "metric": label,
                     "value": v.get("val"),
                     "unit": tag_info.get("unit", "USD"),
-                    "description": tag_info.get("description", "")
+                    "description": tag_info.get("description", ""),
+                    "start": v.get("start"),
+                    "end": v.get("end"),
+                    "filed": v.get("filed"),
+                    "accn": v.get("accn")
                 }
                 data.append(entry)
     df = pd.DataFrame(data)
     if df.empty:
         return []
 
+    resolved = resolve_duplicates(df)
+    if resolved.empty:
+        return []
+
     # Derived metrics
-    df_pivot = df.pivot_table(index="year", columns="metric", values="value", aggfunc="last").reset_index()
-    df_pivot["Return on Assets (ROA) %"] = safe_div(df_pivot["income_stmt_Net Income"], df_pivot["balance_sheet_Total Assets"]) * 100
-    df_pivot["Gross Profit Margin %"] = safe_div(df_pivot["income_stmt_Gross Profit"], df_pivot["income_stmt_Revenue"]) * 100
+    df_pivot = unstack_metrics(resolved)
+    inputs = {col: df_pivot[col].to_numpy() for col in df_pivot.columns if col != "year"}
+    for label, values in derived_metrics.get_compiler().evaluate(inputs).items():
+        df_pivot[label] = values
 
     processed_data = df_pivot.melt(id_vars=["year"], var_name="metric", value_name="value")
     processed_data["ticker"] = ticker
     return processed_data.to_dict(orient="records")
+
+
+def _sort_codes(obs, name):
+    """Sorted integer codes for a text column (-1 where missing) and its uniques."""
+    if name not in obs:
+        return np.full(len(obs), -1, dtype=np.int64), np.array([], dtype=object)
+    return pd.factorize(obs[name].to_numpy(dtype=object), sort=True)
+
+
+def _day_numbers(codes, uniques):
+    """Days since epoch for ISO dates encoded as (codes, uniques); NaN where missing."""
+    dates = np.array(list(uniques) + ["NaT"], dtype="datetime64[D]")
+    days = dates.astype(np.int64).astype(float)
+    days[np.isnat(dates)] = np.nan
+    return days[codes]
+
+
+def _group_codes(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy()
+    return pd.factorize(column.to_numpy(dtype=object))[0]
+
+
+def resolve_duplicates(obs):
+    """Pick one deterministic value per (ticker, metric, fiscal year).
+
+    The same period is reported by its original 10-K, as a comparative in
+    later 10-Ks, and in 10-K/A amendments. Observations are sorted once on
+    (ticker, metric, end, filed, accn). Per period end the latest-filed value
+    wins, labelled with the fiscal year of the earliest filing (the period's
+    own 10-K). Durations shorter than config.MIN_ANNUAL_DURATION_DAYS (e.g. a
+    Q4-only figure inside a 10-K) are dropped. Observations without `end`
+    are grouped by fiscal year and keep their arrival order, as before.
+    """
+    values = pd.to_numeric(obs["value"], errors="coerce").to_numpy(dtype=float)
+    years = obs["year"].to_numpy(dtype=np.int64)
+    end_codes, end_uniques = _sort_codes(obs, "end")
+    start_codes, start_uniques = _sort_codes(obs, "start")
+    keep = ~np.isnan(values)
+    if len(start_uniques):
+        duration = _day_numbers(end_codes, end_uniques) - _day_numbers(start_codes, start_uniques)
+        keep &= ~(duration < config.MIN_ANNUAL_DURATION_DAYS)
+
+    rows = np.flatnonzero(keep)
+    if not len(rows):
+        return pd.DataFrame({"ticker": obs["ticker"].array[:0], "metric": obs["metric"].array[:0],
+                             "year": np.array([], dtype=np.int64), "value": np.array([], dtype=float)})
+
+    # Observations without an end date group by fiscal year, after every real end.
+    period = np.where(end_codes >= 0, end_codes, len(end_uniques) + years - years.min())
+    ticker_codes = _group_codes(obs["ticker"])
+    metric_codes = _group_codes(obs["metric"])
+    order = rows[np.lexsort((
+        _sort_codes(obs, "accn")[0][rows], _sort_codes(obs, "filed")[0][rows],
+        period[rows], metric_codes[rows], ticker_codes[rows],
+    ))]
+
+    new_group = np.r_[True, (ticker_codes[order][1:] != ticker_codes[order][:-1])
+                      | (metric_codes[order][1:] != metric_codes[order][:-1])
+                      | (period[order][1:] != period[order][:-1])]
+    first = order[new_group]
+    last = order[np.r_[new_group[1:], True]]
+
+    # Two period ends labelled with the same fiscal year (e.g. a fiscal-year
+    # change): the later period end wins. lexsort is stable, so within a year
+    # the rows stay in period-end order.
+    resolved_years = years[first]
+    by_year = np.lexsort((resolved_years, metric_codes[last], ticker_codes[last]))
+    t, m, y = ticker_codes[last][by_year], metric_codes[last][by_year], resolved_years[by_year]
+    winners = by_year[np.r_[(t[1:] != t[:-1]) | (m[1:] != m[:-1]) | (y[1:] != y[:-1]), True]]
+    return pd.DataFrame({
+        "ticker": obs["ticker"].array[last[winners]],
+        "metric": obs["metric"].array[last[winners]],
+        "year": resolved_years[winners],
+        "value": values[last[winners]],
+    })
+
+
+def unstack_metrics(resolved):
+    """Reshape one company's resolved (year, metric, value) rows into a year x metric frame.
+
+    Rows must be unique per (year, metric), as resolve_duplicates returns
+    them; values are scattered straight into the matrix with no aggregation.
+    """
+    years, year_idx = np.unique(resolved["year"].to_numpy(), return_inverse=True)
+    metrics, metric_idx = np.unique(resolved["metric"].to_numpy(dtype=object), return_inverse=True)
+    matrix = np.full((len(years), len(metrics)), np.nan)
+    matrix[year_idx, metric_idx] = resolved["value"].to_numpy()
+    wide = pd.DataFrame(matrix, columns=metrics.tolist())
+    wide.insert(0, "year", years)
+    return wide
+
+
+def _metric_columns():
+    """(label, tag, unit, description) for every XBRL_TAGS entry backed by a tag."""
+    return [
+        (label, info["tag"], info.get("unit", "USD"), info.get("description", ""))
+        for label, info in config.XBRL_TAGS.items() if info.get("tag")
+    ]
+
+
+def extract_observations_batch(raw_data):
+    """Flatten many companies' facts into columnar annual (10-K/FY) observations.
+
+    Returns a DataFrame with ticker, year, metric, value and the start, end,
+    filed and accn provenance columns (ticker and metric are categoricals),
+    in company, XBRL_TAGS and observation order, filtered with vectorised
+    masks.
+    """
+    tickers = list(raw_data)
+    metrics = _metric_columns()
+    ticker_codes, metric_codes, forms, fps, years, values = [], [], [], [], [], []
+    starts, ends, filed, accns = [], [], [], []
+
+    for t_code, ticker in enumerate(tickers):
+        us_gaap = raw_data[ticker].get("facts", {}).get("us-gaap", {})
+        for m_code, (_, tag, _, _) in enumerate(metrics):
+            val_list = us_gaap.get(tag, {}).get("units", {}).get("USD", [])
+            if not val_list:
+                continue
+            n = len(val_list)
+            ticker_codes.append(np.full(n, t_code, dtype=np.int32))
+            metric_codes.append(np.full(n, m_code, dtype=np.int16))
+            forms.extend([v.get("form") for v in val_list])
+            fps.extend([v.get("fp") for v in val_list])
+            years.extend([v.get("fy") for v in val_list])
+            values.extend([v.get("val") for v in val_list])
+            starts.extend([v.get("start") for v in val_list])
+            ends.extend([v.get("end") for v in val_list])
+            filed.extend([v.get("filed") for v in val_list])
+            accns.extend([v.get("accn") for v in val_list])
+
+    if not forms:
+        return pd.DataFrame({"ticker": [], "year": [], "metric": [], "value": []})
+
+    mask = np.isin(np.asarray(forms, dtype=object), config.ANNUAL_FORMS) & (np.asarray(fps, dtype=object) == "FY")
+    return pd.DataFrame({
+        "ticker": pd.Categorical.from_codes(np.concatenate(ticker_codes)[mask], categories=tickers),
+        "year": np.asarray(years, dtype=object)[mask].astype(np.int64),
+        "metric": pd.Categorical.from_codes(np.concatenate(metric_codes)[mask], categories=[m[0] for m in metrics]),
+        "value": pd.to_numeric(pd.Series(np.asarray(values, dtype=object)[mask]), errors="coerce").to_numpy(),
+        "start": np.asarray(starts, dtype=object)[mask],
+        "end": np.asarray(ends, dtype=object)[mask],
+        "filed": np.asarray(filed, dtype=object)[mask],
+        "accn": np.asarray(accns, dtype=object)[mask],
+    })
+
+
+_FRAME_COLUMNS = ["year", "metric", "value", "ticker"]
+
+
+def process_companies_batch(raw_data):
+    """Batch equivalent of calling process_company_data for every ticker in raw_data.
+
+    Returns the same records in the same order.
+    """
+    frame = process_companies_frame(raw_data)
+    return frame.to_dict(orient="records") if not frame.empty else []
+
+
+def process_companies_frame(raw_data):
+    """Columnar form of process_companies_batch (year, metric, value, ticker)."""
+    obs = extract_observations_batch(raw_data)
+    if obs.empty:
+        return pd.DataFrame({col: [] for col in _FRAME_COLUMNS})
+
+    obs = resolve_duplicates(obs)
+    if obs.empty:
+        return pd.DataFrame({col: [] for col in _FRAME_COLUMNS})
+
+    t_codes = obs["ticker"].cat.codes.to_numpy()
+    m_codes = obs["metric"].cat.codes.to_numpy()
+    metric_names = np.asarray(obs["metric"].cat.categories, dtype=object)
+
+    # Columns in pivot order: present metrics sorted by name, then the derived ones.
+    present = np.unique(m_codes)
+    base_cols = present[np.argsort(metric_names[present])]
+    col_of_metric = np.full(len(metric_names), -1, dtype=np.int64)
+    col_of_metric[base_cols] = np.arange(len(base_cols))
+    base_labels = list(metric_names[base_cols])
+    compiler = derived_metrics.get_compiler()
+    derived = compiler.resolvable(base_labels)
+    columns = base_labels + derived
+
+    # Wide matrix rows: one per (ticker, year), sorted by ticker code then year.
+    keys = pd.DataFrame({"t": t_codes, "y": obs["year"].to_numpy()}).drop_duplicates().sort_values(["t", "y"])
+    row_t, row_y = keys["t"].to_numpy(), keys["y"].to_numpy()
+    row_index = pd.MultiIndex.from_arrays([row_t, row_y])
+    rows = row_index.get_indexer(pd.MultiIndex.from_arrays([t_codes, obs["year"].to_numpy()]))
+
+    wide = np.full((len(row_t), len(columns)), np.nan)
+    wide[rows, col_of_metric[m_codes]] = obs["value"].to_numpy(dtype=float)
+
+    values = compiler.evaluate({label: wide[:, i] for i, label in enumerate(base_labels)})
+    for label in derived:
+        wide[:, columns.index(label)] = values[label]
+
+    # Long output: for each ticker, each metric it reported, each of its years. A
+    # derived metric is emitted only for tickers that reported all of its inputs.
+    n_tickers = len(obs["ticker"].cat.categories)
+    has_metric = np.zeros((n_tickers, len(columns)), dtype=bool)
+    has_metric[t_codes, col_of_metric[m_codes]] = True
+    for label in derived:
+        deps = [columns.index(dep) for dep in compiler.dependencies(label)]
+        has_metric[:, columns.index(label)] = has_metric[:, deps].all(axis=1)
+
+    block_start = np.searchsorted(row_t, np.arange(n_tickers), side="left")
+    block_len = np.searchsorted(row_t, np.arange(n_tickers), side="right") - block_start
+    pair_t, pair_c = np.nonzero(has_metric)
+    lengths = block_len[pair_t]
+    pair_id = np.repeat(np.arange(len(pair_t)), lengths)
+    offset = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    out_rows = block_start[pair_t][pair_id] + offset
+    out_cols = pair_c[pair_id]
+
+    processed = pd.DataFrame({
+        "year": row_y[out_rows],
+        "metric": np.asarray(columns, dtype=object)[out_cols],
+        "value": wide[out_rows, out_cols],
+        "ticker": np.asarray(obs["ticker"].cat.categories, dtype=object)[pair_t[pair_id]],
+    })
+    return processed
+
+
+def _facts_size(facts):
+    """Number of configured-tag observations; a proxy for preprocessing cost."""
+    us_gaap = facts.get("facts", {}).get("us-gaap", {})
+    return sum(len(us_gaap.get(tag, {}).get("units", {}).get("USD", [])) for _, tag, _, _ in _metric_columns())
+
+
+def _slice_facts(facts):
+    """Only the USD observations of configured tags, to keep worker payloads small."""
+    us_gaap = facts.get("facts", {}).get("us-gaap", {})
+    return {"facts": {"us-gaap": {
+        tag: {"units": {"USD": us_gaap[tag].get("units", {}).get("USD", [])}}
+        for _, tag, _, _ in _metric_columns() if tag in us_gaap
+    }}}
+
+
+def balance_chunks(sizes, n_chunks):
+    """Split {ticker: size} into n_chunks lists with similar total size.
+
+    Largest-first greedy assignment to the lightest chunk, so the biggest
+    filers land in different chunks. Each chunk keeps input order.
+    """
+    position = {ticker: i for i, ticker in enumerate(sizes)}
+    chunks = [[] for _ in range(max(1, min(n_chunks, len(sizes))))]
+    loads = [0] * len(chunks)
+    for ticker in sorted(sizes, key=lambda t: (-sizes[t], position[t])):
+        lightest = loads.index(min(loads))
+        chunks[lightest].append(ticker)
+        loads[lightest] += sizes[ticker]
+    return [sorted(chunk, key=position.get) for chunk in chunks if chunk]
+
+
+def _process_chunk(chunk_raw):
+    frame = process_companies_frame(chunk_raw)
+    # Categoricals keep the pickled result compact: one copy of each label.
+    frame["metric"] = frame["metric"].astype("category")
+    frame["ticker"] = frame["ticker"].astype("category")
+    return frame
+
+
+def process_companies_parallel(raw_data, max_workers=None, chunks_per_worker=None, as_frame=False):
+    """Process-pool variant of process_companies_batch with identical output order.
+
+    Companies are spread over size-balanced chunks; workers return columnar
+    DataFrames that are concatenated and put back in input ticker order.
+    """
+    max_workers = max_workers or config.PREPROCESS_MAX_WORKERS or os.cpu_count() or 1
+    chunks_per_worker = chunks_per_worker or config.PREPROCESS_CHUNKS_PER_WORKER
+    sizes = {ticker: _facts_size(facts) for ticker, facts in raw_data.items()}
+    chunks = balance_chunks(sizes, max_workers * chunks_per_worker)
+
+    if max_workers == 1 or len(chunks) <= 1:
+        frames = [_process_chunk({t: raw_data[t] for t in chunk}) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            frames = list(pool.map(_process_chunk, [{t: _slice_facts(raw_data[t]) for t in chunk} for chunk in chunks]))
+
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        frame = pd.DataFrame({col: [] for col in _FRAME_COLUMNS})
+    else:
+        frame = pd.concat(frames, ignore_index=True)
+        position = {ticker: i for i, ticker in enumerate(raw_data)}
+        order = np.argsort(frame["ticker"].map(position).to_numpy(dtype=np.int64), kind="stable")
+        frame = frame.iloc[order].reset_index(drop=True)
+        frame["metric"] = np.asarray(frame["metric"], dtype=object)
+        frame["ticker"] = np.asarray(frame["ticker"], dtype=object)
+
+    if as_frame:
+        return frame
+    return frame.to_dict(orient="records") if not frame.empty else []
+
+
+# Bump when preprocessing logic changes so memoised results are recomputed.
+_RESULT_VERSION = 1
+
+
+def definition_version():
+    """Hash of everything besides the facts that shapes a company's output."""
+    definition = {
+        "version": _RESULT_VERSION,
+        "xbrl_tags": config.XBRL_TAGS,
+        "annual_forms": list(config.ANNUAL_FORMS),
+        "min_annual_duration_days": config.MIN_ANNUAL_DURATION_DAYS,
+    }
+    return hashlib.sha256(json.dumps(definition, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def company_cache_key(facts, version=None):
+    """Content hash of the configured-tag slice of `facts` plus the definition version."""
+    digest = hashlib.sha256((version or definition_version()).encode("utf-8"))
+    digest.update(json.dumps(_slice_facts(facts), sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def enable_result_cache(cache_dir=None, max_bytes=None):
+    """Build the persistent per-company result cache from config."""
+    return ResultCache(
+        cache_dir or config.PREPROCESS_CACHE_DIR,
+        max_bytes=max_bytes or config.PREPROCESS_CACHE_MAX_BYTES,
+    )
+
+
+def process_companies_cached(raw_data, cache=None, **parallel_kwargs):
+    """process_companies_parallel(as_frame=True) with per-company memoisation.
+
+    Each company's output is stored under company_cache_key, so companies
+    whose relevant facts and metric definitions are unchanged since an
+    earlier run are not recomputed. The ticker is not part of the key, and
+    the output keeps input ticker order.
+    """
+    cache = cache or enable_result_cache()
+    version = definition_version()
+    keys = {ticker: company_cache_key(facts, version) for ticker, facts in raw_data.items()}
+    cached = {ticker: cache.get(key) for ticker, key in keys.items()}
+    misses = {ticker: raw_data[ticker] for ticker, result in cached.items() if result is None}
+
+    if misses:
+        computed = process_companies_parallel(misses, as_frame=True, **parallel_kwargs)
+        for ticker, rows in computed.groupby("ticker", sort=False):
+            values = rows["value"].to_numpy(dtype=float)
+            cached[ticker] = {
+                "year": rows["year"].to_numpy(dtype=np.int64).tolist(),
+                "metric": rows["metric"].tolist(),
+                "value": np.where(np.isnan(values), None, values).tolist(),
+            }
+        for ticker in misses:
+            cached[ticker] = cached[ticker] or {"year": [], "metric": [], "value": []}
+            cache.put(keys[ticker], cached[ticker])
+
+    logger.info(f"Preprocessing cache: {len(raw_data) - len(misses)}/{len(raw_data)} companies reused "
+                f"(hit rate {cache.hit_rate():.1%}, stats {cache.stats})")
+    results = [cached[ticker] for ticker in raw_data]
+    frame = pd.DataFrame({
+        "year": np.array([y for r in results for y in r["year"]], dtype=np.int64),
+        "metric": np.array([m for r in results for m in r["metric"]], dtype=object),
+        "value": np.array([v for r in results for v in r["value"]], dtype=float),
+        "ticker": np.array([t for t, r in zip(raw_data, results) for _ in r["year"]], dtype=object),
+    })
+    return frame
+
+
+COLUMNAR_FORMAT = "columnar-v1"
+
+
+def metric_metadata():
+    """Side table of every configured metric, keyed by its id (position in XBRL_TAGS)."""
+    return [
+        {
+            "metric_id": i,
+            "metric": label,
+            "tag": info.get("tag"),
+            "formula": info.get("formula"),
+            "unit": info.get("unit", "USD"),
+            "theme": info.get("theme", ""),
+            "description": info.get("description", ""),
+        }
+        for i, (label, info) in enumerate(config.XBRL_TAGS.items())
+    ]
+
+
+def to_columnar(frame):
+    """Dictionary-encode long (year, metric, value, ticker) output.
+
+    Returns a JSON-serialisable payload: each ticker and metric label is
+    stored once (`tickers`, and the `metrics` side table from
+    metric_metadata()), and rows are four parallel arrays of ticker_id,
+    metric_id, year and value (None for missing values).
+    """
+    metrics = metric_metadata()
+    metric_ids = {m["metric"]: m["metric_id"] for m in metrics}
+    if isinstance(frame, list):
+        frame = pd.DataFrame(frame, columns=_FRAME_COLUMNS)
+    ticker_ids, tickers = pd.factorize(np.asarray(frame["ticker"], dtype=object))
+    unknown = set(frame["metric"].unique()) - metric_ids.keys()
+    if unknown:
+        raise ValueError(f"Metrics missing from config.XBRL_TAGS: {sorted(unknown)}")
+    values = frame["value"].to_numpy(dtype=float)
+    return {
+        "format": COLUMNAR_FORMAT,
+        "tickers": tickers.tolist(),
+        "metrics": metrics,
+        "ticker_id": ticker_ids.tolist(),
+        "metric_id": frame["metric"].map(metric_ids).to_numpy(dtype=np.int64).tolist(),
+        "year": frame["year"].to_numpy(dtype=np.int64).tolist(),
+        "value": np.where(np.isnan(values), None, values).tolist(),
+    }
+
+
+def from_columnar(payload):
+    """Decode a to_columnar payload into a frame with categorical ticker and metric."""
+    if payload.get("format") != COLUMNAR_FORMAT:
+        raise ValueError(f"Unsupported columnar payload format: {payload.get('format')!r}")
+    labels = {m["metric_id"]: m["metric"] for m in payload["metrics"]}
+    metric_categories = [labels[i] for i in range(len(labels))]
+    return pd.DataFrame({
+        "year": np.asarray(payload["year"], dtype=np.int64),
+        "metric": pd.Categorical.from_codes(np.asarray(payload["metric_id"], dtype=np.int64), categories=metric_categories),
+        "value": np.asarray(payload["value"], dtype=float),
+        "ticker": pd.Categorical.from_codes(np.asarray(payload["ticker_id"], dtype=np.int64), categories=payload["tickers"]),
+    })
+
+
+def concat_columnar(payloads):
+    """Merge several to_columnar payloads (e.g. one per shard) into one."""
+    frames = [from_columnar(p) for p in payloads if p and p["ticker_id"]]
+    if not frames:
+        return to_columnar(pd.DataFrame({col: [] for col in _FRAME_COLUMNS}))
+    frame = pd.concat(frames, ignore_index=True)
+    frame["ticker"] = np.asarray(frame["ticker"], dtype=object)
+    frame["metric"] = np.asarray(frame["metric"], dtype=object)
+    return to_columnar(frame)
+
+
+def rebatch(frames, batch_size=None):
+    """Re-cut a stream of long frames into frames of exactly `batch_size` rows (the last may be shorter)."""
+    batch_size = batch_size or config.STREAM_BATCH_ROWS
+    pending, pending_rows = [], 0
+    for frame in frames:
+        if frame is None or frame.empty:
+            continue
+        pending.append(frame)
+        pending_rows += len(frame)
+        if pending_rows < batch_size:
+            continue
+        buffer = pd.concat(pending, ignore_index=True)
+        cut = len(buffer) - len(buffer) % batch_size
+        for start in range(0, cut, batch_size):
+            yield buffer.iloc[start:start + batch_size].reset_index(drop=True)
+        pending = [buffer.iloc[cut:].reset_index(drop=True)] if cut < len(buffer) else []
+        pending_rows = len(buffer) - cut
+    if pending_rows:
+        yield pd.concat(pending, ignore_index=True)
+
+
+def iter_processed_batches(companies, batch_size=None, group_size=None, cache=None):
+    """Streaming preprocessing: consume (ticker, facts) pairs, yield fixed-size record batches.
+
+    Companies are processed `group_size` at a time (with the result cache,
+    if given), so peak memory depends on the group and batch sizes rather
+    than on the universe. Batches are long frames (year, metric, value,
+    ticker) in input company order.
+    """
+    group_size = group_size or config.STREAM_GROUP_COMPANIES
+
+    def _groups():
+        group = {}
+        for ticker, facts in companies:
+            group[ticker] = facts
+            if len(group) >= group_size:
+                yield group
+                group = {}
+        if group:
+            yield group
+
+    def _frames():
+        for group in _groups():
+            if cache is not None:
+                yield process_companies_cached(group, cache, max_workers=1)
+            else:
+                yield process_companies_frame(group)
+
+    return rebatch(_frames(), batch_size)
@@ -0,0 +1,239 @@
+import json
+import numpy as np
+import pandas as pd
+from scripts import config
+from scripts.data_loading import read_bytes, resolve_target, write_bytes
+from utils.helpers import setup_logger
+logger = setup_logger()
+
+REQUIRED_COLUMNS = ("ticker", "year", "metric", "value")
+BLOCKING = "blocking"
+WARNING = "warning"
+_EXAMPLES = 5
+
+
+class DataQualityError(Exception):
+    """Raised when the quality gate finds blocking violations."""
+
+    def __init__(self, report):
+        self.report = report
+        failed = [v["check"] for v in report["violations"] if v["severity"] == BLOCKING]
+        super().__init__(f"Data quality gate failed: {', '.join(failed)}")
+
+
+def _codes(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), np.asarray(column.cat.categories, dtype=object)
+    return pd.factorize(column.to_numpy(dtype=object))
+
+
+def _violation(check, severity, mask_or_count, frame=None, detail=None):
+    count = int(mask_or_count if np.isscalar(mask_or_count) else np.count_nonzero(mask_or_count))
+    violation = {"check": check, "severity": severity, "count": count}
+    if frame is not None and count and not np.isscalar(mask_or_count):
+        rows = frame.loc[mask_or_count, [c for c in REQUIRED_COLUMNS if c in frame]].head(_EXAMPLES)
+        violation["examples"] = json.loads(rows.astype(object).to_json(orient="records"))
+    if detail is not None:
+        violation["detail"] = detail
+    return violation
+
+
+def check_frame(frame, year_range=None):
+    """Run the row-level checks on a long (ticker, year, metric, value) frame.
+
+    Every check is a vectorised mask or a count over integer codes. Returns
+    the violations found (an empty list when the frame is clean).
+    """
+    year_range = year_range or config.DQ_YEAR_RANGE
+    missing = [c for c in REQUIRED_COLUMNS if c not in frame]
+    if missing:
+        return [_violation("schema", BLOCKING, len(missing), detail=f"missing columns {missing}")]
+    if frame.empty:
+        return []
+
+    violations = []
+    ticker_codes, _ = _codes(frame["ticker"])
+    metric_codes, metric_names = _codes(frame["metric"])
+    years = pd.to_numeric(frame["year"], errors="coerce").to_numpy(dtype=float)
+    values = pd.to_numeric(frame["value"], errors="coerce").to_numpy(dtype=float)
+
+    identity_null = (ticker_codes < 0) | (metric_codes < 0) | np.isnan(years)
+    violations.append(_violation("null_identity", BLOCKING, identity_null, frame))
+    violations.append(_violation("year_range", BLOCKING, (years < year_range[0]) | (years > year_range[1]), frame))
+
+    known = np.isin(metric_names, list(config.XBRL_TAGS))
+    violations.append(_violation("unknown_metric", BLOCKING, ~known[metric_codes] & (metric_codes >= 0), frame))
+    # NaN values are legitimate for any metric: a company's output has a row
+    # for every year it filed, and a metric it skipped that year is NaN. Null
+    # rates are watched by the null_frac_drift comparison instead.
+    violations.append(_violation("non_finite_value", BLOCKING, np.isinf(values), frame))
+
+    n_metrics = max(len(metric_names), 1)
+    n_tickers = int(ticker_codes.max()) + 2
+    min_year = 0 if np.isnan(years).all() else np.nanmin(years)
+    offsets = np.nan_to_num(years - min_year, nan=0).astype(np.int64)
+    span = int(offsets.max()) + 1
+    key = ((ticker_codes.astype(np.int64) + 1) * (n_metrics + 1) + metric_codes + 1) * span + offsets
+    if n_tickers * (n_metrics + 1) * span <= 8 * len(key) + 1024:
+        # Dense key space: a counting pass instead of hashing.
+        duplicated = np.bincount(key)[key] > 1
+    else:
+        duplicated = pd.Series(key).duplicated(keep=False).to_numpy()
+    violations.append(_violation("duplicate_key", BLOCKING, duplicated, frame))
+
+    return [v for v in violations if v["count"]]
+
+
+def profile_frame(frame):
+    """Mergeable per-metric statistics: count, nulls, sum, sum of squares, min, max."""
+    if frame.empty:
+        return {}
+    metric_codes, metric_names = _codes(frame["metric"])
+    values = pd.to_numeric(frame["value"], errors="coerce").to_numpy(dtype=float)
+    if (metric_codes < 0).any():
+        values, metric_codes = values[metric_codes >= 0], metric_codes[metric_codes >= 0]
+    n = len(metric_names)
+    valid = np.isfinite(values)
+    clean = np.where(valid, values, 0.0)
+    count = np.bincount(metric_codes, minlength=n)
+    stats = {
+        "count": count,
+        "nulls": count - np.bincount(metric_codes, weights=valid, minlength=n).astype(np.int64),
+        "sum": np.bincount(metric_codes, weights=clean, minlength=n),
+        "sumsq": np.bincount(metric_codes, weights=clean * clean, minlength=n),
+    }
+    low = np.full(n, np.inf)
+    high = np.full(n, -np.inf)
+    np.minimum.at(low, metric_codes[valid], values[valid])
+    np.maximum.at(high, metric_codes[valid], values[valid])
+    return {
+        metric: {
+            "count": int(stats["count"][i]),
+            "nulls": int(stats["nulls"][i]),
+            "sum": float(stats["sum"][i]),
+            "sumsq": float(stats["sumsq"][i]),
+            "min": float(low[i]) if np.isfinite(low[i]) else None,
+            "max": float(high[i]) if np.isfinite(high[i]) else None,
+        }
+        for i, metric in enumerate(metric_names) if stats["count"][i]
+    }
+
+
+def merge_profiles(profiles):
+    """Combine per-shard profiles into one."""
+    merged = {}
+    for profile in profiles:
+        for metric, stats in profile.items():
+            if metric not in merged:
+                merged[metric] = dict(stats)
+                continue
+            current = merged[metric]
+            for field in ("count", "nulls", "sum", "sumsq"):
+                current[field] += stats[field]
+            for field, pick in (("min", min), ("max", max)):
+                values = [v for v in (current[field], stats[field]) if v is not None]
+                current[field] = pick(values) if values else None
+    return merged
+
+
+def _summary(stats):
+    valid = stats["count"] - stats["nulls"]
+    mean = stats["sum"] / valid if valid else None
+    return {"count": stats["count"], "null_frac": stats["nulls"] / stats["count"], "mean": mean}
+
+
+def compare_profiles(current, previous, max_count_change=None, max_mean_shift=None, max_null_frac_change=None):
+    """Distribution drift of `current` against the previous run's profile.
+
+    Flags metrics that disappeared, and metrics whose row count or mean moved
+    by more than the given relative change, or whose null fraction moved by
+    more than the given absolute change. Severity is blocking only when
+    config.DQ_DRIFT_BLOCKING is set.
+    """
+    max_count_change = config.DQ_MAX_COUNT_CHANGE if max_count_change is None else max_count_change
+    max_mean_shift = config.DQ_MAX_MEAN_SHIFT if max_mean_shift is None else max_mean_shift
+    max_null_frac_change = config.DQ_MAX_NULL_FRAC_CHANGE if max_null_frac_change is None else max_null_frac_change
+    severity = BLOCKING if config.DQ_DRIFT_BLOCKING else WARNING
+    drift = []
+    for metric, old_stats in previous.items():
+        if metric not in current:
+            drift.append({"check": "metric_missing", "severity": severity, "count": old_stats["count"], "metric": metric})
+            continue
+        old, new = _summary(old_stats), _summary(current[metric])
+        change = abs(new["count"] - old["count"]) / old["count"]
+        if change > max_count_change:
+            drift.append({"check": "count_drift", "severity": severity, "count": new["count"], "metric": metric,
+                          "detail": f"{old['count']} -> {new['count']} rows"})
+        if old["mean"] and new["mean"] is not None and abs(new["mean"] - old["mean"]) / abs(old["mean"]) > max_mean_shift:
+            drift.append({"check": "mean_drift", "severity": severity, "count": new["count"], "metric": metric,
+                          "detail": f"mean {old['mean']:.6g} -> {new['mean']:.6g}"})
+        if abs(new["null_frac"] - old["null_frac"]) > max_null_frac_change:
+            drift.append({"check": "null_frac_drift", "severity": severity, "count": new["count"], "metric": metric,
+                          "detail": f"null fraction {old['null_frac']:.3f} -> {new['null_frac']:.3f}"})
+    return drift
+
+
+def _profile_path(state_dir):
+    """(filesystem, path) of the saved profile: a local directory, file:// or s3:// URI."""
+    filesystem, root = resolve_target(state_dir or config.DQ_STATE_DIR)
+    return filesystem, f"{root}/profile.json"
+
+
+def load_previous_profile(state_dir=None):
+    """Profile saved by the last run that passed the gate, or None."""
+    try:
+        body = read_bytes(*_profile_path(state_dir))
+        return None if body is None else json.loads(body)
+    except (OSError, ValueError):
+        return None
+
+
+def save_profile(profile, state_dir=None):
+    write_bytes(*_profile_path(state_dir), json.dumps(profile).encode("utf-8"), atomic=True)
+
+
+def run_quality_gate(frames, state_dir=None, raise_on_blocking=True):
+    """Check a stream of long frames (e.g. one per shard) and compare with the previous run.
+
+    Returns a compact report: {"passed", "rows", "metrics", "violations"}.
+    The merged profile becomes the new drift baseline only when the gate
+    passes. With raise_on_blocking, a failed gate raises DataQualityError.
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    violations, profiles, rows = [], [], 0
+    for frame in frames:
+        rows += len(frame)
+        violations.extend(check_frame(frame))
+        if all(c in frame for c in REQUIRED_COLUMNS):
+            profiles.append(profile_frame(frame))
+
+    # Shards hold disjoint tickers, so per-frame counts add up.
+    combined = {}
+    for v in violations:
+        if v["check"] in combined:
+            combined[v["check"]]["count"] += v["count"]
+            combined[v["check"]].setdefault("examples", []).extend(v.get("examples", []))
+            combined[v["check"]]["examples"] = combined[v["check"]]["examples"][:_EXAMPLES]
+        else:
+            combined[v["check"]] = v
+    violations = list(combined.values())
+
+    profile = merge_profiles(profiles)
+    previous = load_previous_profile(state_dir)
+    if previous:
+        violations.extend(compare_profiles(profile, previous))
+
+    report = {
+        "passed": not any(v["severity"] == BLOCKING for v in violations),
+        "rows": rows,
+        "metrics": len(profile),
+        "violations": violations,
+    }
+    if report["passed"]:
+        save_profile(profile, state_dir)
+    logger.info(f"Data quality: {'passed' if report['passed'] else 'FAILED'} on {rows} rows, "
+                f"{len(violations)} violation(s): {[(v['check'], v['count']) for v in violations]}")
+    if raise_on_blocking and not report["passed"]:
+        raise DataQualityError(report)
+    return report
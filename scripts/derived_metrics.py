@@ -0,0 +1,144 @@
+import ast
+import re
+import numpy as np
+from scripts import config
+from utils.helpers import setup_logger
+from utils.ratio_kernels import ratio
+logger = setup_logger()
+
+_REFERENCE = re.compile(r"\{([^{}]+)\}")
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Add, ast.Sub, ast.Mult, ast.Div,
+    ast.USub, ast.UAdd, ast.Constant, ast.Name, ast.Load,
+)
+
+
+def _div(numerator, denominator):
+    """Elementwise division; zero, NaN or non-finite results become NaN."""
+    return ratio(numerator, denominator)
+
+
+def parse_formula(formula):
+    """Parse a "{label} / {label} * 100" formula into (expression AST, [labels])."""
+    labels = []
+
+    def _placeholder(match):
+        label = match.group(1)
+        if label not in labels:
+            labels.append(label)
+        return f"_m{labels.index(label)}"
+
+    tree = ast.parse(_REFERENCE.sub(_placeholder, formula).strip(), mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax {type(node).__name__} in formula {formula!r}")
+        if isinstance(node, ast.Name) and not re.fullmatch(r"_m\d+", node.id):
+            raise ValueError(f"Unknown name {node.id!r} in formula {formula!r}; reference metrics as {{label}}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Only numeric constants are allowed in formula {formula!r}")
+    return tree, labels
+
+
+class _Lower(ast.NodeTransformer):
+    """Rewrite placeholders to column lookups and `/` to the NaN-safe _div."""
+
+    def __init__(self, labels):
+        self.labels = labels
+
+    def visit_Name(self, node):
+        label = self.labels[int(node.id[2:])]
+        return ast.Subscript(value=ast.Name(id="cols", ctx=ast.Load()), slice=ast.Constant(label), ctx=ast.Load())
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Div):
+            return ast.Call(func=ast.Name(id="_div", ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+        return node
+
+
+class MetricCompiler:
+    """Compiles the derived-metric formulas in XBRL_TAGS into one vectorised function.
+
+    Metrics are ordered by their dependencies; a metric is skipped when any of
+    its inputs (directly or through another metric) is not available. The
+    compiled function is cached per set of available input columns.
+    """
+
+    def __init__(self, xbrl_tags=None):
+        xbrl_tags = xbrl_tags or config.XBRL_TAGS
+        self.formulas = {}
+        for label, info in xbrl_tags.items():
+            if info.get("formula"):
+                self.formulas[label] = parse_formula(info["formula"])
+        self.order = self._topological_order()
+        self._compiled = {}
+
+    def _topological_order(self):
+        order, state = [], {}
+
+        def _visit(label, path):
+            if state.get(label) == "done":
+                return
+            if state.get(label) == "visiting":
+                raise ValueError(f"Circular metric dependency: {' -> '.join(path + [label])}")
+            state[label] = "visiting"
+            for dep in self.formulas[label][1]:
+                if dep in self.formulas:
+                    _visit(dep, path + [label])
+            state[label] = "done"
+            order.append(label)
+
+        for label in self.formulas:
+            _visit(label, [])
+        return order
+
+    def dependencies(self, label):
+        """Direct inputs referenced by `label`'s formula."""
+        return self.formulas[label][1]
+
+    def resolvable(self, available):
+        """Derived metrics (in evaluation order) computable from `available` inputs."""
+        known = set(available)
+        metrics = []
+        for label in self.order:
+            if all(dep in known for dep in self.formulas[label][1]):
+                known.add(label)
+                metrics.append(label)
+        return metrics
+
+    def compile(self, available):
+        """Return (metrics, fn) where fn(cols) -> {metric: array} in one fused pass."""
+        key = frozenset(available)
+        if key not in self._compiled:
+            metrics = self.resolvable(available)
+            body = []
+            for label in metrics:
+                tree, labels = self.formulas[label]
+                expr = ast.fix_missing_locations(_Lower(labels).visit(ast.parse(ast.unparse(tree), mode="eval")))
+                body.append(f"    cols[{label!r}] = out[{label!r}] = {ast.unparse(expr.body)}")
+            source = "def _evaluate(cols, _div):\n    out = {}\n" + "\n".join(body) + "\n    return out\n"
+            namespace = {}
+            exec(compile(source, "<derived_metrics>", "exec"), namespace)
+            self._compiled[key] = (metrics, namespace["_evaluate"])
+        return self._compiled[key]
+
+    def evaluate(self, columns):
+        """Evaluate every resolvable derived metric over {label: array} inputs."""
+        metrics, fn = self.compile(columns.keys())
+        cols = {label: np.asarray(values, dtype=float) for label, values in columns.items()}
+        with np.errstate(over="ignore", invalid="ignore"):
+            out = fn(cols, _div)
+        for label in metrics:
+            out[label] = np.broadcast_to(out[label], next(iter(cols.values())).shape if cols else ()).astype(float)
+        return out
+
+
+_default_compiler = None
+
+
+def get_compiler():
+    """Shared compiler for config.XBRL_TAGS."""
+    global _default_compiler
+    if _default_compiler is None:
+        _default_compiler = MetricCompiler()
+    return _default_compiler
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pyarrow.dataset as ds
+from scripts import config
+from scripts.data_loading import load_manifest, partition_ticker, resolve_target
+from utils.helpers import setup_logger
+logger = setup_logger()
+
+
+class MetricsQueryCache:
+    """Read-side query layer over the delta-loaded metrics with a per-ticker LRU cache.
+
+    A ticker's rows are read once from its manifest partitions and kept as
+    sorted NumPy columns (metric code, year, value). Entries are evicted
+    least-recently-used once their total size exceeds `max_bytes`. When a
+    new manifest version is published, only tickers whose partition files
+    changed are invalidated; the manifest is rechecked at most every
+    `refresh_seconds` (0 disables the automatic check; call refresh()).
+    """
+
+    def __init__(self, root=None, max_bytes=None, refresh_seconds=None, filesystem=None):
+        self.max_bytes = config.QUERY_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.refresh_seconds = config.QUERY_CACHE_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self.filesystem, self.path = resolve_target(root or config.DELTA_ROOT, filesystem)
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self.version = None
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._files = {}
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self.refresh()
+
+    def refresh(self):
+        """Pick up the latest manifest and drop entries for tickers whose files changed.
+
+        Returns the manifest version now served (None before the first load).
+        """
+        manifest = load_manifest(self.path, filesystem=self.filesystem)
+        self._checked_at = time.monotonic()
+        if manifest is None or manifest["version"] == self.version:
+            return self.version
+        files = {}
+        for part in manifest["partitions"].values():
+            files.setdefault(partition_ticker(part["path"]), []).append(part["path"])
+        files = {ticker: tuple(sorted(paths)) for ticker, paths in files.items()}
+        with self._lock:
+            stale = [t for t in self._entries if files.get(t) != self._files.get(t)]
+            for ticker in stale:
+                self.nbytes -= self._entries.pop(ticker)["nbytes"]
+            self.stats["invalidations"] += len(stale)
+            self._files = files
+            self.version = manifest["version"]
+        logger.info(f"Query cache: serving v{self.version}, invalidated {len(stale)} ticker(s)")
+        return self.version
+
+    def invalidate(self, tickers=None):
+        """Drop the given tickers (or everything) from the cache."""
+        with self._lock:
+            for ticker in list(self._entries) if tickers is None else tickers:
+                entry = self._entries.pop(ticker, None)
+                if entry is not None:
+                    self.nbytes -= entry["nbytes"]
+                    self.stats["invalidations"] += 1
+
+    def _read(self, paths):
+        dataset = ds.dataset([f"{self.path}/{p}" for p in paths], format="parquet", filesystem=self.filesystem)
+        table = dataset.to_table(columns=["year", "metric", "value"])
+        metrics, metric_codes = np.unique(table["metric"].to_numpy(zero_copy_only=False).astype(str),
+                                          return_inverse=True)
+        years = table["year"].to_numpy().astype(np.int32)
+        values = table["value"].to_numpy(zero_copy_only=False).astype(float)
+        order = np.lexsort((years, metric_codes))
+        entry = {
+            "metrics": {metric: i for i, metric in enumerate(metrics.tolist())},
+            "metric": metric_codes[order].astype(np.int32),
+            "year": years[order],
+            "value": values[order],
+        }
+        entry["nbytes"] = sum(entry[c].nbytes for c in ("metric", "year", "value")) + 64 * len(entry["metrics"])
+        return entry
+
+    def _entry(self, ticker):
+        if self.refresh_seconds and time.monotonic() - self._checked_at > self.refresh_seconds:
+            self.refresh()
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is not None:
+                self._entries.move_to_end(ticker)
+                self.stats["hits"] += 1
+                return entry
+            self.stats["misses"] += 1
+            paths = self._files.get(ticker)
+        if not paths:
+            return None
+        entry = self._read(paths)
+        with self._lock:
+            if paths == self._files.get(ticker) and ticker not in self._entries:
+                self._entries[ticker] = entry
+                self.nbytes += entry["nbytes"]
+                self._evict()
+        return entry
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry["nbytes"]
+            self.stats["evictions"] += 1
+
+    def value(self, ticker, metric, year):
+        """One value, or None when not reported."""
+        entry = self._entry(ticker)
+        code = entry["metrics"].get(metric) if entry else None
+        if code is None:
+            return None
+        lo, hi = np.searchsorted(entry["metric"], [code, code + 1])
+        at = lo + np.searchsorted(entry["year"][lo:hi], year)
+        if at < hi and entry["year"][at] == year and np.isfinite(entry["value"][at]):
+            return float(entry["value"][at])
+        return None
+
+    def time_series(self, ticker, metric, start_year=None, end_year=None):
+        """[(year, value)] for one ticker and metric, oldest first."""
+        entry = self._entry(ticker)
+        code = entry["metrics"].get(metric) if entry else None
+        if code is None:
+            return []
+        lo, hi = np.searchsorted(entry["metric"], [code, code + 1])
+        years, values = entry["year"][lo:hi], entry["value"][lo:hi]
+        keep = np.ones(len(years), dtype=bool)
+        if start_year is not None:
+            keep &= years >= start_year
+        if end_year is not None:
+            keep &= years <= end_year
+        return [(int(y), None if np.isnan(v) else float(v)) for y, v in zip(years[keep], values[keep])]
+
+    def company(self, ticker, year):
+        """{metric: value} for one company and fiscal year."""
+        entry = self._entry(ticker)
+        if entry is None:
+            return {}
+        names = list(entry["metrics"])
+        rows = np.flatnonzero(entry["year"] == year)
+        return {names[entry["metric"][i]]: None if np.isnan(entry["value"][i]) else float(entry["value"][i])
+                for i in rows}
+
+    def hit_rate(self):
+        """Share of lookups answered from the cache."""
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
@@ -0,0 +1,194 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from scripts import config
+from scripts.data_preprocessing import COLUMNAR_FORMAT, from_columnar
+from utils.helpers import setup_logger
+logger = setup_logger()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickers (
+    ticker_id INTEGER PRIMARY KEY,
+    ticker TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    metric_id INTEGER PRIMARY KEY,
+    metric TEXT NOT NULL UNIQUE,
+    unit TEXT,
+    theme TEXT,
+    description TEXT
+);
+-- Clustered on (ticker, metric, year): time-series reads are one range scan.
+CREATE TABLE IF NOT EXISTS facts (
+    ticker_id INTEGER NOT NULL,
+    metric_id INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    value REAL,
+    PRIMARY KEY (ticker_id, metric_id, year)
+) WITHOUT ROWID;
+CREATE VIEW IF NOT EXISTS metric_values AS
+    SELECT t.ticker, f.year, m.metric, f.value, m.unit
+    FROM facts f JOIN tickers t USING (ticker_id) JOIN metrics m USING (metric_id);
+"""
+# Covering index: a ranked cross-section never touches the facts table.
+_CROSS_SECTION_INDEX = "CREATE INDEX IF NOT EXISTS facts_metric_year ON facts (metric_id, year, value)"
+# Rows per multi-row INSERT and rows converted to Python objects at a time: binding
+# one statement per row costs more than SQLite's own B-tree work.
+_INSERT_ROWS = 250
+_CONVERT_ROWS = 1_000_000
+
+
+def _codes(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), np.asarray(column.cat.categories, dtype=object)
+    return pd.factorize(column.to_numpy(dtype=object))
+
+
+class MetricsStore:
+    """Embedded SQLite store of processed metrics with a small query API.
+
+    Facts are stored dictionary-encoded (integer ticker and metric ids, with
+    unit and description kept once in the metrics table). The primary key
+    indexes (ticker, metric, year) and a covering (metric, year, value)
+    index serves cross-sectional queries. The metric_values view exposes
+    (ticker, year, metric, value, unit) for ad-hoc SQL.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or config.METRICS_DB_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Autocommit mode: load() opens and ends its own transaction.
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA cache_size=-262144")
+        self.conn.execute("PRAGMA analysis_limit=1000")
+        # Helper threads for the sorter behind the cross-section index rebuild.
+        self.conn.execute(f"PRAGMA threads={min(os.cpu_count() or 1, 8)}")
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute(_CROSS_SECTION_INDEX)
+        self._load_dimensions()
+
+    def _load_dimensions(self):
+        self._ticker_ids = dict(self.conn.execute("SELECT ticker, ticker_id FROM tickers"))
+        self._metric_ids = dict(self.conn.execute("SELECT metric, metric_id FROM metrics"))
+        self._tickers = {v: k for k, v in self._ticker_ids.items()}
+
+    def close(self):
+        self.conn.close()
+
+    def _ids(self, table, labels, known):
+        new = [label for label in labels if label not in known]
+        if new:
+            start = max(known.values(), default=0) + 1
+            rows = [(start + i, label) for i, label in enumerate(new)]
+            if table == "metrics":
+                rows = [(i, label, config.XBRL_TAGS.get(label, {}).get("unit", "USD"),
+                         config.XBRL_TAGS.get(label, {}).get("theme", ""),
+                         config.XBRL_TAGS.get(label, {}).get("description", "")) for i, label in rows]
+                self.conn.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?, ?)", rows)
+            else:
+                self.conn.executemany(f"INSERT INTO {table} VALUES (?, ?)", rows)
+            known.update((row[1], row[0]) for row in rows)
+        return np.array([known[label] for label in labels], dtype=np.int64)
+
+    def _insert_facts(self, ticker_ids, metric_ids, years, values):
+        for start in range(0, len(years), _CONVERT_ROWS):
+            stop = min(start + _CONVERT_ROWS, len(years))
+            rows = np.empty((stop - start, 4), dtype=object)
+            for i, column in enumerate((ticker_ids, metric_ids, years, values)):
+                rows[:, i] = column[start:stop].tolist()
+            # sqlite binds NaN as NULL, so values go in as plain floats.
+            flat = rows.ravel().tolist()
+            full = (stop - start) // _INSERT_ROWS * _INSERT_ROWS
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO facts VALUES " + ", ".join(["(?, ?, ?, ?)"] * _INSERT_ROWS),
+                (flat[4 * i:4 * (i + _INSERT_ROWS)] for i in range(0, full, _INSERT_ROWS)),
+            )
+            if full < stop - start:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO facts VALUES " + ", ".join(["(?, ?, ?, ?)"] * (stop - start - full)),
+                    flat[4 * full:],
+                )
+
+    def load(self, frames):
+        """Bulk-upsert long (ticker, year, metric, value) frames, records or columnar payloads.
+
+        Rows are inserted sorted by primary key, several rows per statement,
+        with the cross-section index dropped and rebuilt afterwards; existing
+        (ticker, metric, year) rows are replaced. The whole load is one
+        transaction: on failure the facts, dimensions and index are rolled
+        back together. Returns the rows loaded.
+        """
+        if isinstance(frames, (pd.DataFrame, dict)) or (isinstance(frames, list) and frames and isinstance(frames[0], dict)):
+            frames = [frames]
+        total = 0
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.execute("DROP INDEX IF EXISTS facts_metric_year")
+            for frame in frames:
+                if isinstance(frame, dict) and frame.get("format") == COLUMNAR_FORMAT:
+                    frame = from_columnar(frame)
+                elif not isinstance(frame, pd.DataFrame):
+                    frame = pd.DataFrame(frame, columns=["year", "metric", "value", "ticker"])
+                if frame.empty:
+                    continue
+                ticker_codes, tickers = _codes(frame["ticker"])
+                metric_codes, metrics = _codes(frame["metric"])
+                ticker_ids = self._ids("tickers", list(tickers), self._ticker_ids)[ticker_codes]
+                metric_ids = self._ids("metrics", list(metrics), self._metric_ids)[metric_codes]
+                years = frame["year"].to_numpy(dtype=np.int64)
+                order = np.lexsort((years, metric_ids, ticker_ids))
+                self._insert_facts(ticker_ids[order], metric_ids[order], years[order],
+                                   frame["value"].to_numpy(dtype=float)[order])
+                total += len(frame)
+            self.conn.execute(_CROSS_SECTION_INDEX)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            self._load_dimensions()
+            raise
+        self.conn.execute("ANALYZE")
+        self._tickers = {v: k for k, v in self._ticker_ids.items()}
+        logger.info(f"Loaded {total} rows into {self.path}")
+        return total
+
+    def value(self, ticker, metric, year):
+        """One value, or None when not reported."""
+        tid, mid = self._ticker_ids.get(ticker), self._metric_ids.get(metric)
+        row = self.conn.execute(
+            "SELECT value FROM facts WHERE ticker_id = ? AND metric_id = ? AND year = ?", (tid, mid, year)
+        ).fetchone()
+        return row[0] if row else None
+
+    def time_series(self, ticker, metric, start_year=None, end_year=None):
+        """[(year, value)] for one ticker and metric, oldest first."""
+        tid, mid = self._ticker_ids.get(ticker), self._metric_ids.get(metric)
+        return self.conn.execute(
+            "SELECT year, value FROM facts WHERE ticker_id = ? AND metric_id = ? AND year BETWEEN ? AND ? ORDER BY year",
+            (tid, mid, start_year if start_year is not None else -1, end_year if end_year is not None else 9999),
+        ).fetchall()
+
+    def company(self, ticker, year):
+        """{metric: value} for one company and fiscal year."""
+        rows = self.conn.execute(
+            "SELECT m.metric, f.value FROM facts f JOIN metrics m USING (metric_id) WHERE f.ticker_id = ? AND f.year = ?",
+            (self._ticker_ids.get(ticker), year),
+        )
+        return dict(rows)
+
+    def cross_section(self, metric, year, limit=None, descending=True):
+        """[(ticker, value)] for one metric and year across companies, ranked by value."""
+        sql = ("SELECT ticker_id, value FROM facts WHERE metric_id = ? AND year = ? AND value IS NOT NULL "
+               f"ORDER BY value {'DESC' if descending else 'ASC'}")
+        params = [self._metric_ids.get(metric), year]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [(self._tickers[tid], value) for tid, value in self.conn.execute(sql, params)]
+
+    def query(self, sql, params=()):
+        """Run ad-hoc SQL (e.g. against the metric_values view) into a DataFrame."""
+        return pd.read_sql_query(sql, self.conn, params=params)
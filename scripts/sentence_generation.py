@@ -0,0 +1,249 @@
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from scripts import config
+from scripts.data_loading import COMPRESSION_SUFFIX, resolve_target
+from scripts.data_preprocessing import COLUMNAR_FORMAT, from_columnar
+from scripts.time_series import compute_time_series
+from utils.helpers import setup_logger
+logger = setup_logger()
+
+_STATEMENT_PREFIXES = ("income_stmt_", "balance_sheet_", "cash_flow_")
+_SCALES = ((1e3, "K"), (1e6, "M"), (1e9, "B"), (1e12, "T"))
+# Zero-padded fraction digits, indexed by the integer fraction.
+_FRACTIONS = {d: pa.array([f"{i:0{d}d}" for i in range(10 ** d)]) for d in (1, 2)}
+_USD, _PERCENT, _RATIO = 0, 1, 2
+
+
+def metric_label(metric):
+    """Readable metric name: statement prefix and unit suffix dropped, lower case except acronyms."""
+    for prefix in _STATEMENT_PREFIXES:
+        if metric.startswith(prefix):
+            metric = metric[len(prefix):]
+    if metric.endswith(" %"):
+        metric = metric[:-2]
+    return " ".join(w if w.strip("()").isupper() else w.lower() for w in metric.split())
+
+
+def _join(*pieces):
+    return pc.binary_join_element_wise(*pieces, "")
+
+
+def _pick(options, index):
+    """options[index] for an integer (or boolean) array, as an Arrow string array."""
+    return pa.array(options, pa.string()).take(pa.array(np.asarray(index, dtype=np.int64)))
+
+
+def _fixed(values, decimals):
+    """Fixed-point strings of finite floats: integer arithmetic and Arrow casts, no per-value formatting."""
+    scaled = np.round(np.abs(values) * 10 ** decimals).astype(np.int64)
+    whole = pc.cast(pa.array(scaled // 10 ** decimals), pa.string())
+    fraction = _FRACTIONS[decimals].take(pa.array(scaled % 10 ** decimals))
+    return _join(_pick(["", "-"], (values < 0) & (scaled > 0)), whole, ".", fraction)
+
+
+def _by_group(groups, n_groups, render):
+    """Strings rendered group by group with render(group, rows), reassembled in row order.
+
+    Each template only formats the rows it applies to instead of every row.
+    """
+    order = np.argsort(groups, kind="stable")
+    bounds = np.searchsorted(groups[order], np.arange(n_groups + 1))
+    parts = [render(g, order[bounds[g]:bounds[g + 1]]) for g in range(n_groups)]
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    return pa.concat_arrays(parts).take(pa.array(inverse))
+
+
+def _constant(text, rows):
+    return _pick([text], np.zeros(len(rows), dtype=np.int64))
+
+
+def format_values(values, kinds):
+    """Human-readable values: $394.3B for USD, 12.3% for percentages, 1.73 for ratios."""
+    values = np.asarray(values, dtype=float)
+
+    def render(kind, rows):
+        v = values[rows]
+        if kind == _PERCENT:
+            return _join(_fixed(v, 1), "%")
+        if kind == _RATIO:
+            return _fixed(v, 2)
+        magnitude = np.abs(v)
+        divisors = np.r_[1.0, [t for t, _ in _SCALES]]
+        scale = np.searchsorted(divisors[1:], magnitude, side="right")
+        # 999.96M rounds to 1000.0M: move such values up to the next scale.
+        scale += (np.round(magnitude / divisors[scale] * 10) >= 10_000) & (scale < len(_SCALES))
+        divisor = divisors[scale]
+        return _join(_pick(["", "-"], v < 0), "$", _fixed(magnitude / divisor, 1),
+                     _pick([""] + [s for _, s in _SCALES], scale))
+
+    return _by_group(kinds, 3, render)
+
+
+def _prior_values(series):
+    """Prior fiscal year's value for each row of compute_time_series output.
+
+    NaN at the start of a series and after a gap_before, i.e. wherever the
+    time-series stage has no year-over-year comparison either.
+    """
+    ticker_codes = pd.factorize(series["ticker"])[0]
+    metric_codes = pd.factorize(series["metric"])[0]
+    continues = np.r_[False, (ticker_codes[1:] == ticker_codes[:-1]) & (metric_codes[1:] == metric_codes[:-1])]
+    values = series["value"].to_numpy(dtype=float)
+    return np.where(continues & ~series["gap_before"].to_numpy(dtype=bool), np.r_[np.nan, values[:-1]], np.nan)
+
+
+def _change_context(values, prev, yoy, kinds):
+    """', a 7.8% increase from the previous year' style clauses, empty without a comparable prior year.
+
+    USD metrics get the relative change (the time-series yoy_pct, so a zero
+    base has none), percentages the change in percentage points and ratios
+    the prior value.
+    """
+    has_prev = np.isfinite(prev)
+    unchanged = has_prev & (values == prev)
+    clause = np.where(~has_prev | ((kinds == _USD) & ~np.isfinite(yoy)), 0, np.where(unchanged, 1, kinds + 2))
+
+    def render(group, rows):
+        if group == 0:
+            return _constant("", rows)
+        if group == 1:
+            return _constant(", unchanged from the previous year", rows)
+        v, p = values[rows], prev[rows]
+        up = v > p
+        if group == _USD + 2:
+            return _join(", a ", _fixed(np.abs(yoy[rows]), 1), "% ", _pick(["decrease", "increase"], up),
+                         " from the previous year")
+        if group == _PERCENT + 2:
+            return _join(_pick([", down ", ", up "], up), _fixed(np.abs(v - p), 1),
+                         " percentage points from the previous year")
+        return _join(_pick([", down from ", ", up from "], up), _fixed(p, 2), " the previous year")
+
+    return _by_group(clause, 5, render)
+
+
+def generate_sentences(frame, company_names=None):
+    """Render one sentence per reported (ticker, year, metric) value of a long frame.
+
+    USD metrics read "AAPL reported revenue of $394.3B in fiscal year 2023, a
+    7.8% increase from the previous year."; percentages and ratios read
+    "AAPL's debt to equity ratio was 173.0% in fiscal year 2023, up ...".
+    Every piece is built with array operations over the whole frame; metric
+    labels and units are resolved once per metric. Year-over-year context
+    comes from compute_time_series, so gaps and zero bases follow the
+    time-series stage; it needs the prior year in the same frame (shards
+    hold whole tickers). Duplicate keys are dropped and rows with no value
+    are skipped. Returns a frame of ticker, year, metric, theme and text,
+    sorted by ticker, metric and year.
+    """
+    if isinstance(frame, dict) and frame.get("format") == COLUMNAR_FORMAT:
+        frame = from_columnar(frame)
+    elif not isinstance(frame, pd.DataFrame):
+        frame = pd.DataFrame(frame, columns=["year", "metric", "value", "ticker"])
+    columns = ["ticker", "year", "metric", "theme", "text"]
+    if frame.empty:
+        return pd.DataFrame(columns=columns)
+
+    frame = compute_time_series(frame)
+    prev = _prior_values(frame)
+    keep = np.isfinite(frame["value"].to_numpy(dtype=float))
+    frame, prev, yoy = frame[keep], prev[keep], frame["yoy_pct"].to_numpy(dtype=float)[keep]
+
+    metric_codes, metric_names = pd.factorize(frame["metric"])
+    tags = [config.XBRL_TAGS.get(m, {}) for m in metric_names]
+    kinds = np.array([{"USD": _USD, "%": _PERCENT}.get(t.get("unit", "USD"), _RATIO) for t in tags])[metric_codes]
+    themes = [t.get("theme", "") for t in tags]
+    ticker_codes, tickers = pd.factorize(frame["ticker"])
+    names = [str((company_names or {}).get(t, t)) for t in tickers]
+    values = frame["value"].to_numpy(dtype=float)
+    years = pc.cast(pa.array(frame["year"].to_numpy(dtype=np.int64)), pa.string())
+
+    text = _join(
+        _pick(names, ticker_codes),
+        pc.choose(pa.array(np.minimum(kinds, 1)), " reported ", "'s "),
+        _pick([metric_label(m) for m in metric_names], metric_codes),
+        pc.choose(pa.array(np.minimum(kinds, 1)), " of ", " was "),
+        format_values(values, kinds),
+        " in fiscal year ", years,
+        _change_context(values, prev, yoy, kinds),
+        ".",
+    )
+    return pd.DataFrame({
+        "ticker": _pick([str(t) for t in tickers], ticker_codes).to_pandas(),
+        "year": frame["year"].to_numpy(dtype=np.int64),
+        "metric": _pick([str(m) for m in metric_names], metric_codes).to_pandas(),
+        "theme": _pick(themes, metric_codes).to_pandas(),
+        "text": text.to_pandas(),
+    })[columns]
+
+
+def iter_sentence_chunks(frames, chunk_rows=None, company_names=None):
+    """Yield sentence frames of at most `chunk_rows` rows from a stream of long frames."""
+    chunk_rows = chunk_rows or config.SENTENCES_CHUNK_ROWS
+    if isinstance(frames, (pd.DataFrame, dict)):
+        frames = [frames]
+    for frame in frames:
+        sentences = generate_sentences(frame, company_names)
+        for start in range(0, len(sentences), chunk_rows):
+            yield sentences.iloc[start:start + chunk_rows]
+
+
+def _jsonl(sentences):
+    """JSON Lines bytes of a sentence frame, assembled with Arrow string kernels.
+
+    Labels are escaped once per distinct value with json.dumps. Templated
+    text only needs backslashes and quotes escaped (names and labels carry
+    no control characters).
+    """
+    def quoted(column):
+        codes, uniques = pd.factorize(sentences[column])
+        return _pick([json.dumps(str(u), ensure_ascii=False) for u in uniques], codes)
+
+    text = pa.array(sentences["text"], pa.string())
+    text = pc.replace_substring(pc.replace_substring(text, "\\", "\\\\"), '"', '\\"')
+    lines = _join(
+        '{"ticker":', quoted("ticker"),
+        ',"year":', pc.cast(pa.array(sentences["year"].to_numpy(dtype=np.int64)), pa.string()),
+        ',"metric":', quoted("metric"),
+        ',"theme":', quoted("theme"),
+        ',"text":"', text, '"}\n',
+    )
+    offsets = np.frombuffer(lines.buffers()[1], dtype=np.int32)[lines.offset:lines.offset + len(lines) + 1]
+    return lines.buffers()[2].slice(int(offsets[0]), int(offsets[-1] - offsets[0]))
+
+
+def write_sentences(frames, root=None, chunk_rows=None, company_names=None, compression=None, filesystem=None):
+    """Stream sentences as compressed JSON Lines parts to a local directory or s3:// root.
+
+    Parts are named part-NNNNN.jsonl.zst (or .jsonl.gz with compression="gzip")
+    and only one chunk is held in memory at a time. Anything already under
+    `root` (e.g. an earlier run the same day) is deleted first. Returns
+    {"root", "files", "sentences"}.
+    """
+    root = root or config.SENTENCES_ROOT
+    compression = compression or config.SENTENCES_COMPRESSION
+    if compression not in COMPRESSION_SUFFIX:
+        raise ValueError(f"Unsupported compression {compression!r}; use 'gzip' or 'zstd'")
+    codec = pa.Codec(compression, compression_level=6 if compression == "gzip" else None)
+    filesystem, path = resolve_target(root, filesystem)
+    filesystem.delete_dir_contents(path, missing_dir_ok=True)
+    filesystem.create_dir(path, recursive=True)
+    files, total = [], 0
+    for i, chunk in enumerate(iter_sentence_chunks(frames, chunk_rows, company_names)):
+        target = f"{path}/part-{i:05d}.jsonl{COMPRESSION_SUFFIX[compression]}"
+        with filesystem.open_output_stream(target, compression=None) as out:
+            out.write(codec.compress(_jsonl(chunk)))
+        files.append(target)
+        total += len(chunk)
+    logger.info(f"Wrote {total} sentences in {len(files)} part(s) to {root}")
+    return {"root": root, "files": files, "sentences": total}
+
+
+def read_sentences(path, filesystem=None):
+    """Records of one written part (for inspection and tests)."""
+    filesystem, path = resolve_target(path, filesystem)
+    with filesystem.open_input_stream(path, compression="detect") as fh:
+        return [json.loads(line) for line in fh.read().decode("utf-8").splitlines()]
@@ -0,0 +1,171 @@
+import json
+import os
+import time
+import zlib
+import numpy as np
+from scripts import config
+from utils.helpers import setup_logger
+logger = setup_logger()
+
+_EMPTY = -1
+
+
+def _slot_count(n):
+    """Power-of-two table size with load factor <= 0.5."""
+    size = 8
+    while size < 2 * n:
+        size *= 2
+    return size
+
+
+def _ticker_hash(key):
+    return zlib.crc32(key)
+
+
+def _cik_hash(cik):
+    return (int(cik) * 2654435761) & 0xFFFFFFFF
+
+
+class TickerIndex:
+    """Memory-mapped ticker/CIK/name lookup index built from company_tickers.json.
+
+    Records keep the SEC file order. Two open-addressing hash tables give O(1)
+    ticker->CIK and CIK->ticker lookups, and a sorted array of upper-cased
+    names supports prefix search with a binary search. Every array is a .npy
+    file opened with mmap_mode="r", so loading costs a few milliseconds.
+    """
+
+    FILES = ("records", "ticker_slots", "cik_slots", "name_keys", "name_order")
+    # Bumped when the on-disk layout or key folding changes; older indexes are rebuilt.
+    VERSION = 2
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        for name in self.FILES:
+            setattr(self, name, np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r"))
+        with open(os.path.join(index_dir, "meta.json")) as fh:
+            self.meta = json.load(fh)
+
+    @classmethod
+    def build(cls, data, index_dir):
+        """Build the index from the parsed company_tickers.json payload."""
+        entries = list(data.values())
+        tickers = [str(e.get("ticker", "")).upper().encode("utf-8") for e in entries]
+        names = [str(e.get("title", "")).encode("utf-8") for e in entries]
+        records = np.zeros(len(entries), dtype=[
+            ("ticker", f"S{max(map(len, tickers), default=1)}"),
+            ("cik", "u4"),
+            ("name", f"S{max(map(len, names), default=1)}"),
+        ])
+        records["ticker"] = tickers
+        records["cik"] = [int(e.get("cik_str")) for e in entries]
+        records["name"] = names
+
+        size = _slot_count(len(entries))
+        ticker_slots = np.full(size, _EMPTY, dtype=np.int32)
+        cik_slots = np.full(size, _EMPTY, dtype=np.int32)
+        seen_tickers, seen_ciks = set(), set()
+        for i, (ticker, cik) in enumerate(zip(tickers, records["cik"].tolist())):
+            if ticker not in seen_tickers:
+                seen_tickers.add(ticker)
+                slot = _ticker_hash(ticker) & (size - 1)
+                while ticker_slots[slot] != _EMPTY:
+                    slot = (slot + 1) & (size - 1)
+                ticker_slots[slot] = i
+            # First occurrence wins: SEC lists a company's primary ticker first.
+            if cik not in seen_ciks:
+                seen_ciks.add(cik)
+                slot = _cik_hash(cik) & (size - 1)
+                while cik_slots[slot] != _EMPTY:
+                    slot = (slot + 1) & (size - 1)
+                cik_slots[slot] = i
+
+        # Folded as str, like the query in search_name: np.char.upper on bytes only handles ASCII.
+        name_keys = [str(e.get("title", "")).upper().encode("utf-8") for e in entries]
+        name_keys = np.array(name_keys, dtype=f"S{max(map(len, name_keys), default=1)}")
+        name_order = np.argsort(name_keys, kind="stable").astype(np.int32)
+
+        os.makedirs(index_dir, exist_ok=True)
+        arrays = {
+            "records": records,
+            "ticker_slots": ticker_slots,
+            "cik_slots": cik_slots,
+            "name_keys": name_keys[name_order],
+            "name_order": name_order,
+        }
+        for name, array in arrays.items():
+            tmp = os.path.join(index_dir, f"{name}.tmp.npy")
+            np.save(tmp, array)
+            os.replace(tmp, os.path.join(index_dir, f"{name}.npy"))
+        with open(os.path.join(index_dir, "meta.json"), "w") as fh:
+            json.dump({"built_at": time.time(), "count": len(entries), "version": cls.VERSION}, fh)
+        return cls(index_dir)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _entry(self, i):
+        record = self.records[i]
+        return {
+            "ticker": record["ticker"].decode("utf-8"),
+            "cik": str(int(record["cik"])).zfill(10),
+            "title": record["name"].decode("utf-8"),
+        }
+
+    def cik_for(self, ticker):
+        """Return the zero-padded CIK for `ticker`, or None."""
+        key = ticker.upper().encode("utf-8")
+        mask = len(self.ticker_slots) - 1
+        slot = _ticker_hash(key) & mask
+        while True:
+            i = self.ticker_slots[slot]
+            if i == _EMPTY:
+                return None
+            if self.records["ticker"][i] == key:
+                return str(int(self.records["cik"][i])).zfill(10)
+            slot = (slot + 1) & mask
+
+    def ticker_for(self, cik):
+        """Return the primary ticker for `cik` (int or padded string), or None."""
+        cik = int(cik)
+        mask = len(self.cik_slots) - 1
+        slot = _cik_hash(cik) & mask
+        while True:
+            i = self.cik_slots[slot]
+            if i == _EMPTY:
+                return None
+            if self.records["cik"][i] == cik:
+                return self.records["ticker"][i].decode("utf-8")
+            slot = (slot + 1) & mask
+
+    def search_name(self, prefix, limit=10):
+        """Return up to `limit` entries whose company name starts with `prefix`."""
+        key = prefix.upper().encode("utf-8")
+        lo = np.searchsorted(self.name_keys, key, side="left")
+        hi = np.searchsorted(self.name_keys, key + b"\xff", side="left")
+        return [self._entry(self.name_order[i]) for i in range(lo, min(hi, lo + limit))]
+
+    def resolve(self, tickers):
+        """Map an explicit ticker list to {ticker: cik}, skipping unknown tickers."""
+        companies = {}
+        for ticker in tickers:
+            cik = self.cik_for(ticker)
+            if cik is None:
+                logger.warning(f"Unknown ticker {ticker}; skipping")
+                continue
+            companies[ticker.upper()] = cik
+        return companies
+
+
+def load_ticker_index(fetch, index_dir=None, max_age=None):
+    """Open the on-disk index, rebuilding it with `fetch()` when missing or stale."""
+    index_dir = index_dir or config.TICKER_INDEX_DIR
+    max_age = config.TICKER_INDEX_MAX_AGE_SECONDS if max_age is None else max_age
+    try:
+        index = TickerIndex(index_dir)
+        if index.meta.get("version") == TickerIndex.VERSION and time.time() - index.meta["built_at"] < max_age:
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    logger.info(f"Rebuilding ticker index in {index_dir}")
+    return TickerIndex.build(fetch(), index_dir)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from scripts import config
+from utils.helpers import setup_logger
+logger = setup_logger()
+
+
+def _as_frame(processed):
+    df = processed if isinstance(processed, pd.DataFrame) else pd.DataFrame(processed)
+    if df.empty:
+        return pd.DataFrame({"ticker": [], "metric": [], "year": [], "value": []})
+    df = df[["ticker", "metric", "year", "value"]].copy()
+    df["year"] = df["year"].astype(np.int64)
+    df["value"] = pd.to_numeric(df["value"], errors="coerce").astype(float)
+    return df
+
+
+def compute_time_series(processed, cagr_years=None, window=None):
+    """Add YoY, CAGR and rolling statistics to long (ticker, year, metric, value) output.
+
+    Every (ticker, metric) series is laid out on a contiguous fiscal-year grid
+    in one array, so a missing year is an explicit gap: YoY, CAGR and rolling
+    windows that would span it are NaN rather than silently comparing
+    non-adjacent years. All statistics are computed in one pass over the
+    whole universe with array shifts; windows never cross series boundaries.
+
+    Returned columns: ticker, metric, year, value, gap_before, yoy_pct,
+    cagr_<k>y_pct for each k, rolling_mean_<w>y and rolling_vol_<w>y (the
+    standard deviation of yoy_pct over the window).
+    """
+    cagr_years = tuple(cagr_years or config.TIME_SERIES_CAGR_YEARS)
+    window = window or config.TIME_SERIES_WINDOW
+    df = _as_frame(processed)
+    columns = ["ticker", "metric", "year", "value", "gap_before", "yoy_pct"]
+    columns += [f"cagr_{k}y_pct" for k in cagr_years] + [f"rolling_mean_{window}y", f"rolling_vol_{window}y"]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    # Integer codes (in order of first appearance) keep the sort and grouping cheap.
+    ticker_codes = pd.factorize(df["ticker"])[0]
+    metric_codes = pd.factorize(df["metric"])[0]
+    order = np.lexsort((df["year"].to_numpy(), metric_codes, ticker_codes))
+    df = df.iloc[order].reset_index(drop=True)
+    key = ticker_codes[order].astype(np.int64) * (metric_codes.max() + 1) + metric_codes[order]
+    years = df["year"].to_numpy()
+    keep = np.r_[(key[1:] != key[:-1]) | (years[1:] != years[:-1]), True]
+    df, key, years = df[keep].reset_index(drop=True), key[keep], years[keep]
+    series_id = np.cumsum(np.r_[True, key[1:] != key[:-1]]) - 1
+
+    # Contiguous year grid per series: [first year, last year] with NaN for gaps.
+    starts = np.flatnonzero(np.r_[True, series_id[1:] != series_id[:-1]])
+    first_year = years[starts]
+    lengths = years[np.r_[starts[1:], len(years)] - 1] - first_year + 1
+    grid_start = np.r_[0, np.cumsum(lengths)[:-1]]
+    grid_series = np.repeat(np.arange(len(starts)), lengths)
+    positions = grid_start[series_id] + (years - first_year[series_id])
+    grid = np.full(lengths.sum(), np.nan)
+    grid[positions] = df["value"].to_numpy()
+    reported = np.zeros(len(grid), dtype=bool)
+    reported[positions] = True
+
+    def _lag(values, k):
+        if k == 0:
+            return values.copy()
+        lagged = np.full_like(values, np.nan)
+        if k < len(values):
+            lagged[k:] = values[:-k]
+            lagged[k:][grid_series[k:] != grid_series[:-k]] = np.nan
+        return lagged
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prev = _lag(grid, 1)
+        yoy = np.where(prev != 0, (grid - prev) / np.abs(prev) * 100, np.nan)
+        out = {"yoy_pct": yoy}
+        for k in cagr_years:
+            base = _lag(grid, k)
+            ok = (base > 0) & (grid > 0)
+            out[f"cagr_{k}y_pct"] = np.where(ok, (np.where(ok, grid / base, 1.0) ** (1.0 / k) - 1) * 100, np.nan)
+
+    # Plain rolling windows over the concatenated grid, masked where a window
+    # would reach back into the previous series.
+    crosses = _lag(grid_series.astype(float), window - 1) != grid_series
+    for name, source, stat in (
+        (f"rolling_mean_{window}y", grid, "mean"),
+        (f"rolling_vol_{window}y", yoy, "std"),
+    ):
+        rolled = getattr(pd.Series(source).rolling(window, min_periods=window), stat)().to_numpy(copy=True)
+        rolled[crosses] = np.nan
+        out[name] = rolled
+
+    result = df
+    result["gap_before"] = (positions != grid_start[series_id]) & ~reported[np.maximum(positions - 1, 0)]
+    for name, values in out.items():
+        result[name] = values[positions]
+    result.loc[~np.isfinite(result["yoy_pct"]), "yoy_pct"] = np.nan
+    return result[columns]
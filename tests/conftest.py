@@ -4,6 +4,10 @@ import pandas as pd
 import numpy as np
 from unittest.mock import Mock, MagicMock
 import sys
+import json
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
 # Add project root to path
@@ -110,3 +114,128 @@ def test_config():
         "S3_BUCKET": "test-bucket",
         "S3_FOLDER": "test-folder"
     }
+
+
+@pytest.fixture
+def fake_edgar_server():
+    """Local HTTP stand-in for EDGAR.
+
+    Serves JSON documents registered in `routes`; `scripted[path]` holds a queue
+    of (status, headers, payload) responses that are replayed first.
+    """
+    routes = {}
+    scripted = {}
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            if scripted.get(self.path):
+                status, headers, payload = scripted[self.path].pop(0)
+                body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if self.path not in routes:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = json.dumps(routes[self.path]).encode("utf-8")
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+    server.routes = routes
+    server.scripted = scripted
+    server.requests_seen = requests_seen
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_s3():
+    """In-memory stand-in for the boto3 S3 client (objects and multipart uploads).
+
+    `objects[(bucket, key)]` holds completed bodies, `uploads[upload_id]`
+    the parts of open multipart uploads, and `fail_parts` a set of part
+    numbers whose upload_part call raises.
+    """
+
+    class FakeS3:
+        def __init__(self):
+            self.objects = {}
+            self.uploads = {}
+            self.aborted = []
+            self.fail_parts = set()
+            self._lock = threading.Lock()
+
+        def put_object(self, Bucket, Key, Body, **kwargs):
+            self.objects[(Bucket, Key)] = bytes(Body)
+            return {"ETag": '"%s"' % hashlib.md5(Body).hexdigest()}
+
+        def get_object(self, Bucket, Key):
+            from io import BytesIO
+            return {"Body": BytesIO(self.objects[(Bucket, Key)])}
+
+        def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, MaxKeys=2):
+            # Small pages so callers have to follow continuation tokens.
+            # Like S3, the token resumes after the last key returned.
+            keys = sorted(k for b, k in self.objects
+                          if b == Bucket and k.startswith(Prefix) and k > (ContinuationToken or ""))
+            listing = {"Contents": [{"Key": k} for k in keys[:MaxKeys]], "IsTruncated": len(keys) > MaxKeys}
+            if listing["IsTruncated"]:
+                listing["NextContinuationToken"] = keys[MaxKeys - 1]
+            return listing
+
+        def delete_objects(self, Bucket, Delete):
+            for obj in Delete["Objects"]:
+                self.objects.pop((Bucket, obj["Key"]), None)
+            return {}
+
+        def create_multipart_upload(self, Bucket, Key, **kwargs):
+            with self._lock:
+                upload_id = f"upload-{len(self.uploads) + len(self.aborted) + 1}"
+                self.uploads[upload_id] = {"key": (Bucket, Key), "parts": {}, "kwargs": kwargs}
+            return {"UploadId": upload_id}
+
+        def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+            if PartNumber in self.fail_parts:
+                raise RuntimeError(f"part {PartNumber} failed")
+            etag = '"%s"' % hashlib.md5(Body).hexdigest()
+            with self._lock:
+                self.uploads[UploadId]["parts"][PartNumber] = (etag, bytes(Body))
+            return {"ETag": etag}
+
+        def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+            upload = self.uploads.pop(UploadId)
+            parts = MultipartUpload["Parts"]
+            assert [p["PartNumber"] for p in parts] == list(range(1, len(parts) + 1))
+            assert all(upload["parts"][p["PartNumber"]][0] == p["ETag"] for p in parts)
+            self.objects[(Bucket, Key)] = b"".join(upload["parts"][p["PartNumber"]][1] for p in parts)
+            return {"Key": Key}
+
+        def abort_multipart_upload(self, Bucket, Key, UploadId):
+            self.uploads.pop(UploadId, None)
+            self.aborted.append(UploadId)
+
+    return FakeS3()
@@ -0,0 +1,71 @@
+"""Pytest tests for the artifact store."""
+import pytest
+import io
+import sys
+from unittest.mock import Mock
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils import artifacts
+
+
+PAYLOAD = {"AAPL": {"facts": {"us-gaap": {"Revenues": {"units": {"USD": [{"val": 1, "fy": 2023}]}}}}}}
+
+
+class TestLocalArtifactStore:
+    """Test cases for the local-filesystem backend."""
+
+    def test_round_trip_returns_small_reference(self, tmp_path):
+        """Test put() returns a reference and get() restores the payload."""
+        store = artifacts.LocalArtifactStore(str(tmp_path))
+
+        ref = store.put("20240101/raw/shard-0000.json.gz", PAYLOAD)
+
+        assert set(ref) == {"uri", "size", "sha256"}
+        assert ref["uri"].startswith("file://")
+        assert ref["size"] == (tmp_path / "20240101/raw/shard-0000.json.gz").stat().st_size
+        assert store.get(ref) == PAYLOAD
+
+    def test_checksum_mismatch_is_rejected(self, tmp_path):
+        """Test a corrupted artifact raises instead of returning bad data."""
+        store = artifacts.LocalArtifactStore(str(tmp_path))
+        ref = store.put("a.json.gz", PAYLOAD)
+        (tmp_path / "a.json.gz").write_bytes(b"corrupted")
+
+        with pytest.raises(ValueError, match="Checksum mismatch"):
+            store.get(ref)
+
+
+class TestS3ArtifactStore:
+    """Test cases for the S3 backend with a mocked client."""
+
+    def test_round_trip_through_s3(self):
+        """Test put() uploads gzip JSON and get() reads it back."""
+        objects = {}
+        s3_client = Mock()
+        s3_client.put_object.side_effect = lambda **kw: objects.__setitem__((kw["Bucket"], kw["Key"]), kw["Body"])
+        s3_client.get_object.side_effect = lambda Bucket, Key: {"Body": io.BytesIO(objects[(Bucket, Key)])}
+        store = artifacts.S3ArtifactStore("test-bucket", "runs/", s3_client=s3_client)
+
+        ref = store.put("raw/shard-0000.json.gz", PAYLOAD)
+
+        assert ref["uri"] == "s3://test-bucket/runs/raw/shard-0000.json.gz"
+        assert s3_client.put_object.call_args[1]["ContentEncoding"] == "gzip"
+        assert store.get(ref) == PAYLOAD
+
+
+class TestGetArtifactStore:
+    """Test cases for URI-based store selection."""
+
+    def test_s3_uri(self):
+        store = artifacts.get_artifact_store("s3://bucket/prefix/artifacts")
+        assert isinstance(store, artifacts.S3ArtifactStore)
+        assert (store.bucket, store.prefix) == ("bucket", "prefix/artifacts")
+
+    def test_file_uri(self, tmp_path):
+        store = artifacts.get_artifact_store(f"file://{tmp_path}")
+        assert isinstance(store, artifacts.LocalArtifactStore)
+        assert store.root == str(tmp_path)
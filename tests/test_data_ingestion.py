@@ -1,6 +1,9 @@
 """Pytest tests for data ingestion functions."""
 import pytest
 import requests
+import time
+import json
+import zipfile
 from unittest.mock import Mock, patch, MagicMock
 import sys
 from pathlib import Path
@@ -15,18 +18,16 @@ from scripts import data_ingestion
 class TestExtractCompanies:
     """Test cases for extract_companies function."""
 
-    @patch('scripts.data_ingestion.requests.get')
-    def test_extract_companies_success(self, mock_get):
+    TICKERS = {
+        '0': {'ticker': 'AAPL', 'cik_str': '320193'},
+        '1': {'ticker': 'MSFT', 'cik_str': '789019'},
+        '2': {'ticker': 'GOOGL', 'cik_str': '1652044'}
+    }
+
+    @patch('scripts.data_ingestion.get_client')
+    def test_extract_companies_success(self, mock_get_client):
         """Test successful extraction of companies."""
-        # Mock response
-        mock_response = Mock()
-        mock_response.json.return_value = {
-            '0': {'ticker': 'AAPL', 'cik_str': '320193'},
-            '1': {'ticker': 'MSFT', 'cik_str': '789019'},
-            '2': {'ticker': 'GOOGL', 'cik_str': '1652044'}
-        }
-        mock_response.raise_for_status = Mock()
-        mock_get.return_value = mock_response
+        mock_get_client.return_value.get_json.return_value = self.TICKERS
 
         result = data_ingestion.extract_companies(n=2)
         
@@ -35,41 +36,31 @@ class TestExtractCompanies:
         assert 'AAPL' in result
         assert result['AAPL'] == '0000320193'  # zfilled CIK
 
-    @patch('scripts.data_ingestion.requests.get')
-    def test_extract_companies_with_limit(self, mock_get):
+    @patch('scripts.data_ingestion.get_client')
+    def test_extract_companies_with_limit(self, mock_get_client):
         """Test extraction with limit parameter."""
-        mock_response = Mock()
-        mock_response.json.return_value = {
-            '0': {'ticker': 'AAPL', 'cik_str': '320193'},
-            '1': {'ticker': 'MSFT', 'cik_str': '789019'},
-            '2': {'ticker': 'GOOGL', 'cik_str': '1652044'}
-        }
-        mock_response.raise_for_status = Mock()
-        mock_get.return_value = mock_response
+        mock_get_client.return_value.get_json.return_value = self.TICKERS
 
         result = data_ingestion.extract_companies(n=1)
         
         assert len(result) == 1
 
-    @patch('scripts.data_ingestion.requests.get')
-    def test_extract_companies_cik_formatting(self, mock_get):
+    @patch('scripts.data_ingestion.get_client')
+    def test_extract_companies_cik_formatting(self, mock_get_client):
         """Test CIK formatting with zero padding."""
-        mock_response = Mock()
-        mock_response.json.return_value = {
+        mock_get_client.return_value.get_json.return_value = {
             '0': {'ticker': 'AAPL', 'cik_str': '320193'}
         }
-        mock_response.raise_for_status = Mock()
-        mock_get.return_value = mock_response
 
         result = data_ingestion.extract_companies(n=1)
         
         # Check CIK is zero-padded to 10 digits
         assert result['AAPL'] == '0000320193'
 
-    @patch('scripts.data_ingestion.requests.get')
-    def test_extract_companies_request_error(self, mock_get):
+    @patch('scripts.data_ingestion.get_client')
+    def test_extract_companies_request_error(self, mock_get_client):
         """Test handling of request errors."""
-        mock_get.side_effect = requests.RequestException("Connection error")
+        mock_get_client.return_value.get_json.side_effect = requests.RequestException("Connection error")
         
         with pytest.raises(requests.RequestException):
             data_ingestion.extract_companies(n=1)
@@ -78,47 +69,132 @@ class TestExtractCompanies:
 class TestFetchRawFacts:
     """Test cases for fetch_raw_facts function."""
 
-    @patch('scripts.data_ingestion.EdgarClient')
-    def test_fetch_raw_facts_success(self, mock_client_class):
+    @patch('scripts.data_ingestion.get_client')
+    def test_fetch_raw_facts_success(self, mock_get_client):
         """Test successful fetching of raw facts."""
-        mock_client = Mock()
-        mock_client.get_company_facts.return_value = {"facts": {"us-gaap": {}}}
-        mock_client_class.return_value = mock_client
+        mock_client = mock_get_client.return_value
+        mock_client.get.return_value.content = b'{"facts":{"us-gaap":{}}}'
 
         result = data_ingestion.fetch_raw_facts('0000320193')
         
         assert result == {"facts": {"us-gaap": {}}}
-        mock_client.get_company_facts.assert_called_once_with(cik='0000320193')
-
-    @patch('scripts.data_ingestion.EdgarClient')
-    def test_fetch_raw_facts_with_retries(self, mock_client_class):
-        """Test retry mechanism on failure."""
-        mock_client = Mock()
-        # First two attempts fail, third succeeds
-        mock_client.get_company_facts.side_effect = [
-            Exception("Error 1"),
-            Exception("Error 2"),
-            {"facts": {"us-gaap": {}}}
-        ]
-        mock_client_class.return_value = mock_client
-
-        result = data_ingestion.fetch_raw_facts('0000320193', retries=3)
-        
-        assert result == {"facts": {"us-gaap": {}}}
-        assert mock_client.get_company_facts.call_count == 3
+        url = mock_client.get.call_args[0][0]
+        assert url.endswith('/api/xbrl/companyfacts/CIK0000320193.json')
 
-    @patch('scripts.data_ingestion.EdgarClient')
-    @patch('scripts.data_ingestion.time.sleep')
-    def test_fetch_raw_facts_all_retries_fail(self, mock_sleep, mock_client_class):
+    @patch('scripts.data_ingestion.get_client')
+    def test_fetch_raw_facts_decodes_selectively(self, mock_get_client):
+        """Test only configured concepts are decoded unless selective=False."""
+        document = {"cik": 320193, "facts": {"us-gaap": {
+            "Revenues": {"units": {"USD": [{"val": 1, "fy": 2023, "fp": "FY", "form": "10-K"}]}},
+            "UnrelatedConcept": {"units": {"USD": [{"val": 2, "fy": 2023, "fp": "FY", "form": "10-K"}]}},
+        }}}
+        mock_get_client.return_value.get.return_value.content = json.dumps(document, separators=(",", ":")).encode()
+
+        assert set(data_ingestion.fetch_raw_facts('0000320193')["facts"]["us-gaap"]) == {"Revenues"}
+        assert data_ingestion.fetch_raw_facts('0000320193', selective=False) == document
+
+    @patch('scripts.data_ingestion.get_client')
+    def test_fetch_raw_facts_passes_retry_policy(self, mock_get_client):
+        """Test retries and backoff base are handed to the shared client."""
+        mock_client = mock_get_client.return_value
+        mock_client.get.return_value.content = b'{"facts":{"us-gaap":{}}}'
+
+        data_ingestion.fetch_raw_facts('0000320193', retries=5, sleep_time=0.5)
+
+        assert mock_client.get.call_args[1] == {"retries": 5, "backoff_base": 0.5}
+
+    @patch('scripts.data_ingestion._http_cache')
+    def test_fetch_raw_facts_passes_retry_policy_through_cache(self, mock_cache):
+        """Test the cached path hands the same retry policy to the client."""
+        mock_cache.get.return_value = b'{"facts":{"us-gaap":{}}}'
+
+        data_ingestion.fetch_raw_facts('0000320193', retries=5, sleep_time=0.5)
+
+        kwargs = mock_cache.get.call_args[1]
+        assert (kwargs["retries"], kwargs["backoff_base"]) == (5, 0.5)
+
+    @patch('scripts.data_ingestion.get_client')
+    def test_fetch_raw_facts_all_retries_fail(self, mock_get_client):
         """Test when all retries fail."""
-        mock_client = Mock()
-        mock_client.get_company_facts.side_effect = Exception("Error")
-        mock_client_class.return_value = mock_client
+        mock_get_client.return_value.get.side_effect = requests.HTTPError("503")
 
         result = data_ingestion.fetch_raw_facts('0000320193', retries=2)
         
         assert result is None
-        assert mock_client.get_company_facts.call_count == 2
+
+
+class TestSecClient:
+    """Test cases for the pooled SEC client against a local fake EDGAR server."""
+
+    PATH = "/api/xbrl/companyfacts/CIK0000320193.json"
+
+    def _client(self, **kwargs):
+        kwargs.setdefault("requests_per_second", 1000)
+        return data_ingestion.SecClient(**kwargs)
+
+    @patch('scripts.data_ingestion.time.sleep')
+    def test_retries_server_errors_with_backoff(self, mock_sleep, fake_edgar_server):
+        """Test 5xx responses are retried and counted."""
+        fake_edgar_server.routes[self.PATH] = {"facts": {}}
+        fake_edgar_server.scripted[self.PATH] = [(500, {}, None), (502, {}, None)]
+        client = self._client(retries=3, backoff_base=1.0)
+
+        assert client.get_json(fake_edgar_server.base_url + self.PATH) == {"facts": {}}
+        assert client.stats["retries"] == 2
+        waits = [c[0][0] for c in mock_sleep.call_args_list]
+        assert 0 <= waits[0] <= 1.0 and 0 <= waits[1] <= 2.0
+
+    @patch('scripts.data_ingestion.time.sleep')
+    def test_honours_retry_after_on_429(self, mock_sleep, fake_edgar_server):
+        """Test a 429 waits for Retry-After and counts as a throttle."""
+        fake_edgar_server.routes[self.PATH] = {"facts": {}}
+        fake_edgar_server.scripted[self.PATH] = [(429, {"Retry-After": "7"}, None)]
+        client = self._client()
+
+        client.get_json(fake_edgar_server.base_url + self.PATH)
+
+        mock_sleep.assert_called_once_with(7.0)
+        assert client.stats["throttled"] == 1
+
+    @patch('scripts.data_ingestion.time.sleep')
+    def test_does_not_retry_404(self, mock_sleep, fake_edgar_server):
+        """Test a 404 fails immediately."""
+        client = self._client(retries=5)
+
+        with pytest.raises(requests.HTTPError):
+            client.get(fake_edgar_server.base_url + "/missing.json")
+        assert len(fake_edgar_server.requests_seen) == 1
+        assert client.stats["not_found"] == 1
+        mock_sleep.assert_not_called()
+
+    @patch('scripts.data_ingestion.time.sleep')
+    def test_gives_up_after_retries(self, mock_sleep, fake_edgar_server):
+        """Test the last error is raised once retries are exhausted."""
+        fake_edgar_server.scripted[self.PATH] = [(503, {}, None)] * 3
+        client = self._client(retries=3)
+
+        with pytest.raises(requests.HTTPError):
+            client.get(fake_edgar_server.base_url + self.PATH)
+        assert client.stats["requests"] == 3
+        assert client.stats["retries"] == 2
+
+    @patch('scripts.data_ingestion._client', None)
+    def test_set_request_rate_relimits_shared_client(self):
+        """Test a shard can lower the process-wide client's rate limit."""
+        data_ingestion.set_request_rate(2.5)
+        assert data_ingestion.get_client().limiter.rate == 2.5
+
+    def test_rejects_zero_retries(self):
+        """Test retries counts attempts, so fewer than one is refused up front."""
+        with pytest.raises(ValueError):
+            self._client(retries=0)
+        with pytest.raises(ValueError):
+            self._client().get("http://127.0.0.1:9/unused", retries=0)
+
+    def test_negotiates_gzip(self):
+        """Test the session advertises gzip."""
+        client = self._client()
+        assert "gzip" in client.session.headers["Accept-Encoding"]
 
 
 @pytest.mark.slow
@@ -157,4 +233,353 @@ class TestIngestData:
         
         assert len(result) == 2
         assert mock_fetch.call_count == 2
+        mock_sleep.assert_not_called()
+
+
+class TestTokenBucket:
+    """Test cases for the shared token-bucket rate limiter."""
+
+    def test_burst_up_to_capacity_is_immediate(self):
+        """Test that a full bucket hands out `capacity` tokens without waiting."""
+        bucket = data_ingestion.TokenBucket(rate=5)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        assert time.monotonic() - start < 0.1
+
+    def test_rate_is_enforced_after_burst(self):
+        """Test that tokens beyond capacity are paced at `rate` per second."""
+        bucket = data_ingestion.TokenBucket(rate=20, capacity=1)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        assert time.monotonic() - start >= 0.18
+
+
+@pytest.mark.integration
+class TestIngestDataConcurrent:
+    """Concurrent ingestion against a local fake EDGAR server."""
+
+    COMPANIES = {'AAPL': '0000320193', 'MSFT': '0000789019', 'GOOGL': '0001652044'}
+
+    @staticmethod
+    def _facts(cik):
+        return {"facts": {"us-gaap": {"Revenues": {"units": {"USD": [
+            {"val": int(cik), "fy": 2023, "fp": "FY", "form": "10-K"},
+        ]}}}}}
+
+    def _register(self, server):
+        for ticker, cik in self.COMPANIES.items():
+            server.routes[f"/api/xbrl/companyfacts/CIK{cik}.json"] = {"entityName": ticker, **self._facts(cik)}
+
+    def test_fetch_companies_concurrent_matches_companies(self, fake_edgar_server):
+        """Test results are keyed by ticker in input order with per-company latency."""
+        self._register(fake_edgar_server)
+
+        raw_data, latencies = data_ingestion.fetch_companies_concurrent(
+            self.COMPANIES, max_workers=3, requests_per_second=50, base_url=fake_edgar_server.base_url
+        )
+
+        assert list(raw_data) == list(self.COMPANIES)
+        assert raw_data['MSFT'] == self._facts('0000789019')
+        assert set(latencies) == set(self.COMPANIES)
+        assert all(latency >= 0 for latency in latencies.values())
+
+    @patch('scripts.data_ingestion.time.sleep')
+    def test_missing_company_is_dropped(self, mock_sleep, fake_edgar_server):
+        """Test a company that 404s is left out, like the serial path."""
+        self._register(fake_edgar_server)
+        del fake_edgar_server.routes["/api/xbrl/companyfacts/CIK0000789019.json"]
+
+        raw_data, latencies = data_ingestion.fetch_companies_concurrent(
+            self.COMPANIES, max_workers=2, requests_per_second=50, base_url=fake_edgar_server.base_url
+        )
+
+        assert list(raw_data) == ['AAPL', 'GOOGL']
+        assert 'MSFT' in latencies
+
+    @patch('scripts.data_ingestion.extract_companies')
+    def test_ingest_data_concurrent_same_shape_as_serial(self, mock_extract, fake_edgar_server):
+        """Test ingest_data_concurrent returns the {ticker: facts} mapping."""
+        mock_extract.return_value = self.COMPANIES
+        self._register(fake_edgar_server)
+
+        result = data_ingestion.ingest_data_concurrent(
+            n=3, max_workers=2, requests_per_second=50, base_url=fake_edgar_server.base_url
+        )
+
+        mock_extract.assert_called_once_with(n=3)
+        assert set(result) == set(self.COMPANIES)
+
+
+class TestBulkArchive:
+    """Test cases for companyfacts.zip bulk ingestion."""
+
+    def _write_archive(self, path, ciks):
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for cik in ciks:
+                archive.writestr(f"CIK{cik}.json", json.dumps({"cik": int(cik), "facts": {"us-gaap": {"Revenues": {
+                    "units": {"USD": [{"val": int(cik), "fy": 2023, "fp": "FY", "form": "10-K"}]}}}}}))
+
+    def test_iter_bulk_facts_only_requested_ciks(self, tmp_path):
+        """Test that only CIKs resolved by extract_companies are decoded."""
+        archive_path = tmp_path / "companyfacts.zip"
+        self._write_archive(archive_path, ['0000320193', '0000789019', '0001652044'])
+
+        result = dict(data_ingestion.iter_bulk_facts(
+            {'AAPL': '0000320193', 'GOOGL': '0001652044'}, archive_path=archive_path
+        ))
+
+        assert list(result) == ['AAPL', 'GOOGL']
+        assert result['AAPL']['facts']['us-gaap']['Revenues']['units']['USD'][0]['val'] == 320193
+        assert 'cik' not in result['AAPL']
+
+    def test_iter_bulk_facts_skips_missing_members(self, tmp_path):
+        """Test a CIK absent from the archive is skipped."""
+        archive_path = tmp_path / "companyfacts.zip"
+        self._write_archive(archive_path, ['0000320193'])
+
+        result = dict(data_ingestion.iter_bulk_facts(
+            {'AAPL': '0000320193', 'MSFT': '0000789019'}, archive_path=archive_path
+        ))
+
+        assert list(result) == ['AAPL']
+
+    @patch('scripts.data_ingestion.extract_companies')
+    def test_ingest_data_bulk(self, mock_extract, tmp_path):
+        """Test ingest_data_bulk returns {ticker: facts}."""
+        archive_path = tmp_path / "companyfacts.zip"
+        self._write_archive(archive_path, ['0000320193', '0000789019'])
+        mock_extract.return_value = {'AAPL': '0000320193'}
+
+        result = data_ingestion.ingest_data_bulk(n=1, archive_path=archive_path)
+
+        assert list(result) == ['AAPL']
+
+
+class TestHttpCacheIntegration:
+    """Test extract_companies through the persistent HTTP cache."""
+
+    def test_extract_companies_uses_cache(self, fake_edgar_server, tmp_path):
+        """Test the tickers file is downloaded once across runs."""
+        fake_edgar_server.routes["/files/company_tickers.json"] = {
+            '0': {'ticker': 'AAPL', 'cik_str': 320193}
+        }
+        with patch.object(data_ingestion.config, 'SEC_TICKERS_URL',
+                          fake_edgar_server.base_url + "/files/company_tickers.json"):
+            cache = data_ingestion.enable_http_cache(cache_dir=str(tmp_path))
+            try:
+                first = data_ingestion.extract_companies()
+                second = data_ingestion.extract_companies()
+            finally:
+                data_ingestion.disable_http_cache()
+
+        assert first == second == {'AAPL': '0000320193'}
+        assert cache.stats["hits"] == 1
+        assert len(fake_edgar_server.requests_seen) == 1
+
+
+class TestIngestDataIncremental:
+    """Test cases for watermark-driven incremental ingestion."""
+
+    @staticmethod
+    def _submissions(*filings):
+        return {"filings": {"recent": {
+            "accessionNumber": [accn for accn, _ in filings],
+            "form": [form for _, form in filings],
+        }}}
+
+    @staticmethod
+    def _facts(cik, accn):
+        return {"facts": {"us-gaap": {"Revenues": {"units": {"USD": [
+            {"val": int(cik), "fy": 2023, "fp": "FY", "form": "10-K", "accn": accn},
+        ]}}}}}
+
+    @patch('scripts.data_ingestion._get_json')
+    def test_fetch_filing_watermark_picks_latest_annual_filing(self, mock_get_json):
+        """Test the watermark ignores forms outside WATERMARK_FORMS."""
+        mock_get_json.return_value = self._submissions(
+            ("0000320193-24-000010", "8-K"), ("0000320193-23-000106", "10-K")
+        )
+
+        assert data_ingestion.fetch_filing_watermark('0000320193') == "0000320193-23-000106"
+
+    @patch('scripts.data_ingestion.extract_companies')
+    @patch('scripts.data_ingestion.fetch_filing_watermark')
+    @patch('scripts.data_ingestion.fetch_raw_facts')
+    def test_only_moved_watermarks_are_refetched(self, mock_fetch, mock_mark, mock_extract, tmp_path):
+        """Test the second run reuses stored facts for unchanged companies."""
+        mock_extract.return_value = {'AAPL': '0000320193', 'MSFT': '0000789019'}
+        marks = {'0000320193': '0000320193-A', '0000789019': '0000789019-A'}
+        mock_mark.side_effect = marks.get
+        mock_fetch.side_effect = lambda cik: self._facts(cik, marks[cik])
+
+        first = data_ingestion.ingest_data_incremental(n=2, state_dir=str(tmp_path))
+        assert mock_fetch.call_count == 2
+
+        marks['0000789019'] = '0000789019-B'
+        second = data_ingestion.ingest_data_incremental(n=2, state_dir=str(tmp_path))
+
+        assert mock_fetch.call_count == 3
+        mock_fetch.assert_called_with('0000789019')
+        assert first['AAPL'] == second['AAPL']
+        assert data_ingestion.load_watermarks(str(tmp_path))['0000789019'] == '0000789019-B'
+
+    @patch('scripts.data_ingestion.fetch_filing_watermark')
+    @patch('scripts.data_ingestion.fetch_raw_facts')
+    def test_lagging_facts_do_not_advance_watermark(self, mock_fetch, mock_mark, tmp_path):
+        """Test facts without the new filing are stored but refetched on the next run."""
+        companies = {'AAPL': '0000320193'}
+        mock_mark.return_value = '0000320193-B'
+        mock_fetch.return_value = self._facts('0000320193', '0000320193-A')
+
+        first = data_ingestion.ingest_companies_incremental(companies, state_dir=str(tmp_path))
+        assert first['AAPL'] == mock_fetch.return_value
+        assert data_ingestion.load_watermark('0000320193', str(tmp_path)) is None
+
+        mock_fetch.return_value = self._facts('0000320193', '0000320193-B')
+        data_ingestion.ingest_companies_incremental(companies, state_dir=str(tmp_path))
+        data_ingestion.ingest_companies_incremental(companies, state_dir=str(tmp_path))
+
+        assert mock_fetch.call_count == 2
+        assert data_ingestion.load_watermark('0000320193', str(tmp_path)) == '0000320193-B'
+
+    @patch('scripts.data_ingestion.extract_companies')
+    @patch('scripts.data_ingestion.fetch_filing_watermark')
+    @patch('scripts.data_ingestion.fetch_raw_facts')
+    def test_unknown_watermark_always_refetches(self, mock_fetch, mock_mark, mock_extract, tmp_path):
+        """Test a failed submissions lookup falls back to a full fetch."""
+        mock_extract.return_value = {'AAPL': '0000320193'}
+        mock_mark.side_effect = Exception("submissions unavailable")
+        mock_fetch.return_value = {"facts": {"us-gaap": {}}}
+
+        data_ingestion.ingest_data_incremental(n=1, state_dir=str(tmp_path))
+        data_ingestion.ingest_data_incremental(n=1, state_dir=str(tmp_path))
+
+        assert mock_fetch.call_count == 2
+
+    @patch('scripts.data_ingestion.fetch_filing_watermark')
+    @patch('scripts.data_ingestion.fetch_raw_facts')
+    def test_failed_refetch_serves_stored_facts(self, mock_fetch, mock_mark, tmp_path):
+        """Test a moved watermark whose refetch fails keeps the stored facts and the old watermark."""
+        companies = {'AAPL': '0000320193'}
+        stored = self._facts('0000320193', '0000320193-A')
+        data_ingestion.store_facts('0000320193', stored, str(tmp_path))
+        data_ingestion.save_watermark('0000320193', '0000320193-A', str(tmp_path))
+        mock_mark.return_value = '0000320193-B'
+        mock_fetch.return_value = None
+
+        result = data_ingestion.ingest_companies_incremental(companies, state_dir=str(tmp_path))
+
+        assert result == {'AAPL': stored}
+        assert data_ingestion.load_watermark('0000320193', str(tmp_path)) == '0000320193-A'
+
+    @patch('scripts.data_ingestion.fetch_filing_watermark')
+    @patch('scripts.data_ingestion.fetch_raw_facts')
+    def test_failed_submissions_and_refetch_serve_stored_facts(self, mock_fetch, mock_mark, tmp_path):
+        """Test a company whose submissions and facts requests both fail is still served from storage."""
+        companies = {'AAPL': '0000320193'}
+        stored = self._facts('0000320193', '0000320193-A')
+        data_ingestion.store_facts('0000320193', stored, str(tmp_path))
+        mock_mark.side_effect = Exception("submissions unavailable")
+        mock_fetch.return_value = None
+
+        result = data_ingestion.ingest_companies_incremental(companies, state_dir=str(tmp_path))
+
+        assert result == {'AAPL': stored}
+        assert data_ingestion.load_watermark('0000320193', str(tmp_path)) is None
+
+    def test_state_accepts_file_uri(self, tmp_path):
+        """Test watermarks and stored facts round-trip through a file:// state URI."""
+        state = f"file://{tmp_path}/shared"
+        data_ingestion.save_watermark('0000320193', '0000320193-A', state)
+        data_ingestion.store_facts('0000320193', self._facts('0000320193', '0000320193-A'), state)
+
+        assert data_ingestion.load_watermarks(state) == {'0000320193': '0000320193-A'}
+        assert data_ingestion.load_stored_facts('0000320193', str(tmp_path / "shared")) == \
+            self._facts('0000320193', '0000320193-A')
+        assert data_ingestion.load_watermark('0000789019', state) is None
+
+    @patch('scripts.data_ingestion.fetch_filing_watermark')
+    @patch('scripts.data_ingestion.fetch_raw_facts')
+    def test_iter_companies_incremental_is_lazy(self, mock_fetch, mock_mark, tmp_path):
+        """Test the streaming variant fetches one company per item consumed."""
+        mock_mark.return_value = None
+        mock_fetch.side_effect = lambda cik: {"cik": cik, "facts": {"us-gaap": {}}}
+        companies = {'AAPL': '0000320193', 'MSFT': '0000789019'}
+
+        stream = data_ingestion.iter_companies_incremental(companies, state_dir=str(tmp_path))
+        assert next(stream) == ('AAPL', {"cik": '0000320193', "facts": {"us-gaap": {}}})
+        assert mock_fetch.call_count == 1
+        assert [ticker for ticker, _ in stream] == ['MSFT']
+
+
+class TestDecodeCompanyFacts:
+    """Test cases for the selective companyfacts decoder."""
+
+    @staticmethod
+    def _document(sample_company_facts):
+        doc = json.loads(json.dumps(sample_company_facts))
+        us_gaap = doc["facts"]["us-gaap"]
+        us_gaap["Revenues"]["units"]["USD"].append({"val": 250000, "fy": 2023, "fp": "Q1", "form": "10-Q"})
+        us_gaap["UnrelatedConcept"] = {"units": {"USD": [{"val": 1, "fy": 2023, "fp": "FY", "form": "10-K"}]}}
+        us_gaap["Assets"]["units"]["shares"] = [{"val": 7, "fy": 2023, "fp": "FY", "form": "10-K"}]
+        doc["facts"]["ifrs-full"] = {"Assets": {"units": {"USD": [{"val": -1, "fy": 2023, "fp": "FY", "form": "10-K"}]}}}
+        doc["facts"] = {"dei": {"EntityCommonStockSharesOutstanding": {"units": {"shares": []}}}, **doc["facts"]}
+        return doc
+
+    def test_keeps_only_configured_annual_observations(self, sample_company_facts):
+        """Test unlisted concepts, units, namespaces and non-10-K rows are dropped."""
+        raw = json.dumps(self._document(sample_company_facts), separators=(",", ":")).encode("utf-8")
+
+        result = data_ingestion.decode_company_facts(raw)
+
+        us_gaap = result["facts"]["us-gaap"]
+        assert set(us_gaap) == {"Revenues", "NetIncomeLoss", "Assets", "GrossProfit"}
+        assert [obs["val"] for obs in us_gaap["Revenues"]["units"]["USD"]] == [1000000, 950000]
+        assert us_gaap["Assets"]["units"] == {"USD": sample_company_facts["facts"]["us-gaap"]["Assets"]["units"]["USD"]}
+
+    def test_pretty_printed_document_falls_back_to_full_decode(self, sample_company_facts):
+        """Test non-compact JSON gives the same result as compact JSON."""
+        doc = self._document(sample_company_facts)
+        compact = json.dumps(doc, separators=(",", ":"))
+        pretty = json.dumps(doc, indent=2)
+
+        assert data_ingestion.decode_company_facts(pretty) == data_ingestion.decode_company_facts(compact)
+
+    def test_preprocessing_output_is_unchanged(self, sample_company_facts):
+        """Test process_company_data gives identical records on the pruned document."""
+        from scripts import data_preprocessing
+        doc = self._document(sample_company_facts)
+        raw = json.dumps(doc, separators=(",", ":"))
+
+        full = data_preprocessing.process_company_data("AAPL", json.loads(raw))
+        selective = data_preprocessing.process_company_data("AAPL", data_ingestion.decode_company_facts(raw))
+
+        assert json.dumps(full, sort_keys=True, default=str) == json.dumps(selective, sort_keys=True, default=str)
+
+
+class TestShardCompanies:
+    """Test cases for CIK sharding used by the mapped DAG tasks."""
+
+    COMPANIES = {f'T{i}': str(1000 + i).zfill(10) for i in range(10)}
+
+    def test_every_company_lands_in_exactly_one_shard(self):
+        """Test shards partition the universe."""
+        shards = data_ingestion.shard_companies(self.COMPANIES, num_shards=3)
+        merged = {}
+        for shard in shards:
+            assert not set(shard) & set(merged)
+            merged.update(shard)
+        assert merged == self.COMPANIES
+
+    def test_assignment_is_stable(self):
+        """Test a CIK always maps to the same shard."""
+        first = data_ingestion.shard_companies(self.COMPANIES, num_shards=4)
+        second = data_ingestion.shard_companies(dict(reversed(list(self.COMPANIES.items()))), num_shards=4)
+        assert [set(s) for s in first] == [set(s) for s in second]
 
+    def test_empty_shards_are_dropped(self):
+        """Test more shards than companies yields no empty shards."""
+        shards = data_ingestion.shard_companies({'AAPL': '0000320193'}, num_shards=8)
+        assert shards == [{'AAPL': '0000320193'}]
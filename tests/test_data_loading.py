@@ -9,6 +9,7 @@ from pathlib import Path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
+from scripts import config
 from scripts import data_loading
 
 
@@ -100,3 +101,289 @@ class TestSaveToS3:
         with pytest.raises(Exception, match="S3 error"):
             data_loading.save_to_s3(test_data)
 
+
+    @patch('scripts.data_loading.boto3.session.Session')
+    def test_save_to_s3_columnar_payload(self, mock_session_class):
+        """Test a dictionary-encoded payload is uploaded compactly and unchanged."""
+        mock_s3_client = Mock()
+        mock_session_class.return_value.client.return_value = mock_s3_client
+        payload = {"format": "columnar-v1", "tickers": ["AAPL"], "metrics": [], "ticker_id": [0],
+                   "metric_id": [0], "year": [2023], "value": [None]}
+
+        data_loading.save_to_s3(payload)
+
+        body = mock_s3_client.put_object.call_args[1]["Body"]
+        assert b"\n" not in body
+        assert json.loads(body) == payload
+
+
+class TestSaveBatchesToS3:
+    """Test cases for streaming batch uploads."""
+
+    @staticmethod
+    def _batch(year):
+        return [{"year": year, "metric": "income_stmt_Revenue", "value": 1.0, "ticker": "AAPL"}]
+
+    @patch('scripts.data_loading.boto3.session.Session')
+    def test_each_batch_is_a_part(self, mock_session_class, fake_s3):
+        """Test batches are uploaded one part each, in order, as they arrive."""
+        mock_session_class.return_value.client.return_value = fake_s3
+        uploaded_before = []
+
+        def batches():
+            for year in (2022, 2023):
+                uploaded_before.append(len(fake_s3.objects))
+                yield self._batch(year)
+
+        keys = data_loading.save_batches_to_s3(batches())
+
+        assert uploaded_before == [0, 1]
+        assert [key.rsplit("/", 1)[1] for key in keys] == ["part-00000.json", "part-00001.json"]
+        bodies = [json.loads(fake_s3.objects[(config.S3_BUCKET, key)]) for key in keys]
+        assert [b["year"] for b in bodies] == [[2022], [2023]]
+        assert bodies[0]["tickers"] == ["AAPL"]
+
+    @patch('scripts.data_loading.boto3.session.Session')
+    def test_rerun_replaces_earlier_parts(self, mock_session_class, fake_s3):
+        """Test a same-day rerun with fewer batches leaves no stale parts behind."""
+        mock_session_class.return_value.client.return_value = fake_s3
+        fake_s3.objects[(config.S3_BUCKET, "elsewhere/part-00000.json")] = b"{}"
+        data_loading.save_batches_to_s3(self._batch(year) for year in (2020, 2021, 2022))
+
+        keys = data_loading.save_batches_to_s3([self._batch(2023)])
+
+        assert sorted(k for _, k in fake_s3.objects) == sorted(keys + ["elsewhere/part-00000.json"])
+
+
+class TestParquetPartitions:
+    """Test cases for the partitioned Parquet writer against a filesystem target."""
+
+    @staticmethod
+    def _batches():
+        return [
+            [{"year": 2022, "metric": "income_stmt_Revenue", "value": 100.0, "ticker": "AAPL"},
+             {"year": 2023, "metric": "income_stmt_Revenue", "value": 120.0, "ticker": "AAPL"}],
+            [{"year": 2023, "metric": "Return on Assets (ROA) %", "value": None, "ticker": "MSFT"},
+             {"year": 2023, "metric": "income_stmt_Revenue", "value": 90.0, "ticker": "MSFT"}],
+        ]
+
+    def test_partitions_by_year_and_metric(self, tmp_path):
+        """Test one hive directory per (year, metric) and compressed, dictionary-encoded files."""
+        import pyarrow.parquet as pq
+
+        written = data_loading.write_parquet_partitions(self._batches(), str(tmp_path))
+
+        assert written["rows"] == 4
+        dirs = sorted(str(Path(f).parent.relative_to(tmp_path)) for f in written["files"])
+        assert dirs == ["year=2022/metric=income_stmt_Revenue",
+                        "year=2023/metric=Return%20on%20Assets%20%28ROA%29%20%25",
+                        "year=2023/metric=income_stmt_Revenue",
+                        "year=2023/metric=income_stmt_Revenue"]
+        column = pq.ParquetFile(written["files"][0]).metadata.row_group(0).column(0)
+        assert column.compression == "ZSTD"
+        assert "RLE_DICTIONARY" in column.encodings
+
+    def test_reader_prunes_columns_and_partitions(self, tmp_path):
+        """Test partition filters and column projection on read."""
+        import pyarrow.dataset as ds
+
+        data_loading.write_parquet_partitions(self._batches(), str(tmp_path))
+
+        frame = data_loading.read_parquet_partitions(
+            str(tmp_path), columns=["ticker", "value"],
+            filters=(ds.field("year") == 2023) & (ds.field("metric") == "income_stmt_Revenue"),
+        )
+
+        assert list(frame.columns) == ["ticker", "value"]
+        assert sorted(zip(frame["ticker"].astype(str), frame["value"])) == [("AAPL", 120.0), ("MSFT", 90.0)]
+
+    def test_ticker_partitioning_and_columnar_input(self, tmp_path):
+        """Test partitioning by ticker from a dictionary-encoded payload."""
+        from scripts.data_preprocessing import to_columnar
+        import pandas as pd
+
+        payload = to_columnar(pd.DataFrame(self._batches()[1]))
+        data_loading.write_parquet_partitions(payload, str(tmp_path), partition_by=("year", "ticker"))
+
+        assert (tmp_path / "year=2023" / "ticker=MSFT").is_dir()
+        frame = data_loading.read_parquet_partitions(str(tmp_path))
+        assert frame["value"].isna().sum() == 1
+
+    def test_rerun_replaces_previous_files(self, tmp_path):
+        """Test a rerun with fewer batches leaves no rows from the earlier run."""
+        data_loading.write_parquet_partitions(self._batches(), str(tmp_path))
+        rerun = self._batches()[0] + [dict(self._batches()[1][1], value=95.0)]
+
+        data_loading.write_parquet_partitions([rerun], str(tmp_path))
+
+        frame = data_loading.read_parquet_partitions(str(tmp_path))
+        msft = frame[frame["ticker"] == "MSFT"]
+        assert len(frame) == 3
+        assert msft["value"].tolist() == [95.0]
+
+
+class TestStreamingUpload:
+    """Test cases for the compressed multipart upload against an in-memory S3 stand-in."""
+
+    @staticmethod
+    def _batches(n_batches=4, rows=2000):
+        import pandas as pd
+        import numpy as np
+        rng = np.random.default_rng(0)
+        for b in range(n_batches):
+            yield pd.DataFrame({
+                "year": 2000 + np.arange(rows) % 24,
+                "metric": "income_stmt_Revenue",
+                "value": rng.normal(size=rows),
+                "ticker": f"T{b}",
+            })
+
+    def test_gzip_parts_reassemble_to_json_array(self, fake_s3):
+        """Test many small parts complete into one gzip JSON document."""
+        import gzip
+
+        result = data_loading.upload_json_stream(
+            self._batches(), "bucket", "metrics.json.gz", fake_s3, compression="gzip", part_size=4096, max_workers=3
+        )
+
+        assert result["parts"] > 5
+        records = json.loads(gzip.decompress(fake_s3.objects[("bucket", "metrics.json.gz")]))
+        assert len(records) == 8000
+        assert records[-1]["ticker"] == "T3"
+        assert result["compressed_bytes"] < result["raw_bytes"]
+        assert fake_s3.uploads == {} and fake_s3.aborted == []
+
+    def test_record_list_and_empty_input(self, fake_s3):
+        """Test plain record lists and empty input still produce valid JSON."""
+        import gzip
+
+        data_loading.upload_json_stream([{"a": 1}, {"a": 2}], "bucket", "a.json.gz", fake_s3, compression="gzip")
+        data_loading.upload_json_stream([], "bucket", "b.json.gz", fake_s3, compression="gzip")
+
+        assert json.loads(gzip.decompress(fake_s3.objects[("bucket", "a.json.gz")])) == [{"a": 1}, {"a": 2}]
+        assert json.loads(gzip.decompress(fake_s3.objects[("bucket", "b.json.gz")])) == []
+
+    def test_failed_part_aborts_upload(self, fake_s3):
+        """Test a failing part aborts the multipart upload and re-raises."""
+        fake_s3.fail_parts = {3}
+
+        with pytest.raises(RuntimeError, match="part 3 failed"):
+            data_loading.upload_json_stream(self._batches(), "bucket", "bad.json.gz", fake_s3, part_size=4096)
+
+        assert fake_s3.aborted == ["upload-1"]
+        assert fake_s3.uploads == {}
+        assert ("bucket", "bad.json.gz") not in fake_s3.objects
+
+    def test_unsupported_compression(self, fake_s3):
+        """Test an unknown codec is rejected before any upload starts."""
+        with pytest.raises(ValueError):
+            data_loading.upload_json_stream([], "bucket", "x", fake_s3, compression="brotli")
+        assert fake_s3.uploads == {}
+
+    @patch('scripts.data_loading.boto3.session.Session')
+    def test_save_to_s3_stream_mode(self, mock_session_class, fake_s3):
+        """Test save_to_s3(stream=True) uploads a .gz multipart object."""
+        import gzip
+        mock_session_class.return_value.client.return_value = fake_s3
+
+        key = data_loading.save_to_s3([{"ticker": "AAPL", "year": 2023, "value": 1.0}], stream=True)
+
+        assert key.endswith(".json.gz")
+        body = fake_s3.objects[(data_loading.config.S3_BUCKET, key)]
+        assert json.loads(gzip.decompress(body)) == [{"ticker": "AAPL", "year": 2023, "value": 1.0}]
+
+    def test_zstd_stream(self, fake_s3):
+        """Test the optional zstd codec round-trips."""
+        zstandard = pytest.importorskip("zstandard")
+
+        data_loading.upload_json_stream(self._batches(1, 10), "bucket", "m.json.zst", fake_s3, compression="zstd")
+
+        body = zstandard.ZstdDecompressor().stream_reader(fake_s3.objects[("bucket", "m.json.zst")]).read()
+        assert len(json.loads(body)) == 10
+
+
+class TestDeltaLoading:
+    """Test cases for manifest-based delta loading on a filesystem target."""
+
+    @staticmethod
+    def _frame(aapl_2023=120.0):
+        import pandas as pd
+        return pd.DataFrame({
+            "year": [2022, 2023, 2023, 2023],
+            "metric": ["income_stmt_Revenue", "income_stmt_Revenue", "Return on Assets (ROA) %", "income_stmt_Revenue"],
+            "value": [100.0, aapl_2023, None, 90.0],
+            "ticker": ["AAPL", "AAPL", "AAPL", "BRK/B"],
+        })
+
+    def test_first_load_publishes_every_partition(self, tmp_path):
+        """Test the first run uploads all ticker-year partitions as version 1."""
+        stats = data_loading.load_delta(self._frame(), root=str(tmp_path))
+
+        assert stats == {"version": 1, "partitions": 3, "uploaded": 3, "unchanged": 0, "removed": 0}
+        manifest = data_loading.load_manifest(str(tmp_path))
+        assert sorted(manifest["partitions"]) == ["AAPL/2022", "AAPL/2023", "BRK/B/2023"]
+        assert manifest["partitions"]["BRK/B/2023"]["path"].startswith("partitions/ticker=BRK%2FB/year=2023/")
+        latest = data_loading.read_latest(str(tmp_path))
+        assert len(latest) == 4
+
+    def test_only_changed_partitions_are_uploaded(self, tmp_path):
+        """Test a second run rewrites one partition and keeps the old version readable."""
+        data_loading.load_delta(self._frame(), root=str(tmp_path))
+        shuffled = self._frame(aapl_2023=125.0).sample(frac=1, random_state=0)
+
+        stats = data_loading.load_delta(shuffled, root=str(tmp_path))
+
+        assert stats == {"version": 2, "partitions": 3, "uploaded": 1, "unchanged": 2, "removed": 0}
+        v1, v2 = (data_loading.load_manifest(str(tmp_path), version=v) for v in (1, 2))
+        assert v2["parent"] == 1
+        assert v1["partitions"]["AAPL/2022"] == v2["partitions"]["AAPL/2022"]
+        assert v1["partitions"]["AAPL/2023"]["path"] != v2["partitions"]["AAPL/2023"]["path"]
+        old = data_loading.read_latest(str(tmp_path), version=1)
+        new = data_loading.read_latest(str(tmp_path), columns=["ticker", "value"])
+        assert 120.0 in old["value"].tolist() and 125.0 in new["value"].tolist()
+
+    def test_unchanged_run_keeps_version(self, tmp_path):
+        """Test identical input publishes nothing new."""
+        data_loading.load_delta(self._frame(), root=str(tmp_path))
+
+        stats = data_loading.load_delta([self._frame().iloc[:3], self._frame().iloc[3:]], root=str(tmp_path))
+
+        assert stats["version"] == 1 and stats["uploaded"] == 0
+        assert not (tmp_path / "manifests" / "v000002.json").exists()
+
+    def test_dropped_year_of_a_loaded_ticker_is_removed(self, tmp_path):
+        """Test a partition missing for a ticker present in the run is left out of the next version."""
+        data_loading.load_delta(self._frame(), root=str(tmp_path))
+
+        stats = data_loading.load_delta(self._frame().iloc[1:], root=str(tmp_path))
+
+        assert stats["removed"] == 1 and stats["version"] == 2
+        assert sorted(data_loading.load_manifest(str(tmp_path))["partitions"]) == ["AAPL/2023", "BRK/B/2023"]
+
+    def test_absent_ticker_is_carried_forward(self, tmp_path):
+        """Test a ticker missing from a run (e.g. a failed fetch) stays in the latest view."""
+        data_loading.load_delta(self._frame(), root=str(tmp_path))
+
+        stats = data_loading.load_delta(self._frame(aapl_2023=125.0).iloc[:3], root=str(tmp_path))
+
+        assert stats == {"version": 2, "partitions": 3, "uploaded": 1, "unchanged": 2, "removed": 0}
+        latest = data_loading.read_latest(str(tmp_path))
+        assert latest.loc[latest["ticker"] == "BRK/B", "value"].tolist() == [90.0]
+
+    def test_remove_tickers_deletes_whole_ticker(self, tmp_path):
+        """Test whole tickers are only dropped when listed explicitly."""
+        data_loading.load_delta(self._frame(), root=str(tmp_path))
+
+        stats = data_loading.load_delta(self._frame().iloc[:3], root=str(tmp_path), remove_tickers=["BRK/B"])
+
+        assert stats["removed"] == 1 and stats["version"] == 2
+        assert "BRK/B/2023" not in data_loading.load_manifest(str(tmp_path))["partitions"]
+
+    def test_manifest_read_errors_are_not_a_first_run(self):
+        """Test a failing manifest read aborts the load instead of restarting at version 1."""
+        filesystem = Mock()
+        filesystem.open_input_stream.side_effect = OSError("AWS Error NETWORK_CONNECTION during GetObject")
+
+        with pytest.raises(OSError):
+            data_loading.load_delta(self._frame(), root="bucket/metrics_delta", filesystem=filesystem)
+        filesystem.open_output_stream.assert_not_called()
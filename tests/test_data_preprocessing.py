@@ -1,5 +1,9 @@
 """Unit tests for data preprocessing functions."""
+import json
+import random
+import tempfile
 import unittest
+from unittest.mock import patch
 import sys
 from pathlib import Path
 import pandas as pd
@@ -126,6 +130,318 @@ class TestDataPreprocessing(unittest.TestCase):
         # They serve as examples of what to test for
         self.assertTrue(True)  # Placeholder assertion
 
+    def test_process_company_data_config_driven_metrics(self):
+        """Test derived metrics follow config formulas and skip missing inputs."""
+        result = data_preprocessing.process_company_data("AAPL", self.sample_facts)
+        by_metric = {(item['metric'], item['year']): item['value'] for item in result}
+
+        self.assertAlmostEqual(by_metric[('Net Profit Margin %', 2023)], 10.0)
+        self.assertAlmostEqual(by_metric[('Return on Assets (ROA) %', 2022)], 90000 / 4800000 * 100)
+        self.assertNotIn(('Current Ratio', 2023), by_metric)
+
+
+class TestProcessCompaniesBatch(unittest.TestCase):
+    """Test cases for the columnar batch extraction engine."""
+
+    def setUp(self):
+        """Set up a small multi-company universe."""
+        self.raw_data = {
+            "AAPL": {
+                "facts": {
+                    "us-gaap": {
+                        "Revenues": {"units": {"USD": [
+                            {"val": 1000000, "fy": 2023, "fp": "FY", "form": "10-K"},
+                            {"val": 950000, "fy": 2022, "fp": "FY", "form": "10-K"}
+                        ]}},
+                        "NetIncomeLoss": {"units": {"USD": [
+                            {"val": 100000, "fy": 2023, "fp": "FY", "form": "10-K"},
+                            {"val": 90000, "fy": 2022, "fp": "FY", "form": "10-K"}
+                        ]}},
+                        "Assets": {"units": {"USD": [
+                            {"val": 5000000, "fy": 2023, "fp": "FY", "form": "10-K"},
+                            {"val": 4800000, "fy": 2022, "fp": "FY", "form": "10-K"}
+                        ]}},
+                        "GrossProfit": {"units": {"USD": [
+                            {"val": 400000, "fy": 2023, "fp": "FY", "form": "10-K"},
+                            {"val": 380000, "fy": 2022, "fp": "FY", "form": "10-K"}
+                        ]}}
+                    }
+                }
+            },
+            "EMPTY": {"facts": {"us-gaap": {}}},
+            "MSFT": {
+                "facts": {
+                    "us-gaap": {
+                        "Revenues": {"units": {"USD": [
+                            {"val": 500, "fy": 2021, "fp": "FY", "form": "10-K"},
+                            {"val": 520, "fy": 2021, "fp": "FY", "form": "10-K"},
+                            {"val": 130, "fy": 2021, "fp": "Q1", "form": "10-Q"}
+                        ]}},
+                        "NetIncomeLoss": {"units": {"USD": [
+                            {"val": 50, "fy": 2021, "fp": "FY", "form": "10-K"},
+                            {"val": 45, "fy": 2020, "fp": "FY", "form": "10-K"}
+                        ]}},
+                        "Assets": {"units": {"USD": [{"val": 0, "fy": 2021, "fp": "FY", "form": "10-K"}]}},
+                        "GrossProfit": {"units": {"USD": [{"val": 200, "fy": 2021, "fp": "FY", "form": "10-K"}]}},
+                        "StockholdersEquity": {"units": {"USD": [{"val": 900, "fy": 2019, "fp": "FY", "form": "10-K"}]}}
+                    }
+                }
+            }
+        }
+
+    def _serial(self):
+        records = []
+        for ticker, facts in self.raw_data.items():
+            records.extend(data_preprocessing.process_company_data(ticker, facts))
+        return records
+
+    def test_matches_per_company_records(self):
+        """Test batch output equals the concatenated per-company output."""
+        serial = pd.DataFrame(self._serial())
+        batch = pd.DataFrame(data_preprocessing.process_companies_batch(self.raw_data))
+        pd.testing.assert_frame_equal(batch, serial)
+
+    def test_extract_observations_filters_annual_rows(self):
+        """Test only 10-K/FY observations survive the vectorised mask."""
+        obs = data_preprocessing.extract_observations_batch(self.raw_data)
+        self.assertEqual(len(obs), 8 + 7)
+        self.assertEqual(list(obs["ticker"].cat.categories), ["AAPL", "EMPTY", "MSFT"])
+        self.assertNotIn(130, obs["value"].tolist())
+
+    def test_empty_universe(self):
+        """Test an empty universe returns an empty list."""
+        self.assertEqual(data_preprocessing.process_companies_batch({}), [])
+        self.assertEqual(data_preprocessing.process_companies_batch({"X": {"facts": {}}}), [])
+
+
+class TestResolveDuplicates(unittest.TestCase):
+    """Test cases for amendment and comparative-period resolution."""
+
+    def setUp(self):
+        """Revenue for FY2022 reported three times, plus a Q4-only duration."""
+        self.facts = {
+            "facts": {
+                "us-gaap": {
+                    "Revenues": {"units": {"USD": [
+                        {"val": 120, "fy": 2023, "fp": "FY", "form": "10-K", "start": "2022-01-01",
+                         "end": "2022-12-31", "filed": "2024-02-01", "accn": "0001-24-000001"},
+                        {"val": 150, "fy": 2023, "fp": "FY", "form": "10-K", "start": "2023-01-01",
+                         "end": "2023-12-31", "filed": "2024-02-01", "accn": "0001-24-000001"},
+                        {"val": 100, "fy": 2022, "fp": "FY", "form": "10-K", "start": "2022-01-01",
+                         "end": "2022-12-31", "filed": "2023-02-01", "accn": "0001-23-000001"},
+                        {"val": 110, "fy": 2022, "fp": "FY", "form": "10-K/A", "start": "2022-01-01",
+                         "end": "2022-12-31", "filed": "2023-06-01", "accn": "0001-23-000009"},
+                        {"val": 40, "fy": 2023, "fp": "FY", "form": "10-K", "start": "2023-10-01",
+                         "end": "2023-12-31", "filed": "2024-02-01", "accn": "0001-24-000001"}
+                    ]}}
+                }
+            }
+        }
+
+    def _revenue(self, facts):
+        records = data_preprocessing.process_company_data("AAPL", facts)
+        return {r["year"]: r["value"] for r in records if r["metric"] == "income_stmt_Revenue"}
+
+    def test_latest_filing_wins_per_period(self):
+        """Test the latest-filed value is kept under the period's own fiscal year."""
+        self.assertEqual(self._revenue(self.facts), {2022: 120, 2023: 150})
+
+    def test_resolution_ignores_input_order(self):
+        """Test shuffled observations resolve to the same values."""
+        obs = self.facts["facts"]["us-gaap"]["Revenues"]["units"]["USD"]
+        for seed in range(5):
+            shuffled = list(obs)
+            random.Random(seed).shuffle(shuffled)
+            facts = {"facts": {"us-gaap": {"Revenues": {"units": {"USD": shuffled}}}}}
+            self.assertEqual(self._revenue(facts), {2022: 120, 2023: 150})
+            batch = data_preprocessing.process_companies_batch({"AAPL": facts})
+            self.assertEqual({r["year"]: r["value"] for r in batch}, {2022: 120, 2023: 150})
+
+    def test_amendment_replaces_original(self):
+        """Test a 10-K/A supersedes the original 10-K when nothing later restates it."""
+        obs = self.facts["facts"]["us-gaap"]["Revenues"]["units"]["USD"][2:4]
+        facts = {"facts": {"us-gaap": {"Revenues": {"units": {"USD": obs}}}}}
+        self.assertEqual(self._revenue(facts), {2022: 110})
+
+
+class TestProcessCompaniesCached(unittest.TestCase):
+    """Test cases for content-hash memoisation of preprocessing results."""
+
+    def setUp(self):
+        """Set up a temporary cache and two companies."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.raw_data = {
+            ticker: {"facts": {"us-gaap": {
+                "Revenues": {"units": {"USD": [{"val": val, "fy": 2023, "fp": "FY", "form": "10-K"}]}},
+                "NetIncomeLoss": {"units": {"USD": [{"val": val // 10, "fy": 2023, "fp": "FY", "form": "10-K"}]}}
+            }}}
+            for ticker, val in (("AAPL", 1000), ("MSFT", 500))
+        }
+
+    def _run(self, raw_data):
+        cache = data_preprocessing.enable_result_cache(self.tmp.name)
+        return data_preprocessing.process_companies_cached(raw_data, cache, max_workers=1), cache
+
+    def test_matches_uncached_output(self):
+        """Test cold and warm runs both equal the uncached output."""
+        expected = data_preprocessing.process_companies_parallel(self.raw_data, max_workers=1, as_frame=True)
+        cold, cold_cache = self._run(self.raw_data)
+        warm, warm_cache = self._run(self.raw_data)
+        pd.testing.assert_frame_equal(cold, expected)
+        pd.testing.assert_frame_equal(warm, expected)
+        self.assertEqual(cold_cache.hit_rate(), 0.0)
+        self.assertEqual(warm_cache.hit_rate(), 1.0)
+
+    def test_changed_company_is_recomputed(self):
+        """Test only the company whose facts changed misses the cache."""
+        self._run(self.raw_data)
+        self.raw_data["MSFT"]["facts"]["us-gaap"]["Revenues"]["units"]["USD"][0]["val"] = 700
+        frame, cache = self._run(self.raw_data)
+        self.assertEqual(cache.stats["hits"], 1)
+        self.assertEqual(cache.stats["misses"], 1)
+        revenue = frame[(frame["ticker"] == "MSFT") & (frame["metric"] == "income_stmt_Revenue")]
+        self.assertEqual(revenue["value"].tolist(), [700])
+
+    def test_definition_change_invalidates_keys(self):
+        """Test the key depends on the XBRL_TAGS definition."""
+        facts = self.raw_data["AAPL"]
+        key = data_preprocessing.company_cache_key(facts)
+        with patch.dict(data_preprocessing.config.XBRL_TAGS, {"Extra": {"formula": "{income_stmt_Revenue} * 2"}}):
+            self.assertNotEqual(data_preprocessing.company_cache_key(facts), key)
+        self.assertEqual(data_preprocessing.company_cache_key(facts), key)
+
+
+class TestColumnarOutput(unittest.TestCase):
+    """Test cases for the dictionary-encoded columnar output."""
+
+    def setUp(self):
+        """Set up processed output for two companies."""
+        facts = {"facts": {"us-gaap": {
+            "Revenues": {"units": {"USD": [{"val": 1000, "fy": 2023, "fp": "FY", "form": "10-K"}]}},
+            "NetIncomeLoss": {"units": {"USD": [{"val": 100, "fy": 2023, "fp": "FY", "form": "10-K"}]}},
+            "Assets": {"units": {"USD": [{"val": 0, "fy": 2023, "fp": "FY", "form": "10-K"}]}}
+        }}}
+        self.frame = data_preprocessing.process_companies_frame({"AAPL": facts, "MSFT": facts})
+
+    def test_round_trip(self):
+        """Test to_columnar / from_columnar preserve rows and order."""
+        payload = data_preprocessing.to_columnar(self.frame)
+        self.assertEqual(payload["tickers"], ["AAPL", "MSFT"])
+        decoded = data_preprocessing.from_columnar(payload)
+        self.assertEqual(str(decoded["metric"].dtype), "category")
+        decoded["metric"] = decoded["metric"].astype(object)
+        decoded["ticker"] = decoded["ticker"].astype(object)
+        pd.testing.assert_frame_equal(decoded, self.frame, check_dtype=False)
+
+    def test_metadata_stored_once(self):
+        """Test descriptions live only in the side table, keyed by metric id."""
+        payload = data_preprocessing.to_columnar(self.frame)
+        metrics = {m["metric_id"]: m for m in payload["metrics"]}
+        revenue = metrics[payload["metric_id"][self.frame["metric"].tolist().index("income_stmt_Revenue")]]
+        self.assertEqual(revenue["tag"], "Revenues")
+        self.assertEqual(revenue["unit"], "USD")
+        self.assertIsNone(payload["value"][self.frame["metric"].tolist().index("Return on Assets (ROA) %")])
+        json.dumps(payload, allow_nan=False)
+
+    def test_concat_remaps_tickers(self):
+        """Test shard payloads merge with one ticker dictionary."""
+        aapl = data_preprocessing.to_columnar(self.frame[self.frame["ticker"] == "AAPL"])
+        msft = data_preprocessing.to_columnar(self.frame[self.frame["ticker"] == "MSFT"])
+        merged = data_preprocessing.concat_columnar([aapl, None, msft])
+        self.assertEqual(merged["tickers"], ["AAPL", "MSFT"])
+        self.assertEqual(merged["ticker_id"], data_preprocessing.to_columnar(self.frame)["ticker_id"])
+        self.assertEqual(data_preprocessing.concat_columnar([])["ticker_id"], [])
+
+    def test_unknown_metric_rejected(self):
+        """Test metrics absent from config cannot be encoded."""
+        frame = pd.DataFrame({"year": [2023], "metric": ["Bogus"], "value": [1.0], "ticker": ["AAPL"]})
+        with self.assertRaises(ValueError):
+            data_preprocessing.to_columnar(frame)
+
+
+class TestStreamingBatches(unittest.TestCase):
+    """Test cases for the streaming preprocessing generators."""
+
+    def setUp(self):
+        """Set up five companies with two years of revenue each."""
+        self.raw_data = {
+            f"T{i}": {"facts": {"us-gaap": {"Revenues": {"units": {"USD": [
+                {"val": 100 + i, "fy": 2022, "fp": "FY", "form": "10-K"},
+                {"val": 200 + i, "fy": 2023, "fp": "FY", "form": "10-K"}
+            ]}}}}}
+            for i in range(5)
+        }
+
+    def test_rebatch_cuts_fixed_size_batches(self):
+        """Test frames are re-cut into equal batches with a short tail."""
+        frames = [pd.DataFrame({"n": range(start, start + 7)}) for start in (0, 7, 14)]
+        batches = list(data_preprocessing.rebatch(frames, batch_size=5))
+        self.assertEqual([len(b) for b in batches], [5, 5, 5, 5, 1])
+        self.assertEqual(pd.concat(batches)["n"].tolist(), list(range(21)))
+
+    def test_batches_match_whole_universe_output(self):
+        """Test streamed batches concatenate to the materialised output."""
+        batches = list(data_preprocessing.iter_processed_batches(iter(self.raw_data.items()), batch_size=3, group_size=2))
+        self.assertEqual([len(b) for b in batches], [3, 3, 3, 1])
+        pd.testing.assert_frame_equal(
+            pd.concat(batches, ignore_index=True),
+            data_preprocessing.process_companies_frame(self.raw_data),
+        )
+
+    def test_companies_are_consumed_lazily(self):
+        """Test the first batch only pulls the first group of companies."""
+        consumed = []
+
+        def companies():
+            for ticker, facts in self.raw_data.items():
+                consumed.append(ticker)
+                yield ticker, facts
+
+        batches = data_preprocessing.iter_processed_batches(companies(), batch_size=4, group_size=2)
+        self.assertEqual(len(next(batches)), 4)
+        self.assertEqual(consumed, ["T0", "T1"])
+
+
+class TestProcessCompaniesParallel(unittest.TestCase):
+    """Test cases for process-pool preprocessing."""
+
+    @staticmethod
+    def _facts(seed, n_years):
+        return {"facts": {"us-gaap": {
+            tag: {"units": {"USD": [
+                {"val": seed * 1000 + i * 7 + year, "fy": year, "fp": "FY", "form": "10-K"}
+                for year in range(2024 - n_years, 2024)
+            ]}}
+            for i, tag in enumerate(["Revenues", "NetIncomeLoss", "Assets", "GrossProfit", "StockholdersEquity"])
+        }}}
+
+    def setUp(self):
+        self.raw_data = {f"T{i:02d}": self._facts(i, 3 + (i % 4)) for i in range(12)}
+        self.raw_data["MEGA1"] = self._facts(99, 30)
+        self.raw_data["MEGA2"] = self._facts(98, 30)
+
+    def test_balance_chunks_separates_largest_filers(self):
+        """Test the two biggest companies never share a chunk."""
+        sizes = {"MEGA1": 100, "a": 1, "b": 1, "MEGA2": 90, "c": 2, "d": 1}
+        chunks = data_preprocessing.balance_chunks(sizes, 3)
+        self.assertFalse(any("MEGA1" in chunk and "MEGA2" in chunk for chunk in chunks))
+        self.assertEqual(sorted(t for chunk in chunks for t in chunk), sorted(sizes))
+        for chunk in chunks:
+            self.assertEqual(chunk, [t for t in sizes if t in chunk])
+
+    def test_parallel_matches_serial(self):
+        """Test the process-pool output equals the serial batch output, row for row."""
+        serial = pd.DataFrame(data_preprocessing.process_companies_batch(self.raw_data))
+        parallel = data_preprocessing.process_companies_parallel(self.raw_data, max_workers=2, as_frame=True)
+        pd.testing.assert_frame_equal(parallel, serial)
+
+    def test_parallel_records_and_empty_input(self):
+        """Test the records form and an empty universe."""
+        records = data_preprocessing.process_companies_parallel(self.raw_data, max_workers=1)
+        self.assertEqual(records, data_preprocessing.process_companies_batch(self.raw_data))
+        self.assertEqual(data_preprocessing.process_companies_parallel({}, max_workers=2), [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,89 @@
+"""Pytest tests for the derived-metric formula compiler."""
+import pytest
+import numpy as np
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts import config
+from scripts import derived_metrics
+
+
+TAGS = {
+    "Revenue": {"tag": "Revenues"},
+    "Cost": {"tag": "CostOfRevenue"},
+    "Assets": {"tag": "Assets"},
+    "Margin %": {"formula": "{Gross} / {Revenue} * 100"},
+    "Gross": {"formula": "{Revenue} - {Cost}"},
+    "Asset Turnover": {"formula": "{Revenue} / {Assets}"},
+}
+
+
+class TestParseFormula:
+    """Test cases for formula parsing and validation."""
+
+    def test_references_are_extracted_in_order(self):
+        _, labels = derived_metrics.parse_formula("({a b} - {c}) / {a b}")
+        assert labels == ["a b", "c"]
+
+    @pytest.mark.parametrize("formula", ["__import__('os')", "{a} ** 2", "{a} if {b} else 0", "x + 1", "'s'"])
+    def test_unsafe_or_unsupported_syntax_is_rejected(self, formula):
+        with pytest.raises(ValueError):
+            derived_metrics.parse_formula(formula)
+
+
+class TestMetricCompiler:
+    """Test cases for dependency resolution and vectorised evaluation."""
+
+    def test_dependencies_are_evaluated_first(self):
+        """Test a metric defined later in config is computed before its dependents."""
+        compiler = derived_metrics.MetricCompiler(TAGS)
+        assert compiler.order.index("Gross") < compiler.order.index("Margin %")
+
+    def test_circular_dependencies_are_rejected(self):
+        with pytest.raises(ValueError, match="Circular"):
+            derived_metrics.MetricCompiler({"a": {"formula": "{b} + 1"}, "b": {"formula": "{a} + 1"}})
+
+    def test_evaluate_fused_panel(self):
+        """Test all resolvable metrics are computed over the whole panel."""
+        compiler = derived_metrics.MetricCompiler(TAGS)
+        out = compiler.evaluate({
+            "Revenue": np.array([100.0, 200.0, 0.0]),
+            "Cost": np.array([60.0, np.nan, 10.0]),
+            "Assets": np.array([50.0, 0.0, 5.0]),
+        })
+        np.testing.assert_allclose(out["Gross"], [40.0, np.nan, -10.0])
+        np.testing.assert_allclose(out["Margin %"], [40.0, np.nan, np.nan])
+        np.testing.assert_allclose(out["Asset Turnover"], [2.0, np.nan, 0.0])
+
+    def test_metrics_with_missing_inputs_are_skipped(self):
+        """Test a metric (and its dependents) is skipped when an input column is absent."""
+        compiler = derived_metrics.MetricCompiler(TAGS)
+        out = compiler.evaluate({"Revenue": np.array([1.0]), "Assets": np.array([2.0])})
+        assert set(out) == {"Asset Turnover"}
+
+    def test_config_formulas_all_compile(self):
+        """Test every derived metric in config.XBRL_TAGS resolves from the raw tags."""
+        compiler = derived_metrics.MetricCompiler()
+        raw_labels = [label for label, info in config.XBRL_TAGS.items() if info.get("tag")]
+        derived_labels = [label for label, info in config.XBRL_TAGS.items() if info.get("formula")]
+        assert set(compiler.resolvable(raw_labels)) == set(derived_labels)
+
+    def test_config_ratios_match_descriptions(self):
+        """Test a few config formulas against hand-computed values."""
+        inputs = {label: np.array([0.0]) for label, info in config.XBRL_TAGS.items() if info.get("tag")}
+        inputs.update({
+            "income_stmt_Revenue": np.array([1000.0]),
+            "income_stmt_Gross Profit": np.array([400.0]),
+            "income_stmt_Operating Expenses": np.array([150.0]),
+            "balance_sheet_Current Assets": np.array([300.0]),
+            "balance_sheet_Current Liabilities": np.array([200.0]),
+        })
+        out = derived_metrics.MetricCompiler().evaluate(inputs)
+        assert out["Operating Income"][0] == 250.0
+        assert out["Operating Margin %"][0] == 25.0
+        assert out["Current Ratio"][0] == 1.5
+        assert np.isnan(out["Return on Equity (ROE) %"][0])
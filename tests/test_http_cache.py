@@ -0,0 +1,129 @@
+"""Pytest tests for the on-disk HTTP response cache."""
+import pytest
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.data_ingestion import SecClient
+from utils.http_cache import HttpCache
+
+
+class TestHttpCache:
+    """Test cases for HttpCache against a local fake EDGAR server."""
+
+    def test_fresh_entry_is_served_without_request(self, fake_edgar_server, tmp_path):
+        """Test a second lookup inside the TTL is a cache hit."""
+        fake_edgar_server.routes["/files/company_tickers.json"] = {"0": {"ticker": "AAPL", "cik_str": 320193}}
+        cache = HttpCache(str(tmp_path), ttl=3600)
+        url = fake_edgar_server.base_url + "/files/company_tickers.json"
+
+        first = cache.get_json(url)
+        second = cache.get_json(url)
+
+        assert first == second
+        assert len(fake_edgar_server.requests_seen) == 1
+        assert cache.stats["misses"] == 1
+        assert cache.stats["hits"] == 1
+
+    def test_stale_entry_is_revalidated_with_etag(self, fake_edgar_server, tmp_path):
+        """Test an expired entry sends If-None-Match and reuses the body on 304."""
+        fake_edgar_server.routes["/doc.json"] = {"v": 1}
+        cache = HttpCache(str(tmp_path), ttl=0)
+        url = fake_edgar_server.base_url + "/doc.json"
+
+        cache.get_json(url)
+        assert cache.get_json(url) == {"v": 1}
+
+        assert cache.stats["revalidations"] == 1
+        assert len(fake_edgar_server.requests_seen) == 2
+
+    @pytest.mark.parametrize("lose", ["evicted", "body_missing"])
+    def test_304_without_cached_body_refetches(self, fake_edgar_server, tmp_path, lose):
+        """Test an entry lost while its conditional request is in flight is fetched again in full."""
+        fake_edgar_server.routes["/doc.json"] = {"v": 1}
+        cache = HttpCache(str(tmp_path), ttl=0)
+        url = fake_edgar_server.base_url + "/doc.json"
+        cache.get_json(url)
+        real_get = cache.session.get
+
+        def get(url, headers=None, **kwargs):
+            if headers and "If-None-Match" in headers:
+                key = next(iter(cache._index))
+                if lose == "evicted":
+                    cache._remove(key)
+                else:
+                    os.remove(cache._paths(key)[0])
+            return real_get(url, headers=headers, **kwargs)
+
+        with patch.object(cache.session, "get", side_effect=get):
+            assert cache.get_json(url) == {"v": 1}
+
+        assert len(fake_edgar_server.requests_seen) == 3
+        assert cache.stats["revalidations"] == 0 and cache.stats["misses"] == 2
+        assert cache.get_json(url) == {"v": 1}
+
+    def test_changed_document_is_refetched(self, fake_edgar_server, tmp_path):
+        """Test a changed ETag replaces the cached body."""
+        fake_edgar_server.routes["/doc.json"] = {"v": 1}
+        cache = HttpCache(str(tmp_path), ttl=0)
+        url = fake_edgar_server.base_url + "/doc.json"
+
+        cache.get_json(url)
+        fake_edgar_server.routes["/doc.json"] = {"v": 2}
+
+        assert cache.get_json(url) == {"v": 2}
+        assert cache.stats["misses"] == 2
+
+    def test_cache_persists_across_instances(self, fake_edgar_server, tmp_path):
+        """Test entries are reloaded from disk by a new cache instance."""
+        fake_edgar_server.routes["/doc.json"] = {"v": 1}
+        url = fake_edgar_server.base_url + "/doc.json"
+        HttpCache(str(tmp_path), ttl=3600).get_json(url)
+
+        cache = HttpCache(str(tmp_path), ttl=3600)
+        cache.get_json(url)
+
+        assert cache.stats["hits"] == 1
+        assert len(fake_edgar_server.requests_seen) == 1
+
+    def test_lru_eviction_respects_max_bytes(self, fake_edgar_server, tmp_path):
+        """Test the least recently used entry is evicted when over budget."""
+        for name in ("a", "b", "c"):
+            fake_edgar_server.routes[f"/{name}.json"] = {"payload": name * 40}
+        cache = HttpCache(str(tmp_path), ttl=3600, max_bytes=120)
+        base = fake_edgar_server.base_url
+
+        cache.get(base + "/a.json")
+        cache.get(base + "/b.json")
+        cache.get(base + "/a.json")
+        cache.get(base + "/c.json")
+
+        assert cache.stats["evictions"] == 1
+        cached_urls = {meta["url"] for meta in cache._index.values()}
+        assert cached_urls == {base + "/a.json", base + "/c.json"}
+        assert len([f for f in os.listdir(tmp_path) if f.endswith(".body")]) == 2
+
+    def test_http_error_is_raised(self, fake_edgar_server, tmp_path):
+        """Test a 404 is raised and nothing is cached."""
+        cache = HttpCache(str(tmp_path))
+
+        with pytest.raises(Exception):
+            cache.get(fake_edgar_server.base_url + "/missing.json")
+        assert cache._index == {}
+
+    @patch('scripts.data_ingestion.time.sleep')
+    def test_retry_policy_reaches_the_client(self, mock_sleep, fake_edgar_server, tmp_path):
+        """Test per-call retries are applied by a SecClient session on a cache miss."""
+        path = "/api/xbrl/companyfacts/CIK0000320193.json"
+        fake_edgar_server.routes[path] = {"facts": {}}
+        fake_edgar_server.scripted[path] = [(503, {}, None)] * 2
+        client = SecClient(requests_per_second=1000, retries=2)
+        cache = HttpCache(str(tmp_path), session=client)
+
+        assert cache.get_json(fake_edgar_server.base_url + path, retries=3) == {"facts": {}}
+        assert client.stats["requests"] == 3
@@ -0,0 +1,99 @@
+"""Pytest tests for the in-process metrics query cache."""
+import pytest
+import pandas as pd
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts import data_loading
+from scripts.metrics_query import MetricsQueryCache
+
+
+def _frame(aapl_2023=120.0):
+    return pd.DataFrame({
+        "year": [2022, 2023, 2023, 2023, 2023],
+        "metric": ["income_stmt_Revenue", "income_stmt_Revenue", "Return on Assets (ROA) %",
+                   "income_stmt_Revenue", "Return on Assets (ROA) %"],
+        "value": [100.0, aapl_2023, None, 90.0, 4.0],
+        "ticker": ["AAPL", "AAPL", "AAPL", "BRK/B", "BRK/B"],
+    })
+
+
+@pytest.fixture
+def root(tmp_path):
+    data_loading.load_delta(_frame(), root=str(tmp_path))
+    return str(tmp_path)
+
+
+class TestQueries:
+    """Test cases for lookups served from the cache."""
+
+    def test_lookups(self, root):
+        """Test point, time-series and company lookups including missing values."""
+        cache = MetricsQueryCache(root, refresh_seconds=0)
+        assert cache.version == 1
+        assert cache.value("AAPL", "income_stmt_Revenue", 2023) == 120.0
+        assert cache.value("AAPL", "Return on Assets (ROA) %", 2023) is None
+        assert cache.value("AAPL", "income_stmt_Revenue", 2021) is None
+        assert cache.value("NOPE", "income_stmt_Revenue", 2023) is None
+        assert cache.time_series("AAPL", "income_stmt_Revenue") == [(2022, 100.0), (2023, 120.0)]
+        assert cache.time_series("AAPL", "income_stmt_Revenue", start_year=2023) == [(2023, 120.0)]
+        assert cache.company("BRK/B", 2023) == {"Return on Assets (ROA) %": 4.0, "income_stmt_Revenue": 90.0}
+
+    def test_hits_and_misses(self, root):
+        """Test a ticker is read once and then served from memory."""
+        cache = MetricsQueryCache(root, refresh_seconds=0)
+        for _ in range(3):
+            cache.value("AAPL", "income_stmt_Revenue", 2023)
+        assert cache.stats["misses"] == 1
+        assert cache.stats["hits"] == 2
+        assert cache.hit_rate() == pytest.approx(2 / 3)
+
+    def test_empty_dataset(self, tmp_path):
+        """Test a cache over a dataset with no published manifest answers nothing."""
+        cache = MetricsQueryCache(str(tmp_path), refresh_seconds=0)
+        assert cache.version is None
+        assert cache.time_series("AAPL", "income_stmt_Revenue") == []
+
+
+class TestEvictionAndInvalidation:
+    """Test cases for the memory budget and snapshot invalidation."""
+
+    def test_lru_eviction_under_budget(self, root):
+        """Test the least recently used ticker is evicted once over budget."""
+        probe = MetricsQueryCache(root, refresh_seconds=0)
+        probe.value("AAPL", "income_stmt_Revenue", 2023)
+        cache = MetricsQueryCache(root, max_bytes=probe.nbytes + 1, refresh_seconds=0)
+
+        cache.value("AAPL", "income_stmt_Revenue", 2023)
+        cache.value("BRK/B", "income_stmt_Revenue", 2023)
+        assert cache.stats["evictions"] == 1
+        assert cache.nbytes <= cache.max_bytes
+        cache.value("BRK/B", "income_stmt_Revenue", 2023)
+        assert cache.stats["hits"] == 1
+
+    def test_new_snapshot_invalidates_changed_tickers_only(self, root):
+        """Test refresh drops tickers whose partitions changed and keeps the rest."""
+        cache = MetricsQueryCache(root, refresh_seconds=0)
+        cache.value("AAPL", "income_stmt_Revenue", 2023)
+        cache.value("BRK/B", "income_stmt_Revenue", 2023)
+
+        data_loading.load_delta(_frame(aapl_2023=125.0), root=root)
+        assert cache.refresh() == 2
+        assert cache.stats["invalidations"] == 1
+        assert cache.value("AAPL", "income_stmt_Revenue", 2023) == 125.0
+        cache.value("BRK/B", "income_stmt_Revenue", 2023)
+        assert cache.stats["misses"] == 3
+        assert cache.stats["hits"] == 1
+
+    def test_explicit_invalidate(self, root):
+        """Test invalidate() clears entries and their accounted size."""
+        cache = MetricsQueryCache(root, refresh_seconds=0)
+        cache.value("AAPL", "income_stmt_Revenue", 2023)
+        cache.invalidate()
+        assert cache.nbytes == 0
+        cache.value("AAPL", "income_stmt_Revenue", 2023)
+        assert cache.stats["misses"] == 2
@@ -0,0 +1,125 @@
+"""Pytest tests for the embedded SQLite metrics store."""
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.data_preprocessing import to_columnar
+from scripts.metrics_store import MetricsStore
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=["year", "metric", "value", "ticker"])
+
+
+@pytest.fixture
+def frame():
+    rows = []
+    for ticker, scale in (("AAPL", 1.0), ("MSFT", 2.0), ("BRK/B", 3.0)):
+        for year in (2021, 2022, 2023):
+            rows.append((year, "income_stmt_Revenue", 1000.0 * scale + year, ticker))
+            rows.append((year, "Return on Assets (ROA) %", np.nan if year == 2021 else 5.0 * scale, ticker))
+    return _frame(rows)
+
+
+@pytest.fixture
+def store(tmp_path, frame):
+    store = MetricsStore(str(tmp_path / "metrics.sqlite"))
+    store.load(frame)
+    yield store
+    store.close()
+
+
+class TestLoad:
+    """Test cases for bulk loading."""
+
+    def test_load_counts_rows(self, tmp_path, frame):
+        """Test load returns the rows written and the view exposes them all."""
+        store = MetricsStore(str(tmp_path / "m.sqlite"))
+        assert store.load(frame) == len(frame)
+        assert len(store.query("SELECT * FROM metric_values")) == len(frame)
+
+    def test_reload_replaces_existing_rows(self, store):
+        """Test loading the same key again updates the value in place."""
+        store.load(_frame([(2023, "income_stmt_Revenue", 1.0, "AAPL")]))
+        assert store.value("AAPL", "income_stmt_Revenue", 2023) == 1.0
+        assert store.query("SELECT COUNT(*) AS n FROM facts")["n"][0] == 18
+
+    def test_accepts_columnar_payload_and_records(self, tmp_path, frame):
+        """Test columnar payloads and record lists load the same facts."""
+        columnar = MetricsStore(str(tmp_path / "a.sqlite"))
+        records = MetricsStore(str(tmp_path / "b.sqlite"))
+        columnar.load(to_columnar(frame))
+        records.load(frame.to_dict(orient="records"))
+        sql = "SELECT ticker, year, metric, value FROM metric_values ORDER BY ticker, metric, year"
+        pd.testing.assert_frame_equal(columnar.query(sql), records.query(sql))
+
+    def test_load_spans_insert_batches(self, tmp_path):
+        """Test loads that are not a multiple of the statement batch keep every row."""
+        frame = _frame([(2000 + i % 20, f"metric {i // 20}", float(i), "AAPL") for i in range(613)])
+        store = MetricsStore(str(tmp_path / "m.sqlite"))
+        assert store.load(frame) == 613
+        assert store.query("SELECT COUNT(*) AS n, SUM(value) AS s FROM facts").iloc[0].tolist() == [613, sum(range(613))]
+
+    def test_failed_load_rolls_back(self, store, frame):
+        """Test a load failing midway leaves facts, dimensions and the index untouched."""
+        bad = _frame([(2023, "income_stmt_Revenue", 1.0, "NEW")]).assign(year="not a year")
+        with pytest.raises(ValueError):
+            store.load([_frame([(2023, "income_stmt_Revenue", 1.0, "AAPL"), (2023, "NEW_METRIC", 2.0, "NEW")]), bad])
+        assert store.value("AAPL", "income_stmt_Revenue", 2023) == 3023.0
+        assert store.query("SELECT COUNT(*) AS n FROM facts")["n"][0] == len(frame)
+        assert "NEW" not in store._ticker_ids and "NEW_METRIC" not in store._metric_ids
+        assert store.query("SELECT COUNT(*) AS n FROM tickers")["n"][0] == 3
+        indexes = store.query("SELECT name FROM sqlite_master WHERE type = 'index'")["name"]
+        assert "facts_metric_year" in set(indexes)
+        store.load(_frame([(2024, "NEW_METRIC", 2.0, "NEW")]))
+        assert store.value("NEW", "NEW_METRIC", 2024) == 2.0
+
+    def test_dimensions_survive_reopen(self, tmp_path, frame):
+        """Test a reopened store resolves tickers and units."""
+        path = str(tmp_path / "m.sqlite")
+        MetricsStore(path).load(frame)
+        reopened = MetricsStore(path)
+        assert reopened.value("BRK/B", "income_stmt_Revenue", 2022) == 5022.0
+        units = reopened.query("SELECT DISTINCT metric, unit FROM metric_values")
+        assert set(units["metric"]) == {"income_stmt_Revenue", "Return on Assets (ROA) %"}
+
+
+class TestQueries:
+    """Test cases for the query API."""
+
+    def test_value_and_missing(self, store):
+        """Test point lookups, NaN stored as NULL and unknown keys."""
+        assert store.value("MSFT", "income_stmt_Revenue", 2023) == 4023.0
+        assert store.value("MSFT", "Return on Assets (ROA) %", 2021) is None
+        assert store.value("NOPE", "income_stmt_Revenue", 2023) is None
+
+    def test_time_series_is_ordered_and_bounded(self, store):
+        """Test time series come back oldest first within the year range."""
+        assert store.time_series("AAPL", "income_stmt_Revenue") == [(2021, 3021.0), (2022, 3022.0), (2023, 3023.0)]
+        assert store.time_series("AAPL", "income_stmt_Revenue", start_year=2022) == [(2022, 3022.0), (2023, 3023.0)]
+
+    def test_company(self, store):
+        """Test one company-year returns every metric."""
+        assert store.company("AAPL", 2022) == {"income_stmt_Revenue": 3022.0, "Return on Assets (ROA) %": 5.0}
+
+    def test_cross_section_ranks_and_skips_nulls(self, store):
+        """Test cross sections are ranked by value and drop unreported rows."""
+        top = store.cross_section("Return on Assets (ROA) %", 2023, limit=2)
+        assert top == [("BRK/B", 15.0), ("MSFT", 10.0)]
+        assert store.cross_section("Return on Assets (ROA) %", 2021) == []
+        assert store.cross_section("income_stmt_Revenue", 2023, descending=False)[0][0] == "AAPL"
+
+    def test_queries_use_indexes(self, store):
+        """Test point and cross-sectional queries never scan the facts table."""
+        for sql in (
+            "SELECT value FROM facts WHERE ticker_id = 1 AND metric_id = 1 AND year = 2022",
+            "SELECT ticker_id, value FROM facts WHERE metric_id = 1 AND year = 2022 ORDER BY value DESC",
+        ):
+            plan = " ".join(store.query(f"EXPLAIN QUERY PLAN {sql}")["detail"])
+            assert "SCAN" not in plan
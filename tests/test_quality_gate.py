@@ -0,0 +1,116 @@
+"""Pytest tests for the runtime data-quality gate."""
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts import data_quality
+from scripts.data_preprocessing import process_companies_frame
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=["year", "metric", "value", "ticker"])
+
+
+@pytest.fixture
+def clean_frame():
+    """Two companies, two years of revenue and ROA (one derived NaN)."""
+    rows = []
+    for ticker, scale in (("AAPL", 1.0), ("MSFT", 2.0)):
+        for year in (2022, 2023):
+            rows.append((year, "income_stmt_Revenue", 1000.0 * scale, ticker))
+            rows.append((year, "Return on Assets (ROA) %", np.nan if year == 2022 else 5.0, ticker))
+    return _frame(rows)
+
+
+class TestCheckFrame:
+    """Test cases for the row-level checks."""
+
+    def test_clean_frame_has_no_violations(self, clean_frame):
+        """Test production-shaped output passes every check."""
+        assert data_quality.check_frame(clean_frame) == []
+
+    def test_blocking_violations_are_counted(self, clean_frame):
+        """Test each bad row is attributed to the right check."""
+        bad = pd.concat([clean_frame, _frame([
+            (2023, "income_stmt_Revenue", 5.0, "AAPL"),
+            (1850, "income_stmt_Revenue", 1.0, "IBM"),
+            (2023, "Bogus Metric", 1.0, "IBM"),
+            (2023, "income_stmt_Net Income", np.inf, "IBM"),
+            (2023, "income_stmt_Cost of Revenue", np.nan, "IBM"),
+        ])], ignore_index=True)
+
+        found = {v["check"]: v for v in data_quality.check_frame(bad)}
+
+        assert found["duplicate_key"]["count"] == 2
+        assert found["year_range"]["count"] == 1
+        assert found["unknown_metric"]["examples"][0]["metric"] == "Bogus Metric"
+        assert found["non_finite_value"]["count"] == 1
+        assert "null_reported_value" not in found
+        assert all(v["severity"] == data_quality.BLOCKING for v in found.values())
+
+    def test_preprocessing_output_with_year_gaps_passes(self, tmp_path):
+        """Test real preprocessing output for a filer with a missing metric-year passes the gate."""
+        def obs(val, fy):
+            return {"val": val, "fy": fy, "fp": "FY", "form": "10-K", "start": f"{fy - 1}-10-01",
+                    "end": f"{fy}-09-30", "filed": f"{fy}-11-01", "accn": f"0000320193-{fy % 100}-000001"}
+
+        raw = {"AAPL": {"facts": {"us-gaap": {
+            "Revenues": {"units": {"USD": [obs(1000.0, 2021)]}},
+            "Assets": {"units": {"USD": [obs(5000.0, 2020), obs(5200.0, 2021)]}},
+        }}}}
+        frame = process_companies_frame(raw)
+        revenue = frame[frame["metric"] == "income_stmt_Revenue"]
+        assert revenue["value"].isna().any()
+
+        report = data_quality.run_quality_gate(frame, state_dir=str(tmp_path))
+        assert report["passed"]
+
+    def test_missing_columns(self):
+        """Test a frame without the required columns fails the schema check."""
+        found = data_quality.check_frame(pd.DataFrame({"ticker": ["AAPL"]}))
+        assert found[0]["check"] == "schema"
+
+
+class TestRunQualityGate:
+    """Test cases for the gate, its profile baseline and drift detection."""
+
+    def test_pass_saves_baseline(self, clean_frame, tmp_path):
+        """Test a passing run stores the merged profile for the next run."""
+        report = data_quality.run_quality_gate(
+            [clean_frame.iloc[:4], clean_frame.iloc[4:]], state_dir=str(tmp_path)
+        )
+
+        assert report == {"passed": True, "rows": 8, "metrics": 2, "violations": []}
+        profile = data_quality.load_previous_profile(str(tmp_path))
+        assert profile["income_stmt_Revenue"]["count"] == 4
+        assert profile["income_stmt_Revenue"]["max"] == 2000.0
+        assert profile["Return on Assets (ROA) %"]["nulls"] == 2
+
+    def test_blocking_violation_raises(self, clean_frame, tmp_path):
+        """Test a blocking violation fails the gate and keeps the old baseline."""
+        bad = pd.concat([clean_frame, clean_frame.iloc[:1]], ignore_index=True)
+
+        with pytest.raises(data_quality.DataQualityError, match="duplicate_key") as excinfo:
+            data_quality.run_quality_gate(bad, state_dir=str(tmp_path))
+
+        assert excinfo.value.report["passed"] is False
+        assert data_quality.load_previous_profile(str(tmp_path)) is None
+
+    def test_drift_against_previous_run_is_a_warning(self, clean_frame, tmp_path):
+        """Test count and mean drift are reported without failing the gate."""
+        data_quality.run_quality_gate(clean_frame, state_dir=str(tmp_path))
+        drifted = clean_frame[clean_frame["metric"] == "income_stmt_Revenue"].copy()
+        drifted["value"] *= 10
+
+        report = data_quality.run_quality_gate(drifted, state_dir=str(tmp_path))
+
+        checks = {(v["check"], v.get("metric")) for v in report["violations"]}
+        assert ("metric_missing", "Return on Assets (ROA) %") in checks
+        assert ("mean_drift", "income_stmt_Revenue") in checks
+        assert report["passed"] is True
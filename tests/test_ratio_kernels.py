@@ -0,0 +1,54 @@
+"""Pytest tests for the fused NumPy ratio kernels."""
+import numpy as np
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.ratio_kernels import ratio, ratios
+
+
+class TestRatio:
+    """Test cases for the single-ratio kernel."""
+
+    def test_nan_and_zero_handling(self):
+        """Test zero/NaN denominators, NaN numerators and overflow all give NaN."""
+        result = ratio([10.0, 1.0, np.nan, 5.0, 1e308, -4.0], [2.0, 0.0, 3.0, np.nan, 1e-10, 2.0])
+        np.testing.assert_array_equal(result, [5.0, np.nan, np.nan, np.nan, np.nan, -2.0])
+
+    def test_scale_and_preallocated_output(self):
+        """Test results are scaled and written into the given buffer."""
+        out = np.zeros(2)
+        result = ratio(np.array([1.0, 3.0]), np.array([4.0, 0.0]), scale=100.0, out=out)
+        assert result is out
+        np.testing.assert_array_equal(out, [25.0, np.nan])
+
+    def test_scalar_broadcast(self):
+        """Test a scalar operand broadcasts against an array."""
+        np.testing.assert_array_equal(ratio(np.array([2.0, 4.0]), 2), [1.0, 2.0])
+        assert np.isnan(ratio(1, 0))
+
+
+class TestRatios:
+    """Test cases for the batch API."""
+
+    def test_batch_matches_single_kernel(self):
+        """Test every batch output equals the single-ratio kernel."""
+        rng = np.random.default_rng(0)
+        columns = {name: rng.normal(size=50) for name in "abc"}
+        columns["c"][::5] = 0.0
+        specs = [("a/b", "a", "b"), ("a/c %", "a", "c", 100.0), ("c/a", "c", "a")]
+
+        out = ratios(columns, specs)
+
+        assert list(out) == ["a/b", "a/c %", "c/a"]
+        np.testing.assert_array_equal(out["a/b"], ratio(columns["a"], columns["b"]))
+        np.testing.assert_array_equal(out["a/c %"], ratio(columns["a"], columns["c"], scale=100.0))
+        assert np.isnan(out["a/c %"][::5]).all()
+
+    def test_outputs_share_one_block(self):
+        """Test outputs are views into a single preallocated block."""
+        out = ratios({"a": [1.0, 2.0], "b": [1.0, 2.0]}, [("x", "a", "b"), ("y", "b", "a")])
+        assert out["x"].base is out["y"].base
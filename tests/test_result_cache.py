@@ -0,0 +1,50 @@
+"""Pytest tests for the persistent content-addressed result cache."""
+import os
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.result_cache import ResultCache
+
+
+class TestResultCache:
+    """Test cases for ResultCache."""
+
+    def test_round_trip_and_stats(self, tmp_path):
+        """Test a stored result is returned and counted as a hit."""
+        cache = ResultCache(str(tmp_path))
+
+        assert cache.get("abc") is None
+        cache.put("abc", {"year": [2023], "value": [None]})
+
+        assert cache.get("abc") == {"year": [2023], "value": [None]}
+        assert cache.stats["hits"] == 1
+        assert cache.stats["misses"] == 1
+        assert cache.hit_rate() == 0.5
+
+    def test_entries_persist_across_instances(self, tmp_path):
+        """Test a new instance sees entries written by an earlier run."""
+        ResultCache(str(tmp_path)).put("abc", [1, 2, 3])
+
+        cache = ResultCache(str(tmp_path))
+
+        assert cache.get("abc") == [1, 2, 3]
+        assert cache.hit_rate() == 1.0
+
+    def test_least_recently_used_entry_is_evicted(self, tmp_path):
+        """Test the size bound evicts the entry that was read least recently."""
+        cache = ResultCache(str(tmp_path), max_bytes=10 ** 6)
+        cache.put("old", list(range(100)))
+        cache.put("new", list(range(100)))
+        cache.get("old")
+        cache.max_bytes = 2 * os.path.getsize(tmp_path / "old.json.gz")
+
+        cache.put("newest", [0])
+
+        assert cache.get("old") == list(range(100))
+        assert cache.get("new") is None
+        assert cache.stats["evictions"] == 1
+        assert not (tmp_path / "new.json.gz").exists()
@@ -0,0 +1,153 @@
+"""Pytest tests for the templated RAG sentence generator."""
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.data_preprocessing import to_columnar
+from scripts.sentence_generation import format_values, generate_sentences, metric_label, read_sentences, write_sentences
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=["year", "metric", "value", "ticker"])
+
+
+@pytest.fixture
+def frame():
+    return _frame([
+        (2022, "income_stmt_Revenue", 365.817e9, "AAPL"),
+        (2023, "income_stmt_Revenue", 394.328e9, "AAPL"),
+        (2022, "Debt to Equity Ratio %", 160.5, "AAPL"),
+        (2023, "Debt to Equity Ratio %", 173.0, "AAPL"),
+        (2022, "Current Ratio", 1.25, "AAPL"),
+        (2023, "Current Ratio", 1.10, "AAPL"),
+        (2021, "income_stmt_Net Income", -2.5e6, "AAPL"),
+        (2023, "income_stmt_Net Income", -2.5e6, "AAPL"),
+        (2023, "Return on Assets (ROA) %", np.nan, "AAPL"),
+        (2023, "income_stmt_Revenue", 90.0e6, "BRK/B"),
+        (2022, "income_stmt_Revenue", 90.0e6, "BRK/B"),
+    ])
+
+
+def _texts(sentences):
+    return dict(zip(zip(sentences["ticker"], sentences["metric"], sentences["year"]), sentences["text"]))
+
+
+class TestFormatting:
+    """Test cases for labels and human-readable values."""
+
+    def test_metric_label(self):
+        """Test statement prefixes and unit suffixes are dropped and acronyms kept."""
+        assert metric_label("income_stmt_Cost of Revenue") == "cost of revenue"
+        assert metric_label("Return on Assets (ROA) %") == "return on assets (ROA)"
+
+    def test_format_values(self):
+        """Test USD magnitudes, percentages and ratios, including signs and rounding."""
+        values = [394.328e9, -2.5e6, 1.2e12, 950.0, 0.0, 12.345, -0.04, 1.726]
+        kinds = np.array([0, 0, 0, 0, 0, 1, 1, 2])
+        assert format_values(values, kinds).to_pylist() == [
+            "$394.3B", "-$2.5M", "$1.2T", "$950.0", "$0.0", "12.3%", "0.0%", "1.73",
+        ]
+
+
+    def test_format_values_rounds_up_to_next_scale(self):
+        """Test values rounding to 1000.0 of a scale are shown in the next one."""
+        values = [999.96, 999.96e3, 999.96e6, -999.96e9, 999.94e6, 999.96e12]
+        assert format_values(values, np.zeros(len(values), dtype=np.int64)).to_pylist() == [
+            "$1.0K", "$1.0M", "$1.0B", "-$1.0T", "$999.9M", "$1000.0T",
+        ]
+
+
+class TestGenerateSentences:
+    """Test cases for sentence rendering."""
+
+    def test_templates_and_year_over_year_context(self, frame):
+        """Test each unit's template and its comparison with the previous year."""
+        texts = _texts(generate_sentences(frame, company_names={"AAPL": "Apple Inc."}))
+        assert texts[("AAPL", "income_stmt_Revenue", 2023)] == (
+            "Apple Inc. reported revenue of $394.3B in fiscal year 2023, a 7.8% increase from the previous year.")
+        assert texts[("AAPL", "income_stmt_Revenue", 2022)] == "Apple Inc. reported revenue of $365.8B in fiscal year 2022."
+        assert texts[("AAPL", "Debt to Equity Ratio %", 2023)] == (
+            "Apple Inc.'s debt to equity ratio was 173.0% in fiscal year 2023, "
+            "up 12.5 percentage points from the previous year.")
+        assert texts[("AAPL", "Current Ratio", 2023)] == (
+            "Apple Inc.'s current ratio was 1.10 in fiscal year 2023, down from 1.25 the previous year.")
+        assert texts[("BRK/B", "income_stmt_Revenue", 2023)] == (
+            "BRK/B reported revenue of $90.0M in fiscal year 2023, unchanged from the previous year.")
+
+    def test_gaps_and_missing_values(self, frame):
+        """Test a missing prior year drops the context and NaN values produce no sentence."""
+        sentences = generate_sentences(frame)
+        texts = _texts(sentences)
+        assert texts[("AAPL", "income_stmt_Net Income", 2023)] == "AAPL reported net income of -$2.5M in fiscal year 2023."
+        assert "Return on Assets (ROA) %" not in set(sentences["metric"])
+        assert len(sentences) == len(frame) - 1
+        assert set(sentences["theme"]) >= {"Growth", "Leverage"}
+
+    def test_context_follows_time_series(self):
+        """Test a zero base drops the USD change and duplicate keys render once, as in compute_time_series."""
+        sentences = generate_sentences(_frame([
+            (2022, "income_stmt_Revenue", 0.0, "AAPL"),
+            (2023, "income_stmt_Revenue", 5.0e6, "AAPL"),
+            (2023, "income_stmt_Revenue", 5.0e6, "AAPL"),
+        ]))
+        assert sentences["text"].tolist() == [
+            "AAPL reported revenue of $0.0 in fiscal year 2022.",
+            "AAPL reported revenue of $5.0M in fiscal year 2023.",
+        ]
+
+    def test_row_order_does_not_matter(self, frame):
+        """Test shuffled input renders the same sentences."""
+        shuffled = frame.sample(frac=1, random_state=0)
+        assert _texts(generate_sentences(shuffled)) == _texts(generate_sentences(frame))
+
+    def test_columnar_payload(self, frame):
+        """Test columnar payloads render like frames."""
+        assert _texts(generate_sentences(to_columnar(frame))) == _texts(generate_sentences(frame))
+
+    def test_empty(self):
+        """Test an empty frame renders no sentences."""
+        assert generate_sentences(_frame([])).empty
+
+
+class TestWriteSentences:
+    """Test cases for chunked output."""
+
+    @pytest.mark.parametrize("compression", ["zstd", "gzip"])
+    def test_chunks_round_trip(self, tmp_path, frame, compression):
+        """Test parts hold at most chunk_rows sentences and decode to the rendered records."""
+        stats = write_sentences([frame, frame.assign(ticker=frame["ticker"] + ".L")], root=str(tmp_path),
+                                chunk_rows=4, compression=compression)
+        assert stats["sentences"] == 2 * (len(frame) - 1)
+        assert [Path(f).name for f in stats["files"]][:2] == [
+            f"part-00000.jsonl{'.zst' if compression == 'zstd' else '.gz'}",
+            f"part-00001.jsonl{'.zst' if compression == 'zstd' else '.gz'}",
+        ]
+        records = [r for f in stats["files"] for r in read_sentences(f)]
+        assert all(len(read_sentences(f)) <= 4 for f in stats["files"])
+        expected = pd.concat([generate_sentences(frame), generate_sentences(frame.assign(ticker=frame["ticker"] + ".L"))])
+        assert records == expected.astype(object).to_dict(orient="records")
+
+    def test_rerun_replaces_earlier_parts(self, tmp_path, frame):
+        """Test a rerun writing fewer parts leaves none of the earlier ones behind."""
+        write_sentences(frame, root=str(tmp_path), chunk_rows=4)
+        stats = write_sentences(frame, root=str(tmp_path))
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["part-00000.jsonl.zst"]
+        assert len(read_sentences(stats["files"][0])) == len(frame) - 1
+
+    def test_escapes_json(self, tmp_path, frame):
+        """Test quotes and backslashes in names survive the JSON Lines encoding."""
+        name = 'Say "Hi" \\ Co'
+        stats = write_sentences(frame, root=str(tmp_path), company_names={"AAPL": name})
+        texts = [r["text"] for r in read_sentences(stats["files"][0])]
+        assert any(t.startswith(f"{name} reported revenue") for t in texts)
+
+    def test_rejects_unknown_compression(self, tmp_path, frame):
+        """Test an unsupported codec is refused."""
+        with pytest.raises(ValueError):
+            write_sentences(frame, root=str(tmp_path), compression="lz4")
@@ -0,0 +1,102 @@
+"""Pytest tests for the memory-mapped ticker index."""
+import pytest
+import sys
+from unittest.mock import Mock, patch
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts import ticker_index
+from scripts import data_ingestion
+
+
+TICKERS = {
+    '0': {'cik_str': 320193, 'ticker': 'AAPL', 'title': 'Apple Inc.'},
+    '1': {'cik_str': 789019, 'ticker': 'MSFT', 'title': 'MICROSOFT CORP'},
+    '2': {'cik_str': 1652044, 'ticker': 'GOOGL', 'title': 'Alphabet Inc.'},
+    '3': {'cik_str': 1652044, 'ticker': 'GOOG', 'title': 'Alphabet Inc.'},
+    '4': {'cik_str': 1018724, 'ticker': 'AMZN', 'title': 'AMAZON COM INC'},
+    '5': {'cik_str': 1045810, 'ticker': 'NVDA', 'title': 'NVIDIA CORP'},
+}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ticker_index.TickerIndex.build(TICKERS, str(tmp_path))
+
+
+class TestTickerIndex:
+    """Test cases for TickerIndex lookups."""
+
+    def test_ticker_to_cik(self, index):
+        """Test ticker lookups are case-insensitive and zero-padded."""
+        assert index.cik_for('AAPL') == '0000320193'
+        assert index.cik_for('goog') == '0001652044'
+        assert index.cik_for('NOPE') is None
+
+    def test_cik_to_primary_ticker(self, index):
+        """Test CIK lookups return the first-listed ticker."""
+        assert index.ticker_for('0001652044') == 'GOOGL'
+        assert index.ticker_for(789019) == 'MSFT'
+        assert index.ticker_for(1) is None
+
+    def test_name_prefix_search(self, index):
+        """Test prefix search is case-insensitive and sorted by name."""
+        result = index.search_name('a', limit=10)
+        assert [e['ticker'] for e in result] == ['GOOGL', 'GOOG', 'AMZN', 'AAPL']
+        assert index.search_name('micro')[0]['cik'] == '0000789019'
+        assert index.search_name('zzz') == []
+
+    def test_name_search_folds_non_ascii(self, tmp_path):
+        """Test names with non-ASCII letters are found whatever the query's case."""
+        data = {**TICKERS, '6': {'cik_str': 1, 'ticker': 'NSRGY', 'title': 'Nestlé S.A.'}}
+        index = ticker_index.TickerIndex.build(data, str(tmp_path))
+        assert [e['ticker'] for e in index.search_name('Nestlé')] == ['NSRGY']
+        assert [e['title'] for e in index.search_name('NESTLÉ S')] == ['Nestlé S.A.']
+
+    def test_resolve_explicit_tickers(self, index):
+        """Test an explicit ticker list maps to CIKs, skipping unknowns."""
+        assert index.resolve(['nvda', 'XXXX', 'AAPL']) == {'NVDA': '0001045810', 'AAPL': '0000320193'}
+
+    def test_reload_from_disk(self, index, tmp_path):
+        """Test a reopened index answers the same lookups."""
+        reopened = ticker_index.TickerIndex(str(tmp_path))
+        assert len(reopened) == len(TICKERS)
+        assert reopened.cik_for('AMZN') == '0001018724'
+
+
+class TestLoadTickerIndex:
+    """Test cases for the daily refresh policy."""
+
+    def test_fresh_index_is_not_rebuilt(self, tmp_path):
+        """Test an index younger than max_age is reused."""
+        fetch = Mock(return_value=TICKERS)
+        ticker_index.load_ticker_index(fetch, index_dir=str(tmp_path))
+        ticker_index.load_ticker_index(fetch, index_dir=str(tmp_path))
+        assert fetch.call_count == 1
+
+    def test_index_from_older_version_is_rebuilt(self, tmp_path):
+        """Test an index built with an older layout or key folding is rebuilt even when fresh."""
+        fetch = Mock(return_value=TICKERS)
+        ticker_index.load_ticker_index(fetch, index_dir=str(tmp_path))
+        meta_path = tmp_path / "meta.json"
+        meta_path.write_text(meta_path.read_text().replace('"version": 2', '"version": 1'))
+        ticker_index.load_ticker_index(fetch, index_dir=str(tmp_path))
+        assert fetch.call_count == 2
+
+    def test_stale_index_is_rebuilt(self, tmp_path):
+        """Test an index older than max_age is rebuilt."""
+        fetch = Mock(return_value=TICKERS)
+        ticker_index.load_ticker_index(fetch, index_dir=str(tmp_path))
+        ticker_index.load_ticker_index(fetch, index_dir=str(tmp_path), max_age=0)
+        assert fetch.call_count == 2
+
+    @patch('scripts.data_ingestion.fetch_company_tickers')
+    def test_extract_companies_with_explicit_tickers(self, mock_fetch, tmp_path):
+        """Test extract_companies resolves an explicit ticker list through the index."""
+        mock_fetch.return_value = TICKERS
+        with patch.object(data_ingestion.config, 'TICKER_INDEX_DIR', str(tmp_path)):
+            result = data_ingestion.extract_companies(tickers=['MSFT', 'NVDA'])
+        assert result == {'MSFT': '0000789019', 'NVDA': '0001045810'}
@@ -0,0 +1,74 @@
+"""Pytest tests for the panel-wide time-series stage."""
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts import time_series
+
+
+def _records(ticker, metric, values_by_year):
+    return [{"ticker": ticker, "metric": metric, "year": y, "value": v} for y, v in values_by_year.items()]
+
+
+@pytest.fixture
+def processed():
+    rows = _records("AAPL", "income_stmt_Revenue", {2019: 100.0, 2020: 110.0, 2021: 121.0, 2022: 133.1, 2023: 146.41})
+    rows += _records("MSFT", "income_stmt_Revenue", {2018: 50.0, 2019: 40.0, 2021: 60.0, 2022: 0.0, 2023: 30.0})
+    rows += _records("AAPL", "income_stmt_Net Income", {2022: -10.0, 2023: 5.0})
+    return rows
+
+
+def _row(result, ticker, metric, year):
+    match = result[(result["ticker"] == ticker) & (result["metric"] == metric) & (result["year"] == year)]
+    assert len(match) == 1
+    return match.iloc[0]
+
+
+class TestComputeTimeSeries:
+    """Test cases for compute_time_series."""
+
+    def test_yoy_and_cagr(self, processed):
+        result = time_series.compute_time_series(processed, cagr_years=(3,), window=3)
+        row = _row(result, "AAPL", "income_stmt_Revenue", 2023)
+        assert row["yoy_pct"] == pytest.approx(10.0)
+        assert row["cagr_3y_pct"] == pytest.approx(10.0)
+        assert np.isnan(_row(result, "AAPL", "income_stmt_Revenue", 2019)["yoy_pct"])
+
+    def test_gaps_are_explicit(self, processed):
+        """Test a missing fiscal year blocks YoY/CAGR instead of skipping over it."""
+        result = time_series.compute_time_series(processed, cagr_years=(2,), window=3)
+        after_gap = _row(result, "MSFT", "income_stmt_Revenue", 2021)
+        assert bool(after_gap["gap_before"])
+        assert np.isnan(after_gap["yoy_pct"])
+        # CAGR compares exact calendar years, so 2019 -> 2021 is still valid.
+        assert after_gap["cagr_2y_pct"] == pytest.approx(((60 / 40) ** 0.5 - 1) * 100)
+        assert not bool(_row(result, "MSFT", "income_stmt_Revenue", 2022)["gap_before"])
+        assert len(result) == len(processed)
+
+    def test_zero_and_negative_bases(self, processed):
+        """Test YoY on a zero base is NaN, on a negative base uses |base|, CAGR needs positive ends."""
+        result = time_series.compute_time_series(processed, cagr_years=(1,), window=3)
+        assert np.isnan(_row(result, "MSFT", "income_stmt_Revenue", 2023)["yoy_pct"])
+        ni = _row(result, "AAPL", "income_stmt_Net Income", 2023)
+        assert ni["yoy_pct"] == pytest.approx(150.0)
+        assert np.isnan(ni["cagr_1y_pct"])
+
+    def test_rolling_windows_stay_inside_series(self, processed):
+        result = time_series.compute_time_series(processed, cagr_years=(3,), window=3)
+        aapl = _row(result, "AAPL", "income_stmt_Revenue", 2021)
+        assert aapl["rolling_mean_3y"] == pytest.approx(110.333333)
+        assert np.isnan(_row(result, "AAPL", "income_stmt_Revenue", 2020)["rolling_mean_3y"])
+        assert _row(result, "AAPL", "income_stmt_Revenue", 2023)["rolling_vol_3y"] == pytest.approx(0.0, abs=1e-9)
+        # First rows of a series never borrow values from the previous series.
+        assert np.isnan(_row(result, "MSFT", "income_stmt_Revenue", 2019)["rolling_mean_3y"])
+
+    def test_empty_input(self):
+        result = time_series.compute_time_series([])
+        assert result.empty
+        assert "yoy_pct" in result.columns
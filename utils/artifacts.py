@@ -0,0 +1,94 @@
+"""Artifact store for passing large task payloads by reference instead of XCom."""
+import gzip
+import hashlib
+import json
+import os
+import boto3
+
+
+def _encode(payload):
+    return gzip.compress(json.dumps(payload, default=str).encode("utf-8"), compresslevel=6)
+
+
+def _reference(uri, body):
+    return {"uri": uri, "size": len(body), "sha256": hashlib.sha256(body).hexdigest()}
+
+
+def _decode(ref, body):
+    digest = hashlib.sha256(body).hexdigest()
+    if digest != ref["sha256"]:
+        raise ValueError(f"Checksum mismatch for {ref['uri']}: expected {ref['sha256']}, got {digest}")
+    return json.loads(gzip.decompress(body))
+
+
+class LocalArtifactStore:
+    """Stores gzip-compressed JSON artifacts under a local (or shared) directory."""
+
+    scheme = "file"
+
+    def __init__(self, root):
+        self.root = root
+
+    def put(self, name, payload):
+        """Write `payload` and return a small {uri, size, sha256} reference."""
+        path = os.path.abspath(os.path.join(self.root, name))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        body = _encode(payload)
+        with open(path + ".tmp", "wb") as fh:
+            fh.write(body)
+        os.replace(path + ".tmp", path)
+        return _reference(f"file://{path}", body)
+
+    def get(self, ref):
+        """Read and verify the artifact behind `ref`."""
+        with open(ref["uri"][len("file://"):], "rb") as fh:
+            return _decode(ref, fh.read())
+
+
+class S3ArtifactStore:
+    """Stores gzip-compressed JSON artifacts in S3."""
+
+    scheme = "s3"
+
+    def __init__(self, bucket, prefix="", s3_client=None, profile_name=None):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.profile_name = profile_name
+        self._s3_client = s3_client
+
+    @property
+    def s3_client(self):
+        # Created lazily so building a store needs no AWS credentials.
+        if self._s3_client is None:
+            session = boto3.session.Session(profile_name=self.profile_name)
+            self._s3_client = session.client("s3")
+        return self._s3_client
+
+    def put(self, name, payload):
+        """Upload `payload` and return a small {uri, size, sha256} reference."""
+        key = f"{self.prefix}/{name}" if self.prefix else name
+        body = _encode(payload)
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=body,
+            ContentType="application/json",
+            ContentEncoding="gzip",
+        )
+        return _reference(f"s3://{self.bucket}/{key}", body)
+
+    def get(self, ref):
+        """Download and verify the artifact behind `ref`."""
+        bucket, key = ref["uri"][len("s3://"):].split("/", 1)
+        body = self.s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        return _decode(ref, body)
+
+
+def get_artifact_store(uri, profile_name=None):
+    """Build a store from a file:// or s3:// URI."""
+    if uri.startswith("s3://"):
+        bucket, _, prefix = uri[len("s3://"):].partition("/")
+        return S3ArtifactStore(bucket, prefix, profile_name=profile_name)
+    if uri.startswith("file://"):
+        uri = uri[len("file://"):]
+    return LocalArtifactStore(uri)
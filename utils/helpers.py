@@ -2,6 +2,7 @@ import logging
 import os
 import pandas as pd
 import numpy as np
+from utils.ratio_kernels import ratio
 
 def setup_logger(name="pipeline_logger", log_file="pipeline.log", level=logging.INFO):
     """Configures a named logger for all modules."""
@@ -27,6 +28,10 @@ def setup_logger(name="pipeline_logger", log_file="pipeline.log", level=logging.
 def safe_div(numerator, denominator):
     """Safely divide two values, handling division by zero and NaN values."""
     if isinstance(numerator, pd.Series) and isinstance(denominator, pd.Series):
+        if numerator.index.equals(denominator.index):
+            # Aligned already: one masked division, no inf-replacement temporaries.
+            return pd.Series(ratio(numerator.to_numpy(dtype=float), denominator.to_numpy(dtype=float)),
+                             index=numerator.index)
         result = numerator.div(denominator).replace([np.inf, -np.inf], np.nan)
         return result
     elif denominator == 0 or denominator is None or (isinstance(denominator, float) and np.isnan(denominator)):
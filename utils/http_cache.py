@@ -0,0 +1,165 @@
+"""Persistent on-disk HTTP response cache with conditional GET revalidation."""
+import hashlib
+import json
+import os
+import threading
+import time
+import requests
+
+
+class HttpCache:
+    """Disk-backed response cache keyed by URL.
+
+    Fresh entries (younger than `ttl` seconds) are served without a request.
+    Stale entries are revalidated with If-None-Match / If-Modified-Since; a
+    304 refreshes the entry. Total body size is capped at `max_bytes` with
+    least-recently-used eviction.
+    """
+
+    def __init__(self, cache_dir, ttl=86400, max_bytes=2 * 1024 ** 3, session=None):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.session = session or requests.Session()
+        self.stats = {"hits": 0, "misses": 0, "revalidations": 0, "evictions": 0, "bytes_saved": 0}
+        self._lock = threading.Lock()
+        self._index = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".meta.json"):
+                continue
+            try:
+                with open(os.path.join(self.cache_dir, name)) as fh:
+                    meta = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            self._index[meta["key"]] = meta
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".body", base + ".meta.json"
+
+    def _write_atomic(self, path, data):
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+    def _save(self, meta, body=None):
+        body_path, meta_path = self._paths(meta["key"])
+        if body is not None:
+            self._write_atomic(body_path, body)
+        self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        self._index[meta["key"]] = meta
+
+    def _read_body(self, key):
+        with open(self._paths(key)[0], "rb") as fh:
+            return fh.read()
+
+    def _remove(self, key):
+        self._index.pop(key, None)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        total = sum(meta["size"] for meta in self._index.values())
+        for meta in sorted(self._index.values(), key=lambda m: m["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= meta["size"]
+            self._remove(meta["key"])
+            self.stats["evictions"] += 1
+
+    def get(self, url, headers=None, timeout=30, **session_kwargs):
+        """Return the response body for `url`, from cache when possible.
+
+        Extra keyword arguments (e.g. a SecClient's retries and backoff_base)
+        are passed to the session's get.
+        """
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        headers = dict(headers or {})
+        now = time.time()
+
+        with self._lock:
+            meta = self._index.get(key)
+            if meta and now - meta["stored_at"] < self.ttl:
+                try:
+                    body = self._read_body(key)
+                except FileNotFoundError:
+                    self._remove(key)
+                    meta = None
+                else:
+                    meta["last_access"] = now
+                    self._save(meta)
+                    self.stats["hits"] += 1
+                    self.stats["bytes_saved"] += meta["size"]
+                    return body
+
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        res = self.session.get(url, headers=headers, timeout=timeout, **session_kwargs)
+
+        if res.status_code == 304:
+            body = self._revalidate(key, now)
+            if body is not None:
+                return body
+            # Evicted (or its body lost) since the conditional request was
+            # sent: a 304 has nothing to serve, so fetch the body outright.
+            headers.pop("If-None-Match", None)
+            headers.pop("If-Modified-Since", None)
+            res = self.session.get(url, headers=headers, timeout=timeout, **session_kwargs)
+
+        with self._lock:
+            res.raise_for_status()
+            if res.status_code == 304:
+                raise requests.HTTPError(f"Unexpected 304 for unconditional request to {url}", response=res)
+            body = res.content
+            self._save({
+                "key": key,
+                "url": url,
+                "etag": res.headers.get("ETag"),
+                "last_modified": res.headers.get("Last-Modified"),
+                "size": len(body),
+                "stored_at": now,
+                "last_access": now,
+            }, body)
+            self.stats["misses"] += 1
+            self._evict()
+            return body
+
+    def _revalidate(self, key, now):
+        """Body of a still-cached entry refreshed by a 304, or None when it is gone."""
+        with self._lock:
+            meta = self._index.get(key)
+            if meta is None:
+                return None
+            try:
+                body = self._read_body(key)
+            except FileNotFoundError:
+                self._remove(key)
+                return None
+            meta.update(stored_at=now, last_access=now)
+            self._save(meta)
+            self.stats["revalidations"] += 1
+            self.stats["bytes_saved"] += meta["size"]
+            return body
+
+    def get_json(self, url, headers=None, timeout=30, **session_kwargs):
+        """Return the decoded JSON document for `url`."""
+        return json.loads(self.get(url, headers=headers, timeout=timeout, **session_kwargs))
+
+    def hit_rate(self):
+        """Share of lookups answered without downloading a body."""
+        served = self.stats["hits"] + self.stats["revalidations"]
+        total = served + self.stats["misses"]
+        return served / total if total else 0.0
@@ -0,0 +1,50 @@
+"""Fused NumPy ratio kernels over aligned float arrays.
+
+Every kernel follows one rule: the result is NaN where the denominator is
+zero or NaN, where either input is NaN, or where the quotient overflows to
++/-inf. Division runs once with a `where=` mask into a preallocated output,
+so no intermediate quotient or replacement arrays are allocated.
+"""
+import numpy as np
+
+
+def _as_float(values):
+    return np.asarray(values, dtype=float)
+
+
+def ratio(numerator, denominator, scale=1.0, out=None, _scratch=None):
+    """numerator / denominator * scale, NaN-safe, written into `out` if given."""
+    numerator, denominator = np.broadcast_arrays(_as_float(numerator), _as_float(denominator))
+    if out is None:
+        out = np.empty(numerator.shape)
+    out.fill(np.nan)
+    mask = np.empty(numerator.shape, dtype=bool) if _scratch is None else _scratch
+    np.not_equal(denominator, 0, out=mask)
+    with np.errstate(over="ignore", invalid="ignore"):
+        np.divide(numerator, denominator, out=out, where=mask)
+        if scale != 1.0:
+            np.multiply(out, scale, out=out)
+    np.isinf(out, out=mask)
+    out[mask] = np.nan
+    return out
+
+
+def ratios(columns, specs, n_rows=None):
+    """Evaluate many ratios over {label: array} inputs in one pass.
+
+    `specs` is a list of (name, numerator_label, denominator_label) or
+    (name, numerator_label, denominator_label, scale). All outputs share one
+    preallocated (len(specs), n_rows) block and one boolean scratch buffer;
+    returns {name: row view}.
+    """
+    arrays = {label: _as_float(values) for label, values in columns.items()}
+    if n_rows is None:
+        n_rows = len(next(iter(arrays.values()))) if arrays else 0
+    block = np.empty((len(specs), n_rows))
+    scratch = np.empty(n_rows, dtype=bool)
+    out = {}
+    for row, spec in enumerate(specs):
+        name, num, den = spec[:3]
+        scale = spec[3] if len(spec) > 3 else 1.0
+        out[name] = ratio(arrays[num], arrays[den], scale=scale, out=block[row], _scratch=scratch)
+    return out
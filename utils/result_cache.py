@@ -0,0 +1,80 @@
+"""Persistent content-addressed cache for computed results (gzip JSON on disk)."""
+import gzip
+import json
+import os
+import threading
+import time
+
+
+class ResultCache:
+    """Disk-backed cache of JSON-serialisable results keyed by a content hash.
+
+    Keys are hex digests chosen by the caller, so an entry never goes stale:
+    changed inputs simply hash to a different key. Total size is capped at
+    `max_bytes` with least-recently-used eviction; a file's mtime records
+    its last access, so the LRU order survives restarts.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._index = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in os.listdir(cache_dir):
+            if name.endswith(".json.gz"):
+                st = os.stat(os.path.join(cache_dir, name))
+                self._index[name[:-len(".json.gz")]] = [st.st_size, st.st_mtime]
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+    def get(self, key):
+        """Return the stored result for `key`, or None."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None:
+                try:
+                    with open(self._path(key), "rb") as fh:
+                        body = fh.read()
+                    entry[1] = time.time()
+                    os.utime(self._path(key), (entry[1], entry[1]))
+                except FileNotFoundError:
+                    del self._index[key]
+                else:
+                    self.stats["hits"] += 1
+                    return json.loads(gzip.decompress(body))
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, result):
+        """Store `result` under `key` and evict the least recently used entries."""
+        body = gzip.compress(json.dumps(result).encode("utf-8"), compresslevel=6)
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(body)
+        os.replace(tmp, path)
+        with self._lock:
+            self._index[key] = [len(body), time.time()]
+            self.stats["writes"] += 1
+            self._evict()
+
+    def _evict(self):
+        total = sum(size for size, _ in self._index.values())
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            total -= size
+            del self._index[key]
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self.stats["evictions"] += 1
+
+    def hit_rate(self):
+        """Share of lookups answered from the cache."""
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0